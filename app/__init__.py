@@ -1,9 +1,12 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-from .instance_segmentation_app import InstanceSegmentationApp
-
-__all__ = ['InstanceSegmentationApp']
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+from .instance_segmentation_app import InstanceSegmentationApp
+from .batch_segmentation import BatchSegmentationPipeline, VideoFrameReader
+from .multi_camera_app import MultiCameraApp, CameraWorker
+
+__all__ = ['InstanceSegmentationApp', 'BatchSegmentationPipeline', 'VideoFrameReader', 'MultiCameraApp',
+           'CameraWorker']
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+离线批量分割 - 用于录制视频的批量重新处理
+"""
+
+import os
+import time
+import threading
+import cv2
+from queue import Queue
+
+from segmentation.yolov11_segmentation import YOLOv11Segmentation
+from utils.result_writer import ResultWriter, FORMAT_BINARY, MASK_NONE
+
+class VideoFrameReader:
+    """后台线程解码视频，解码结果放入有界预取队列"""
+
+    def __init__(self, video_path, prefetch=64):
+        self.video_path = video_path
+        self.queue = Queue(maxsize=prefetch)
+        self.capture = None
+        self.thread = None
+        self.fps = 0.0
+        self.frame_count = 0
+        self.running = False
+
+    def start(self):
+        """打开视频并启动解码线程"""
+        self.capture = cv2.VideoCapture(self.video_path)
+        if not self.capture.isOpened():
+            print(f"无法打开视频: {self.video_path}")
+            return False
+
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.running = True
+        self.thread = threading.Thread(target=self.decode_loop)
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+
+    def decode_loop(self):
+        """解码线程 - 队列满时阻塞，自然形成背压"""
+        index = 0
+        while self.running:
+            ok, frame = self.capture.read()
+            if not ok:
+                break
+            self.queue.put((index, frame))
+            index += 1
+        self.capture.release()
+        # 结束标记
+        self.queue.put(None)
+
+    def read_batch(self, batch_size):
+        """读取最多batch_size帧，视频结束时返回的列表可能不足一批或为空"""
+        batch = []
+        while len(batch) < batch_size:
+            item = self.queue.get()
+            if item is None:
+                self.running = False
+                break
+            batch.append(item)
+        return batch
+
+    def stop(self):
+        """停止解码线程"""
+        self.running = False
+        # 清空队列，避免解码线程阻塞在put上
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+class BatchSegmentationPipeline:
+    """视频文件批量分割流水线"""
+
+    def __init__(self, model_path, batch_size=8, prefetch=64, mask_format=MASK_NONE, output_format=None):
+        self.segmentor = YOLOv11Segmentation(model_path)
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.mask_format = mask_format
+        self.output_format = output_format
+
+    def initialize(self):
+        """初始化分割模型"""
+        print("初始化YOLOv11分割模型...")
+        return self.segmentor.initialize()
+
+    def process_video(self, video_path, output_dir):
+        """处理整个视频，逐帧结果由后台写线程写入output_dir/results.jsonl（或results.bin）"""
+        reader = VideoFrameReader(video_path, prefetch=self.prefetch)
+        if not reader.start():
+            return None
+
+        os.makedirs(output_dir, exist_ok=True)
+        suffix = "bin" if self.output_format == FORMAT_BINARY else "jsonl"
+        writer = ResultWriter(os.path.join(output_dir, f"results.{suffix}"), fmt=self.output_format,
+                              mask_format=self.mask_format, queue_size=self.prefetch * 4)
+        writer.start()
+
+        print(f"开始处理视频: {video_path} ({reader.frame_count}帧, 批大小 {self.batch_size})")
+        frames = 0
+        start_time = time.perf_counter()
+        try:
+            while True:
+                batch = reader.read_batch(self.batch_size)
+                if not batch:
+                    break
+
+                images = [frame for _, frame in batch]
+                results = self.segmentor.segment_batch(images)
+
+                for (index, frame), result in zip(batch, results):
+                    timestamp = index / reader.fps if reader.fps > 0 else 0.0
+                    # 离线处理不允许丢结果，写线程跟不上时在这里等待
+                    writer.submit(index, timestamp, frame.shape, result, block=True)
+
+                frames += len(batch)
+                if frames % (self.batch_size * 25) < self.batch_size:
+                    elapsed = time.perf_counter() - start_time
+                    print(f"已处理 {frames} 帧, {frames / elapsed:.1f} FPS")
+        except KeyboardInterrupt:
+            print("程序被用户中断")
+        finally:
+            reader.stop()
+            writer.stop()
+
+        elapsed = time.perf_counter() - start_time
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        print(f"处理完成: {frames} 帧, 耗时 {elapsed:.1f}s, 平均 {fps:.1f} FPS")
+        return {"frames": frames, "elapsed": elapsed, "fps": fps}
@@ -1,198 +1,619 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-"""
-实例分割主应用程序类
-"""
-
-import time
-import threading
-import cv2
-import numpy as np
-from queue import Queue
-
-from camera.realsense_d455 import RealSenseD455
-from segmentation.yolov11_segmentation import YOLOv11Segmentation
-from segmentation.segmentation_visualizer import SegmentationVisualizer
-from utils.fps_counter import FPSCounter
-
-class InstanceSegmentationApp:
-    """实例分割主应用程序 - 无边界框版本"""
-    
-    def __init__(self, model_path):
-        # 使用D455支持的配置
-        self.camera = RealSenseD455(width=848, height=480, fps=30)
-        self.segmentor = YOLOv11Segmentation(model_path)
-        self.visualizer = SegmentationVisualizer()
-        self.running = False
-        self.frame_queue = Queue(maxsize=1)
-        self.result_queue = Queue(maxsize=1)
-        
-        # 帧率计数器
-        self.camera_fps = FPSCounter()
-        self.processing_fps = FPSCounter()
-        
-        # 显示模式
-        self.show_depth = True
-        self.show_distance = True
-        
-    def initialize(self):
-        """初始化应用程序"""
-        print("初始化RealSense D455相机...")
-        if not self.camera.initialize():
-            return False
-            
-        print("初始化YOLOv11分割模型...")
-        if not self.segmentor.initialize():
-            return False
-            
-        print("应用程序初始化成功")
-        print("模式: 只检测人，无边界框")
-        return True
-    
-    def camera_thread(self):
-        """相机采集线程"""
-        while self.running:
-            color_frame, depth_frame = self.camera.get_frames()
-            if color_frame is not None:
-                self.camera_fps.update()
-                
-                if self.frame_queue.full():
-                    try:
-                        self.frame_queue.get_nowait()
-                    except:
-                        pass
-                self.frame_queue.put((color_frame, depth_frame))
-            time.sleep(0.001)
-    
-    def processing_thread(self):
-        """处理线程"""
-        while self.running:
-            try:
-                color_frame, depth_frame = self.frame_queue.get(timeout=1.0)
-                self.processing_fps.update()
-                
-                # 进行实例分割 - 只检测人
-                result_image, masks, boxes, classes, confidences, class_names = \
-                    self.segmentor.segment_frame(color_frame)
-                
-                # 可视化结果
-                if result_image is not None:
-                    fps_info = {
-                        "Camera FPS": f"{self.camera_fps.get_fps():.1f}",
-                        "Processing FPS": f"{self.processing_fps.get_fps():.1f}",
-                        "Persons": len(boxes)  # 修改为显示人数
-                    }
-                    
-                    segmented_image = self.visualizer.draw_segmentation(
-                        result_image, masks, boxes, classes, confidences, class_names, depth_frame, fps_info
-                    )
-                    
-                    if self.result_queue.full():
-                        try:
-                            self.result_queue.get_nowait()
-                        except:
-                            pass
-                    self.result_queue.put((segmented_image, depth_frame))
-                    
-            except:
-                continue
-    
-    def run(self):
-        """运行主应用程序"""
-        if not self.initialize():
-            print("应用程序初始化失败")
-            return
-        
-        self.running = True
-        
-        # 启动相机和处理线程
-        camera_thread = threading.Thread(target=self.camera_thread)
-        processing_thread = threading.Thread(target=self.processing_thread)
-        
-        camera_thread.daemon = True
-        processing_thread.daemon = True
-        
-        camera_thread.start()
-        processing_thread.start()
-        
-        print("应用程序开始运行，按以下键操作:")
-        print("  'q' - 退出")
-        print("  's' - 保存当前帧")
-        print("  'd' - 切换显示深度图")
-        print("  't' - 切换距离显示")
-        print("  'c' - 切换显示模式（分割/深度/并排）")
-        
-        show_mode = 0  # 0: 分割结果, 1: 深度图, 2: 并排显示
-        save_count = 0
-        
-        try:
-            while self.running:
-                try:
-                    segmented_image, depth_frame = self.result_queue.get(timeout=1.0)
-                    
-                    # 根据显示模式准备图像
-                    if show_mode == 0:  # 只显示分割结果
-                        display_image = segmented_image
-                    elif show_mode == 1:  # 只显示深度图
-                        display_image = self.visualizer.create_depth_colormap(depth_frame)
-                    else:  # 并排显示
-                        depth_colormap = self.visualizer.create_depth_colormap(depth_frame)
-                        # 调整尺寸以匹配
-                        if segmented_image.shape != depth_colormap.shape:
-                            depth_colormap = cv2.resize(depth_colormap, 
-                                                       (segmented_image.shape[1], segmented_image.shape[0]))
-                        display_image = np.hstack((segmented_image, depth_colormap))
-                    
-                    # 添加模式指示器
-                    mode_text = ["Segmentation", "Depth Map", "Side by Side"][show_mode]
-                    cv2.putText(display_image, f"Mode: {mode_text}", 
-                               (10, display_image.shape[0] - 10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-                    
-                    # 添加检测模式指示器
-                    cv2.putText(display_image, "Detection: Person Only (No BBox)", 
-                               (display_image.shape[1] - 300, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                    
-                    cv2.imshow('YOLOv11 RealSense Person Detection (No BBox)', display_image)
-                    
-                except:
-                    # 显示等待信息
-                    wait_image = np.zeros((480, 848, 3), dtype=np.uint8)
-                    cv2.putText(wait_image, "等待相机数据...", (300, 240), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.imshow('YOLOv11 RealSense Person Detection (No BBox)', wait_image)
-                
-                # 处理键盘输入
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    break
-                elif key == ord('s'):
-                    # 保存当前帧
-                    timestamp = time.strftime("%Y%m%d_%H%M%S")
-                    filename = f"person_detection_no_bbox_{timestamp}_{save_count}.jpg"
-                    cv2.imwrite(filename, segmented_image)
-                    print(f"保存图像: {filename}")
-                    save_count += 1
-                elif key == ord('d'):
-                    self.show_depth = not self.show_depth
-                    print(f"显示深度图: {'开启' if self.show_depth else '关闭'}")
-                elif key == ord('t'):
-                    self.show_distance = not self.show_distance
-                    print(f"显示距离: {'开启' if self.show_distance else '关闭'}")
-                elif key == ord('c'):
-                    show_mode = (show_mode + 1) % 3
-                    mode_names = ["分割结果", "深度图", "并排显示"]
-                    print(f"显示模式: {mode_names[show_mode]}")
-                    
-        except KeyboardInterrupt:
-            print("程序被用户中断")
-        finally:
-            self.running = False
-            self.camera.stop()
-            cv2.destroyAllWindows()
-            print("应用程序已关闭")
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+"""
+实例分割主应用程序类
+"""
+
+import time
+import threading
+import cv2
+import numpy as np
+
+from segmentation.yolov11_segmentation import YOLOv11Segmentation, PERSON_CLASS
+from segmentation.cascade_segmentation import CascadeSegmentation
+from segmentation.segmentation_visualizer import SegmentationVisualizer
+from segmentation.depth_statistics import compute_instance_depth_stats
+from segmentation.tracker import IoUTracker, TrackingSegmentor
+from segmentation.resolution_controller import ResolutionController
+from segmentation.motion_gate import MotionGate
+from segmentation.depth_roi import DepthROISelector, DepthROISegmentor
+from camera.frame_pool import FrameBufferPool
+from utils.fps_counter import FPSCounter
+from utils.metrics import MetricsRegistry, MetricsExporter, StartupProfile
+from utils.result_writer import ResultWriter, MASK_RLE
+from utils.render_pool import RenderProcessPool
+from utils.stream_server import StreamServer
+from utils.recorder import FrameRecorder, SnapshotWriter, RECORD_CONTINUOUS, RECORD_PERSON, POLICY_DROP_NEW
+from utils.pipeline import StagedPipeline, FramePacket, POLICY_LATEST, POLICY_BLOCK, POLICY_DEADLINE
+
+class InstanceSegmentationApp:
+    """实例分割主应用程序 - 无边界框版本"""
+    
+    def __init__(self, model_path, frame_source=None, headless=False, compact_masks=False,
+                 drop_policy=POLICY_LATEST, frame_deadline=None, pool_size=12,
+                 metrics_path=None, metrics_interval=5.0, results_path=None, mask_format=MASK_RLE,
+                 render=True, keyframe_interval=1, min_track_confidence=0.5, imgsz=320,
+                 input_sizes=None, latency_budget_ms=None, cascade_model_path=None, motion_gate=False,
+                 max_stale_frames=30, roi_depth_range=None, roi_zone=None, render_workers=0,
+                 stream_port=None, stream_host="0.0.0.0", depth_view_range=None, record_path=None,
+                 record_mode=RECORD_CONTINUOUS, record_policy=POLICY_DROP_NEW, record_queue_size=32,
+                 record_chunk_size=30, record_hold=3.0, classes=(PERSON_CLASS,), class_conf=None,
+                 max_det=100):
+        if frame_source is None:
+            # 使用D455支持的配置
+            from camera.realsense_d455 import RealSenseD455
+            frame_source = RealSenseD455(width=848, height=480, fps=30)
+        self.camera = frame_source
+        if latency_budget_ms is not None and not input_sizes:
+            input_sizes = (256, 320, 480, 640)
+        self.cascade = None
+        if cascade_model_path:
+            # 级联模式：cascade_model_path为逐帧运行的小模型，model_path只在难帧上运行
+            self.segmentor = self.cascade = CascadeSegmentation(cascade_model_path, model_path,
+                                                                compact_masks=compact_masks, imgsz=imgsz,
+                                                                input_sizes=input_sizes, classes=classes,
+                                                                class_conf=class_conf, max_det=max_det)
+        else:
+            # 类别过滤在NMS之前进行，逐类别阈值和数量上限在拷回CPU之前应用
+            self.segmentor = YOLOv11Segmentation(model_path, compact_masks=compact_masks, imgsz=imgsz,
+                                                 input_sizes=input_sizes, classes=classes,
+                                                 class_conf=class_conf, max_det=max_det)
+        self.classes = sorted(set(int(c) for c in classes)) if classes is not None else None
+        # 设置了深度范围或区域时，只对深度前景区域做推理
+        self.roi = None
+        if roi_depth_range is not None or roi_zone is not None:
+            min_depth, max_depth = roi_depth_range or (0.0, 65.535)
+            selector = DepthROISelector(min_depth, max_depth, roi_zone, self.camera.depth_scale)
+            self.segmentor = self.roi = DepthROISegmentor(self.segmentor, selector)
+        # 设置了延迟预算时，按实测推理延迟在input_sizes之间切换推理尺寸
+        self.resolution = None
+        if latency_budget_ms is not None:
+            self.resolution = ResolutionController(self.segmentor, latency_budget_ms, input_sizes)
+        # 跟踪器提供稳定的跟踪ID；keyframe_interval>1时只在关键帧上运行完整推理
+        self.tracking = TrackingSegmentor(self.segmentor, IoUTracker(), keyframe_interval,
+                                          min_track_confidence)
+        # 静止场景跳过推理，复用最近一次结果，最多复用max_stale_frames帧
+        self.motion_gate = MotionGate(max_stale_frames=max_stale_frames) if motion_gate else None
+        self.last_result = None
+        self.last_track_ids = None
+        self.visualizer = SegmentationVisualizer()
+        self.headless = headless
+        self.running = False
+        self.pipeline = None
+        self.frame_pool = None
+        # 启动耗时分解，initialize时创建
+        self.startup = None
+        self.model_ready = False
+        self.pool_size = pool_size
+        self.drop_policy = drop_policy
+        self.frame_deadline = frame_deadline
+        self.frame_id = 0
+        
+        # 帧率计数器
+        self.camera_fps = FPSCounter()
+        self.processing_fps = FPSCounter()
+        
+        # 各阶段延迟直方图和丢帧计数，可定期导出为JSON/Prometheus文本
+        self.metrics = MetricsRegistry()
+        self.metrics.add_collector(self.collect_pipeline_metrics)
+        self.camera.metrics = self.metrics
+        self.visualizer.metrics = self.metrics
+        self.metrics_exporter = None
+        if metrics_path:
+            self.metrics_exporter = MetricsExporter(self.metrics, metrics_path, metrics_interval)
+        
+        # 逐帧检测结果输出（JSON lines或二进制记录流）
+        self.result_writer = None
+        if results_path:
+            self.result_writer = ResultWriter(results_path, mask_format=mask_format)
+        # 无界面部署时可以跳过渲染阶段
+        self.render_enabled = render or not headless
+        # render_workers>0时后处理和渲染在工作进程中进行，帧缓冲改为共享内存
+        self.render_workers = render_workers
+        self.render_pool = None
+        # 局域网推流（MJPEG视频流 + WebSocket检测结果）
+        self.stream_server = None
+        if stream_port:
+            self.stream_server = StreamServer(stream_host, stream_port)
+        # 后台录制彩色视频、原始深度和检测结果；person模式检测到人时录制，最后一次检测到人record_hold秒后停止
+        self.recorder = None
+        self.record_hold = record_hold
+        if record_path:
+            self.recorder = FrameRecorder(record_path, self.camera.fps, record_mode, record_policy,
+                                          record_queue_size, record_chunk_size, mask_format=mask_format)
+        
+        if depth_view_range is not None:
+            self.visualizer.depth_colorizer.configure(min_depth=depth_view_range[0],
+                                                      max_depth=depth_view_range[1])
+        
+        # 显示模式
+        self.show_depth = True
+        self.show_distance = True
+        
+    def initialize(self):
+        """初始化应用程序
+
+        模型的导入、加载和预热在后台线程中进行，与相机启动（包括备用配置的逐一尝试）
+        同时进行，启动耗时取两者中较长的一个而不是两者之和。
+        """
+        self.startup = StartupProfile()
+        # 预热使用帧源配置的分辨率；相机回退到备用分辨率时首帧会多一次形状初始化
+        frame_shape = (self.camera.height, self.camera.width)
+        model_thread = threading.Thread(target=self.initialize_model, args=(frame_shape,), name="model-init")
+        model_thread.daemon = True
+        print("初始化YOLOv11分割模型（后台）...")
+        model_thread.start()
+        
+        print(f"初始化帧源 {type(self.camera).__name__}...")
+        with self.startup.timer("camera"):
+            camera_ready = self.camera.initialize()
+        if camera_ready:
+            # RealSense的深度单位在初始化时才从传感器读出
+            self.visualizer.depth_colorizer.configure(depth_scale=self.camera.depth_scale)
+            if self.recorder is not None:
+                self.recorder.depth_scale = self.camera.depth_scale
+            if self.roi is not None:
+                self.roi.selector.depth_scale = self.camera.depth_scale
+                # 不做整帧对齐时深度图上选出的区域需投影到彩色图
+                self.roi.geometry = self.camera.geometry
+            
+            # 帧源可能回退到备用分辨率，缓冲池按实际分辨率分配
+            with self.startup.timer("frame pool"):
+                self.frame_pool = FrameBufferPool(self.camera.width, self.camera.height,
+                                                  self.pool_size, self.camera.depth_scale,
+                                                  shared=self.render_workers > 0)
+            if self.render_workers > 0:
+                with self.startup.timer("render workers"):
+                    self.render_pool = RenderProcessPool(self.frame_pool, self.render_workers,
+                                                         geometry=self.camera.geometry)
+                    self.render_pool.start()
+        
+        model_thread.join()
+        self.startup.mark("initialized")
+        if not camera_ready or not self.model_ready:
+            if self.render_pool is not None:
+                self.render_pool.stop()
+                self.frame_pool.close()
+            if camera_ready:
+                self.camera.stop()
+            return False
+        if self.resolution is not None and len(self.segmentor.input_sizes) < 2:
+            # 导出模型（ONNX/OpenVINO/TensorRT）的推理尺寸固定，无法按预算切换
+            print("当前模型不支持切换推理尺寸，已关闭延迟预算控制")
+            self.resolution = None
+            
+        print("应用程序初始化成功")
+        if self.classes == [PERSON_CLASS]:
+            print("模式: 只检测人，无边界框")
+        else:
+            print(f"模式: 检测类别 {self.classes if self.classes is not None else '全部'}，无边界框")
+        return True
+    
+    def initialize_model(self, frame_shape):
+        """模型初始化线程"""
+        self.model_ready = self.segmentor.initialize(frame_shape, self.startup)
+    
+    def mark_first_frame(self):
+        """第一帧输出时记录并打印启动耗时分解"""
+        if "first_frame" not in self.startup.marks:
+            self.startup.mark("first_frame")
+            self.startup.report()
+    
+    def capture_stage(self):
+        """采集阶段 - 从帧源直接写入借用的池缓冲"""
+        if self.camera.is_finished():
+            raise StopIteration
+        buffer = self.frame_pool.acquire(timeout=0.1)
+        if buffer is None:
+            # 所有缓冲都被下游占用，说明下游积压，本轮跳过
+            return None
+        with self.metrics.timer("capture"):
+            ok = self.camera.read_into(buffer)
+        if not ok:
+            buffer.release()
+            return None
+        self.camera_fps.update()
+        self.metrics.inc("frames_captured")
+        self.frame_id += 1
+        return FramePacket(self.frame_id, buffer.color, buffer.depth_frame, buffer)
+    
+    def inference_stage(self, packet):
+        """推理阶段 - 实例分割，只检测人"""
+        self.processing_fps.update()
+        if self.motion_gate is not None and self.last_result is not None:
+            with self.metrics.timer("motion_gate"):
+                run = self.motion_gate.should_run(packet.color, np.asanyarray(packet.depth_frame.get_data()))
+            if not run:
+                # 画面无明显变化，复用上一次的结果，只替换为当前图像
+                packet.result = (packet.color,) + self.last_result[1:]
+                packet.track_ids = self.last_track_ids
+                packet.is_keyframe = False
+                self.metrics.inc("motion_skipped")
+                return packet
+        
+        depth_image = None
+        if self.roi is not None:
+            depth_image = np.asanyarray(packet.depth_frame.get_data())
+        start = time.perf_counter()
+        packet.result, packet.track_ids, packet.is_keyframe = self.tracking.segment_frame(packet.color,
+                                                                                         depth_image)
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        self.metrics.observe("inference", latency_ms)
+        if packet.result[0] is None:
+            return None
+        if self.resolution is not None and packet.is_keyframe:
+            # 只有完整推理的延迟反映当前推理尺寸的开销
+            self.resolution.update(latency_ms)
+        self.metrics.inc("keyframes" if packet.is_keyframe else "tracked_frames")
+        self.last_result = packet.result
+        self.last_track_ids = packet.track_ids
+        return packet
+    
+    def record_frame(self, packet):
+        """把未绘制的彩色帧和原始深度交给录制线程（只做一次拷贝），渲染会就地修改帧缓冲"""
+        if self.recorder is None:
+            return
+        if self.recorder.mode == RECORD_PERSON and np.count_nonzero(np.asarray(packet.result[3]) == PERSON_CLASS):
+            self.recorder.trigger(self.record_hold)
+        with self.metrics.timer("record"):
+            self.recorder.submit_frame(packet.frame_id, time.time(), packet.color,
+                                       np.asanyarray(packet.depth_frame.get_data()))
+    
+    def postprocess_stage(self, packet):
+        """后处理阶段 - 一次计算所有人的掩码内深度统计"""
+        _, masks, boxes, _, _, _ = packet.result
+        self.record_frame(packet)
+        with self.metrics.timer("depth_lookup"):
+            packet.depth_stats = compute_instance_depth_stats(
+                np.asanyarray(packet.depth_frame.get_data()), masks, boxes, self.camera.depth_scale,
+                geometry=self.camera.geometry
+            )
+        self.submit_results(packet)
+        return packet
+    
+    def submit_results(self, packet):
+        """检测结果交给结果输出和录制线程"""
+        if self.result_writer is not None:
+            self.result_writer.submit(packet.frame_id, time.time(), packet.color.shape,
+                                      packet.result, packet.depth_stats, packet.track_ids)
+        if self.recorder is not None:
+            self.recorder.submit_result(packet.frame_id, time.time(), packet.color.shape,
+                                        packet.result, packet.depth_stats, packet.track_ids)
+    
+    def build_fps_info(self, packet):
+        """叠加层显示的帧率和延迟信息"""
+        classes = packet.result[3]
+        stats = self.pipeline.stats()
+        inference = self.metrics.summary("inference")
+        end_to_end = self.metrics.summary("end_to_end")
+        fps_info = {
+            "Camera FPS": f"{self.camera_fps.get_fps():.1f}",
+            "Processing FPS": f"{self.processing_fps.get_fps():.1f}",
+            "Persons": int(np.count_nonzero(np.asarray(classes) == PERSON_CLASS)),  # 只统计"人"类别
+            "Dropped": sum(stage["dropped"] for stage in stats.values()),
+            "Bottleneck": self.pipeline.bottleneck(),
+            "Input size": self.segmentor.imgsz,
+        }
+        if self.motion_gate is not None:
+            fps_info["Skip rate"] = f"{self.motion_gate.skip_rate * 100:.0f}%"
+        if inference is not None:
+            fps_info["Infer p50/p95/p99"] = \
+                f"{inference['p50']:.0f}/{inference['p95']:.0f}/{inference['p99']:.0f}ms"
+        if end_to_end is not None:
+            fps_info["Latency p95/max"] = f"{end_to_end['p95']:.0f}/{end_to_end['max']:.0f}ms"
+        return fps_info
+    
+    def render_stage(self, packet):
+        """渲染阶段 - 绘制分割结果和帧率信息"""
+        result_image, masks, boxes, classes, confidences, class_names = packet.result
+        fps_info = self.build_fps_info(packet)
+        
+        # 帧缓冲由本帧独占，直接在其上绘制，不再额外拷贝
+        with self.metrics.timer("render"):
+            packet.image = self.visualizer.draw_segmentation(
+                result_image, masks, boxes, classes, confidences, class_names, packet.depth_frame, fps_info,
+                packet.depth_stats, in_place=True, track_ids=packet.track_ids
+            )
+        return packet
+    
+    def dispatch_stage(self, packet):
+        """分发阶段 - 将后处理和渲染交给工作进程，不等待结果"""
+        fps_info = self.build_fps_info(packet) if self.render_enabled else None
+        self.record_frame(packet)
+        packet.sequence = self.render_pool.submit(packet.buffer, packet.result, self.camera.depth_scale,
+                                                  packet.track_ids, fps_info)
+        return packet
+    
+    def collect_stage(self, packet):
+        """收集阶段 - 按提交顺序等待工作进程完成，输出顺序与采集顺序一致"""
+        with self.metrics.timer("postprocess_wait"):
+            packet.depth_stats = self.render_pool.wait(packet.sequence)
+        if packet.depth_stats is None:
+            if self.render_pool.owns(packet.sequence):
+                # 超时的任务仍可能在工作进程中读写帧缓冲，由进程池在结果到达后归还
+                packet.buffer = None
+            return None
+        self.submit_results(packet)
+        if self.render_enabled:
+            # 工作进程已在共享帧缓冲上就地绘制
+            packet.image = packet.color
+        return packet
+    
+    def record_output(self, packet):
+        """输出端记录一帧的端到端延迟（采集完成到输出），并发布到推流服务"""
+        self.metrics.observe("end_to_end", (time.perf_counter() - packet.timestamp) * 1000.0)
+        self.metrics.inc("frames_output")
+        self.mark_first_frame()
+        if self.stream_server is not None:
+            self.stream_server.publish(packet.frame_id, packet.image, packet.result, packet.depth_stats,
+                                       packet.track_ids)
+    
+    def collect_pipeline_metrics(self):
+        """指标快照时采集流水线各阶段的丢帧数和缓冲池状态"""
+        counters = {}
+        gauges = {}
+        if self.pipeline is not None:
+            for name, stage in self.pipeline.stats().items():
+                counters[f"frames_dropped_{name}"] = stage["dropped"]
+                gauges[f"queue_depth_{name}"] = stage["queued"]
+        if self.frame_pool is not None:
+            counters["frame_pool_misses"] = self.frame_pool.misses
+            gauges["frame_pool_available"] = self.frame_pool.available()
+        if self.result_writer is not None:
+            counters["results_written"] = self.result_writer.written
+            counters["results_dropped"] = self.result_writer.dropped
+        if self.recorder is not None:
+            counters["record_frames_written"] = self.recorder.written
+            counters["record_frames_dropped"] = self.recorder.dropped
+            counters["record_results_dropped"] = self.recorder.results_dropped
+            gauges["record_queue_depth"] = self.recorder.work_queue.qsize()
+        gauges["camera_fps"] = round(self.camera_fps.get_fps(), 2)
+        gauges["processing_fps"] = round(self.processing_fps.get_fps(), 2)
+        gauges["input_size"] = self.segmentor.imgsz
+        if self.resolution is not None:
+            counters["resolution_switches"] = self.resolution.switches
+        if self.roi is not None:
+            counters["roi_empty_frames"] = self.roi.empty_frames
+            gauges["roi_pixel_ratio"] = round(self.roi.pixel_ratio, 3)
+        if self.motion_gate is not None:
+            gauges["motion_skip_rate"] = round(self.motion_gate.skip_rate, 3)
+        if self.cascade is not None:
+            for reason, count in self.cascade.escalations.items():
+                counters[f"cascade_escalations_{reason}"] = count
+            if self.cascade.frames:
+                gauges["cascade_escalation_rate"] = \
+                    round(sum(self.cascade.escalations.values()) / self.cascade.frames, 3)
+        return {"counters": counters, "gauges": gauges}
+    
+    def build_pipeline(self):
+        """构建采集→推理→后处理→渲染流水线，显示/统计循环作为输出端"""
+        if self.drop_policy == POLICY_DEADLINE:
+            frame_buffer = dict(capacity=2, policy=POLICY_DEADLINE, deadline=self.frame_deadline)
+        else:
+            frame_buffer = dict(capacity=1, policy=self.drop_policy)
+        
+        pipeline = StagedPipeline(on_drop=FramePacket.release)
+        pipeline.add_source("capture", self.capture_stage)
+        pipeline.add_stage("inference", self.inference_stage, **frame_buffer)
+        if self.render_pool is not None:
+            # 分发后多帧同时在工作进程中处理，收集队列要能容纳所有在途帧
+            pipeline.add_stage("dispatch", self.dispatch_stage, capacity=2, policy=POLICY_BLOCK)
+            pipeline.add_stage("collect", self.collect_stage, capacity=2 * self.render_workers,
+                               policy=POLICY_BLOCK)
+        else:
+            pipeline.add_stage("postprocess", self.postprocess_stage, capacity=2, policy=POLICY_BLOCK)
+            if self.render_enabled:
+                pipeline.add_stage("render", self.render_stage, capacity=2, policy=POLICY_BLOCK)
+        pipeline.add_output(capacity=1, policy=POLICY_LATEST)
+        return pipeline
+    
+    def start_pipeline(self):
+        """启动流水线各阶段线程"""
+        self.running = True
+        self.pipeline = self.build_pipeline()
+        if self.result_writer is not None:
+            self.result_writer.start()
+        if self.recorder is not None:
+            self.recorder.start()
+        if self.stream_server is not None:
+            self.stream_server.start()
+        self.pipeline.start()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.start()
+    
+    def stop_pipeline(self):
+        """停止流水线并打印各阶段统计"""
+        self.running = False
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.print_stage_stats()
+        if self.stream_server is not None:
+            self.stream_server.stop()
+        if self.render_pool is not None:
+            self.render_pool.stop()
+            self.frame_pool.close()
+        if self.result_writer is not None:
+            self.result_writer.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        self.camera.stop()
+    
+    def print_stage_stats(self):
+        """打印各阶段的处理数、丢帧数和平均耗时"""
+        print("各阶段统计:")
+        for name, stage in self.pipeline.stats().items():
+            print(f"  {name:<12} 处理 {stage['processed']:>6}  丢弃 {stage['dropped']:>6}  "
+                  f"平均 {stage['avg_ms']:.1f}ms")
+        print(f"瓶颈阶段: {self.pipeline.bottleneck()}")
+        for name, summary in self.metrics.snapshot()["latency_ms"].items():
+            print(f"  {name:<16} p50 {summary['p50']:.1f}ms  p95 {summary['p95']:.1f}ms  "
+                  f"p99 {summary['p99']:.1f}ms  max {summary['max']:.1f}ms")
+    
+    def run_headless(self, max_frames=None, duration=None):
+        """无界面运行完整流水线，统计持续处理帧率"""
+        if not self.initialize():
+            print("应用程序初始化失败")
+            return None
+        
+        self.start_pipeline()
+        print("无界面模式运行中，按 Ctrl+C 结束")
+        
+        frames = 0
+        first_time = None
+        last_time = None
+        start_time = time.perf_counter()
+        try:
+            while self.running:
+                if max_frames is not None and frames >= max_frames:
+                    break
+                if duration is not None and time.perf_counter() - start_time >= duration:
+                    break
+                packet = self.pipeline.get(timeout=0.1)
+                if packet is None:
+                    # 帧源耗尽且各阶段都已处理完时结束
+                    if self.pipeline.is_finished():
+                        break
+                    continue
+                self.record_output(packet)
+                packet.release()
+                
+                last_time = time.perf_counter()
+                if first_time is None:
+                    # 第一帧包含模型冷启动开销，不计入持续帧率
+                    first_time = last_time
+                frames += 1
+        except KeyboardInterrupt:
+            print("程序被用户中断")
+        finally:
+            self.stop_pipeline()
+        
+        sustained_fps = 0.0
+        if frames > 1 and last_time > first_time:
+            sustained_fps = (frames - 1) / (last_time - first_time)
+        report = {
+            "captured_frames": self.frame_id,
+            "frames": frames,
+            "elapsed": time.perf_counter() - start_time,
+            "sustained_fps": sustained_fps,
+            "stages": self.pipeline.stats(),
+            "metrics": self.metrics.snapshot(),
+            "startup": self.startup.snapshot(),
+        }
+        if self.recorder is not None:
+            report["recording"] = self.recorder.stats()
+        print(f"采集帧数: {report['captured_frames']}, 处理帧数: {report['frames']}, 总耗时: {report['elapsed']:.2f}s, "
+              f"持续帧率: {report['sustained_fps']:.2f} FPS")
+        return report
+    
+    def run(self):
+        """运行主应用程序"""
+        if self.headless:
+            return self.run_headless()
+        
+        if not self.initialize():
+            print("应用程序初始化失败")
+            return
+        
+        # 启动流水线
+        self.start_pipeline()
+        
+        print("应用程序开始运行，按以下键操作:")
+        print("  'q' - 退出")
+        print("  's' - 保存当前帧（后台写出渲染图像和原始深度）")
+        if self.recorder is not None:
+            print("  'r' - 开始/停止录制")
+        print("  'd' - 切换显示深度图")
+        print("  't' - 切换距离显示")
+        print("  'c' - 切换显示模式（分割/深度/并排）")
+        
+        show_mode = 0  # 0: 分割结果, 1: 深度图, 2: 并排显示
+        # 快照在后台线程中编码写盘，不阻塞显示循环
+        snapshots = SnapshotWriter()
+        snapshots.start()
+        # 当前显示的帧，在下一帧到达前一直持有其缓冲
+        displayed_packet = None
+        if self.classes == [PERSON_CLASS]:
+            detection_text = "Detection: Person Only (No BBox)"
+        elif self.classes is None:
+            detection_text = "Detection: All Classes (No BBox)"
+        else:
+            detection_text = f"Detection: Classes {','.join(map(str, self.classes))} (No BBox)"
+        # 等待画面只绘制一次，超时时直接复用
+        wait_image = np.zeros((self.camera.height, self.camera.width, 3), dtype=np.uint8)
+        cv2.putText(wait_image, "等待相机数据...", (300, 240),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        try:
+            while self.running:
+                packet = self.pipeline.get(timeout=1.0)
+                if packet is not None:
+                    if displayed_packet is not None:
+                        displayed_packet.release()
+                    displayed_packet = packet
+                    self.record_output(packet)
+                    segmented_image, depth_frame = packet.image, packet.depth_frame
+                    
+                    # 根据显示模式准备图像，深度图只在当前模式需要时才着色
+                    if show_mode == 0:  # 只显示分割结果
+                        display_image = segmented_image
+                    elif show_mode == 1:  # 只显示深度图
+                        display_image = self.visualizer.create_depth_colormap(depth_frame)
+                    else:  # 并排显示，尺寸不同时在着色前缩放原始深度
+                        display_image = self.visualizer.depth_colorizer.side_by_side(
+                            segmented_image, np.asanyarray(depth_frame.get_data()))
+                    
+                    # 添加模式指示器
+                    mode_text = ["Segmentation", "Depth Map", "Side by Side"][show_mode]
+                    cv2.putText(display_image, f"Mode: {mode_text}", 
+                               (10, display_image.shape[0] - 10), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                    
+                    # 添加检测模式指示器
+                    cv2.putText(display_image, detection_text, 
+                               (display_image.shape[1] - 300, 30), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                    
+                    cv2.imshow('YOLOv11 RealSense Person Detection (No BBox)', display_image)
+                    
+                else:
+                    # 显示等待信息
+                    cv2.imshow('YOLOv11 RealSense Person Detection (No BBox)', wait_image)
+                
+                # 处理键盘输入
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+                elif key == ord('s') and displayed_packet is not None:
+                    # 保存当前帧，拷贝后交给后台线程
+                    depth_image = np.asanyarray(displayed_packet.depth_frame.get_data())
+                    if snapshots.submit(segmented_image, depth_image) is None:
+                        print("快照队列已满，本次未保存")
+                elif key == ord('r') and self.recorder is not None:
+                    recording = self.recorder.toggle()
+                    print(f"录制: {'开启' if recording else '关闭'}")
+                elif key == ord('d'):
+                    self.show_depth = not self.show_depth
+                    print(f"显示深度图: {'开启' if self.show_depth else '关闭'}")
+                elif key == ord('t'):
+                    self.show_distance = not self.show_distance
+                    print(f"显示距离: {'开启' if self.show_distance else '关闭'}")
+                elif key == ord('c'):
+                    show_mode = (show_mode + 1) % 3
+                    mode_names = ["分割结果", "深度图", "并排显示"]
+                    print(f"显示模式: {mode_names[show_mode]}")
+                    
+        except KeyboardInterrupt:
+            print("程序被用户中断")
+        finally:
+            if displayed_packet is not None:
+                displayed_packet.release()
+            snapshots.stop()
+            self.stop_pipeline()
+            cv2.destroyAllWindows()
+            print("应用程序已关闭")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+多相机实例分割 - 每台相机独立采集线程，共享一个模型跨相机批量推理
+"""
+
+import time
+import threading
+import cv2
+import numpy as np
+
+from segmentation.yolov11_segmentation import YOLOv11Segmentation, PERSON_CLASS
+from segmentation.segmentation_visualizer import SegmentationVisualizer
+from segmentation.depth_statistics import compute_instance_depth_stats
+from camera.frame_pool import FrameBufferPool
+from utils.fps_counter import FPSCounter
+from utils.metrics import MetricsRegistry, MetricsExporter, StartupProfile
+
+class CameraWorker:
+    """单台相机的采集线程
+
+    采集结果只保留最新一帧（槽位被覆盖时归还旧缓冲），推理跟不上时旧帧直接丢弃，
+    高帧率相机也无法积压帧挤占其他相机。
+    """
+
+    def __init__(self, name, source, pool_size=4, metrics=None):
+        self.name = name
+        self.source = source
+        self.pool_size = pool_size
+        self.metrics = metrics
+        self.frame_pool = None
+        self.latest = None
+        self.sequence = 0
+        self.dropped = 0
+        self.served = 0
+        self.last_served = 0.0
+        self.fps = FPSCounter()
+        self.ready = None
+        self.thread = None
+        self.running = False
+        self.finished = False
+        # 渲染输出轮换使用的画布，显示线程读取的画布不会被下一帧覆盖
+        self.canvases = []
+        self.canvas_index = 0
+
+    def initialize(self):
+        """初始化帧源并按实际分辨率分配缓冲池"""
+        self.source.metrics = self.metrics
+        if not self.source.initialize():
+            print(f"相机 {self.name} 初始化失败")
+            return False
+        self.frame_pool = FrameBufferPool(self.source.width, self.source.height,
+                                          self.pool_size, self.source.depth_scale)
+        return True
+
+    def start(self, ready):
+        """启动采集线程，ready在有新帧时被通知"""
+        self.ready = ready
+        self.running = True
+        self.thread = threading.Thread(target=self.capture_loop, name=f"capture-{self.name}")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def capture_loop(self):
+        """采集线程主循环"""
+        while self.running:
+            if self.source.is_finished():
+                break
+            buffer = self.frame_pool.acquire(timeout=0.1)
+            if buffer is None:
+                continue
+            if not self.source.read_into(buffer):
+                buffer.release()
+                continue
+            buffer.timestamp = time.perf_counter()
+            self.fps.update()
+            with self.ready:
+                if self.latest is not None:
+                    self.latest.release()
+                    self.dropped += 1
+                self.latest = buffer
+                self.sequence += 1
+                self.ready.notify()
+        with self.ready:
+            self.finished = True
+            self.ready.notify()
+
+    def take(self):
+        """取走最新帧（调用方须持有ready锁），没有新帧时返回None"""
+        buffer = self.latest
+        self.latest = None
+        if buffer is not None:
+            self.served += 1
+            self.last_served = time.perf_counter()
+        return buffer
+
+    def next_canvas(self, image, count=3):
+        """取下一块渲染画布，首次调用或分辨率变化时按image分配"""
+        if not self.canvases or self.canvases[0].shape != image.shape:
+            self.canvases = [np.empty_like(image) for _ in range(count)]
+        self.canvas_index = (self.canvas_index + 1) % len(self.canvases)
+        return self.canvases[self.canvas_index]
+
+    def stop(self):
+        """停止采集线程和帧源"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        if self.latest is not None:
+            self.latest.release()
+            self.latest = None
+        self.source.stop()
+
+class MultiCameraApp:
+    """多相机实例分割应用程序
+
+    所有相机共享一个YOLOv11Segmentation。推理线程每轮从有新帧的相机中各取最新一帧，
+    按最久未被服务的顺序最多取batch_size台，组成一批调用segment_batch；每台相机每批
+    至多一帧，batch_size小于相机数时也不会有相机被饿死。
+    """
+
+    def __init__(self, model_path, frame_sources, names=None, headless=False, batch_size=None,
+                 batch_wait=0.005, compact_masks=False, imgsz=320, pool_size=4,
+                 metrics_path=None, metrics_interval=5.0, render=True, classes=(PERSON_CLASS,), class_conf=None,
+                 max_det=100):
+        if names is None:
+            names = [getattr(source, "serial", None) or f"cam{i}" for i, source in enumerate(frame_sources)]
+        self.metrics = MetricsRegistry()
+        self.metrics.add_collector(self.collect_camera_metrics)
+        self.workers = [CameraWorker(name, source, pool_size, self.metrics)
+                        for name, source in zip(names, frame_sources)]
+        self.segmentor = YOLOv11Segmentation(model_path, compact_masks=compact_masks, imgsz=imgsz,
+                                             classes=classes, class_conf=class_conf, max_det=max_det)
+        self.visualizer = SegmentationVisualizer()
+        self.visualizer.metrics = self.metrics
+        self.headless = headless
+        self.render_enabled = render or not headless
+        self.batch_size = batch_size or len(self.workers)
+        # 第一帧到达后再等待batch_wait秒，让其他相机的帧凑进同一批
+        self.batch_wait = batch_wait
+        self.ready = threading.Condition()
+        self.running = False
+        self.inference_thread = None
+        self.processing_fps = FPSCounter()
+        self.batches = 0
+        self.batched_frames = 0
+        # 每台相机最近一次的渲染结果，供界面线程显示
+        self.outputs = {}
+        self.outputs_lock = threading.Lock()
+        self.metrics_exporter = None
+        if metrics_path:
+            self.metrics_exporter = MetricsExporter(self.metrics, metrics_path, metrics_interval)
+        self.startup = None
+
+    def initialize(self):
+        """并行初始化所有相机和共享模型，启动耗时取决于其中最慢的一个"""
+        self.startup = StartupProfile()
+        ready = {}
+        
+        def initialize_camera(worker):
+            print(f"初始化相机 {worker.name} ({type(worker.source).__name__})...")
+            with self.startup.timer(f"camera {worker.name}"):
+                ready[worker.name] = worker.initialize()
+        
+        def initialize_model():
+            print("初始化共享YOLOv11分割模型...")
+            source = self.workers[0].source if self.workers else None
+            frame_shape = (source.height, source.width) if source is not None else None
+            ready["model"] = self.segmentor.initialize(frame_shape, self.startup)
+        
+        threads = [threading.Thread(target=initialize_model, name="model-init")]
+        threads += [threading.Thread(target=initialize_camera, args=(worker,), name=f"init-{worker.name}")
+                    for worker in self.workers]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.startup.mark("initialized")
+        self.startup.report()
+        if not all(ready.get(name) for name in ["model"] + [worker.name for worker in self.workers]):
+            for worker in self.workers:
+                if ready.get(worker.name):
+                    worker.source.stop()
+            return False
+        print(f"多相机应用程序初始化成功: {len(self.workers)} 台相机, 每批最多 {self.batch_size} 帧")
+        return True
+    
+    def collect_batch(self):
+        """从有新帧的相机中按最久未服务优先取一批帧，返回[(worker, buffer)]"""
+        with self.ready:
+            while self.running and not any(w.latest is not None for w in self.workers):
+                if all(w.finished for w in self.workers):
+                    return None
+                self.ready.wait(timeout=0.1)
+            if not self.running:
+                return None
+            if self.batch_wait > 0 and sum(w.latest is not None for w in self.workers) < self.batch_size:
+                self.ready.wait(timeout=self.batch_wait)
+            candidates = [w for w in self.workers if w.latest is not None]
+            candidates.sort(key=lambda w: w.last_served)
+            return [(worker, worker.take()) for worker in candidates[:self.batch_size]]
+
+    def process_batch(self, batch):
+        """批量推理并为每台相机生成输出"""
+        images = [buffer.color for _, buffer in batch]
+        with self.metrics.timer("inference"):
+            results = self.segmentor.segment_batch(images)
+        self.batches += 1
+        self.batched_frames += len(batch)
+        self.metrics.inc("batches")
+
+        for (worker, buffer), result in zip(batch, results):
+            self.processing_fps.update()
+            self.metrics.inc(f"frames_{worker.name}")
+            image, masks, boxes, classes, confidences, class_names = result
+            with self.metrics.timer("depth_lookup"):
+                depth_stats = compute_instance_depth_stats(buffer.depth, masks, boxes,
+                                                           worker.source.depth_scale,
+                                                           geometry=worker.source.geometry)
+            output = None
+            if self.render_enabled:
+                fps_info = {
+                    "Camera": worker.name,
+                    "Camera FPS": f"{worker.fps.get_fps():.1f}",
+                    "Processing FPS": f"{self.processing_fps.get_fps():.1f}",
+                    "Persons": int(np.count_nonzero(np.asarray(classes) == PERSON_CLASS)),
+                    "Batch": len(batch),
+                }
+                with self.metrics.timer("render"):
+                    # 渲染结果拷贝到该相机轮换使用的画布上，池缓冲随即归还给采集线程
+                    output = self.visualizer.draw_segmentation(image, masks, boxes, classes, confidences,
+                                                               class_names, buffer.depth_frame, fps_info,
+                                                               depth_stats, out=worker.next_canvas(image))
+            self.metrics.observe("end_to_end", (time.perf_counter() - buffer.timestamp) * 1000.0)
+            buffer.release()
+            with self.outputs_lock:
+                self.outputs[worker.name] = output
+
+    def inference_loop(self):
+        """推理线程主循环"""
+        while self.running:
+            batch = self.collect_batch()
+            if batch is None:
+                break
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                print(f"批量处理失败: {e}")
+                for _, buffer in batch:
+                    buffer.release()
+        self.running = False
+
+    def collect_camera_metrics(self):
+        """每台相机的帧率、丢帧和服务次数"""
+        counters = {}
+        gauges = {}
+        for worker in self.workers:
+            counters[f"camera_dropped_{worker.name}"] = worker.dropped
+            gauges[f"camera_fps_{worker.name}"] = round(worker.fps.get_fps(), 2)
+        if self.batches:
+            gauges["average_batch_size"] = round(self.batched_frames / self.batches, 2)
+        gauges["processing_fps"] = round(self.processing_fps.get_fps(), 2)
+        return {"counters": counters, "gauges": gauges}
+
+    def start(self):
+        """启动所有采集线程和推理线程"""
+        self.running = True
+        for worker in self.workers:
+            worker.start(self.ready)
+        self.inference_thread = threading.Thread(target=self.inference_loop, name="multi-inference")
+        self.inference_thread.daemon = True
+        self.inference_thread.start()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.start()
+
+    def stop(self):
+        """停止所有线程并释放相机"""
+        self.running = False
+        with self.ready:
+            self.ready.notify_all()
+        if self.inference_thread is not None:
+            self.inference_thread.join(timeout=2.0)
+            self.inference_thread = None
+        for worker in self.workers:
+            worker.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+
+    def report(self, elapsed):
+        """汇总运行结果"""
+        frames = {worker.name: worker.served for worker in self.workers}
+        total = sum(frames.values())
+        report = {
+            "frames": frames,
+            "elapsed": elapsed,
+            "aggregate_fps": total / elapsed if elapsed > 0 else 0.0,
+            "average_batch_size": self.batched_frames / self.batches if self.batches else 0.0,
+            "metrics": self.metrics.snapshot(),
+            "startup": self.startup.snapshot(),
+        }
+        print(f"处理帧数: {frames}, 总耗时: {elapsed:.2f}s, 总帧率: {report['aggregate_fps']:.2f} FPS, "
+              f"平均批大小: {report['average_batch_size']:.2f}")
+        return report
+
+    def run_headless(self, max_frames=None, duration=None):
+        """无界面运行，max_frames为所有相机合计处理的帧数"""
+        if not self.initialize():
+            print("应用程序初始化失败")
+            return None
+        self.start()
+        print("无界面模式运行中，按 Ctrl+C 结束")
+        start_time = time.perf_counter()
+        try:
+            while self.running:
+                if max_frames is not None and self.batched_frames >= max_frames:
+                    break
+                if duration is not None and time.perf_counter() - start_time >= duration:
+                    break
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            print("程序被用户中断")
+        finally:
+            self.stop()
+        return self.report(time.perf_counter() - start_time)
+
+    def run(self):
+        """运行多相机应用程序，每台相机一个显示窗口"""
+        if self.headless:
+            return self.run_headless()
+        if not self.initialize():
+            print("应用程序初始化失败")
+            return
+        self.start()
+        print("多相机应用程序开始运行，按 'q' 退出")
+        start_time = time.perf_counter()
+        try:
+            while self.running:
+                with self.outputs_lock:
+                    outputs = self.outputs
+                    self.outputs = {}
+                for name, image in outputs.items():
+                    if image is not None:
+                        cv2.imshow(f"YOLOv11 Person Detection - {name}", image)
+                if cv2.waitKey(10) & 0xFF == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            print("程序被用户中断")
+        finally:
+            self.stop()
+            cv2.destroyAllWindows()
+        self.report(time.perf_counter() - start_time)
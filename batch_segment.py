@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+
+"""
+YOLOv11 离线批量分割 - 视频文件处理入口
+"""
+
+import os
+import argparse
+from app.batch_segmentation import BatchSegmentationPipeline
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="YOLOv11 视频离线批量分割")
+    parser.add_argument("video", help="输入视频文件")
+    parser.add_argument("--model", default="./weights/yolo11x-seg.pt", help="模型文件路径")
+    parser.add_argument("--output", default=None, help="结果输出目录，默认为视频同名目录")
+    parser.add_argument("--batch-size", type=int, default=8, help="每批推理的帧数")
+    parser.add_argument("--prefetch", type=int, default=64, help="解码预取队列长度")
+    parser.add_argument("--mask-format", choices=["none", "rle", "polygon"], default="none",
+                        help="结果中掩码的编码方式")
+    parser.add_argument("--binary", action="store_true", help="输出紧凑二进制记录流而不是JSON lines")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"警告: 未找到模型文件 {args.model}")
+        return
+
+    output_dir = args.output or os.path.splitext(args.video)[0] + "_segmentation"
+
+    pipeline = BatchSegmentationPipeline(args.model, batch_size=args.batch_size,
+                                         prefetch=args.prefetch, mask_format=args.mask_format,
+                                         output_format="binary" if args.binary else "jsonl")
+    if not pipeline.initialize():
+        print("模型初始化失败")
+        return
+    pipeline.process_video(args.video, output_dir)
+
+if __name__ == "__main__":
+    main()
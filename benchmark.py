@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+
+"""
+YOLOv11 性能基准测试入口 - 无需相机和GPU
+"""
+
+import os
+import sys
+import argparse
+
+from benchmarks import (COMPONENTS, run_components, default_scenes, load_recorded_scene, bench_pipeline,
+                        save_results, load_results, print_comparison)
+from benchmarks.synthetic import MASKS_PROTO, MASKS_BOX
+from utils.pipeline import POLICY_BLOCK
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="YOLOv11 组件与端到端性能基准测试")
+    parser.add_argument("--model", default="./weights/yolo11x-seg.pt",
+                        help="模型文件路径，不存在时跳过模型推理和完整流水线两项")
+    parser.add_argument("--components", default=",".join(COMPONENTS),
+                        help=f"要运行的基准项，逗号分隔，可选 {','.join(COMPONENTS)}")
+    parser.add_argument("--instances", default="1,3,8", help="合成帧中的人数，逗号分隔，每个人数各测一组")
+    parser.add_argument("--masks", choices=[MASKS_PROTO, MASKS_BOX], default=MASKS_PROTO,
+                        help="合成分割结果的掩码形式：原型掩码数组或紧凑BoxMask")
+    parser.add_argument("--recording", default=None,
+                        help="使用录制数据目录（ReplaySource格式）代替合成彩色/深度帧")
+    parser.add_argument("--imgsz", type=int, default=320, help="推理尺寸")
+    parser.add_argument("--iterations", type=int, default=100, help="每项组件基准的计时次数")
+    parser.add_argument("--warmup", type=int, default=5, help="计时前的预热次数")
+    parser.add_argument("--alloc-iterations", type=int, default=20,
+                        help="测量每帧内存分配的次数（tracemalloc，与计时分开），0表示跳过")
+    parser.add_argument("--pipeline-frames", type=int, default=120, help="完整流水线处理的帧数")
+    parser.add_argument("--output", default="benchmarks/results/latest.json", help="结果JSON文件")
+    parser.add_argument("--baseline", default=None, help="用于比较的基线结果JSON，出现回归时以状态码1退出")
+    parser.add_argument("--threshold", type=float, default=0.1, help="判定回归的相对变化阈值")
+    args = parser.parse_args()
+
+    components = [name.strip() for name in args.components.split(",") if name.strip()]
+    unknown = [name for name in components if name not in COMPONENTS]
+    if unknown:
+        print(f"未知的基准项: {','.join(unknown)}")
+        return 2
+    instance_counts = [int(count) for count in args.instances.split(",") if count.strip()]
+
+    model_available = os.path.exists(args.model)
+    if not model_available and ('segment' in components or 'pipeline' in components):
+        print(f"警告: 未找到模型文件 {args.model}，跳过模型推理和完整流水线基准")
+
+    if args.recording:
+        scenes = [load_recorded_scene(args.recording, 0, count, args.masks, args.imgsz)
+                  for count in instance_counts]
+        if any(scene is None for scene in scenes):
+            return 2
+    else:
+        scenes = default_scenes(instance_counts, args.masks, args.imgsz)
+
+    segmentor = None
+    if 'segment' in components and model_available:
+        from segmentation.yolov11_segmentation import YOLOv11Segmentation
+        segmentor = YOLOv11Segmentation(args.model, imgsz=args.imgsz)
+        if not segmentor.initialize(scenes[0].color.shape if scenes else None):
+            segmentor = None
+
+    results = run_components(components, scenes, segmentor, args.iterations, args.warmup,
+                             args.alloc_iterations)
+    if 'pipeline' in components and model_available:
+        for count in (instance_counts if not args.recording else instance_counts[:1]):
+            result = bench_pipeline(args.model, args.pipeline_frames, count, args.recording,
+                                    {"imgsz": args.imgsz, "drop_policy": POLICY_BLOCK})
+            if result is not None:
+                results.append(result)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    report = save_results(args.output, results, config)
+    if args.baseline:
+        regressions = print_comparison(report, load_results(args.baseline), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+from .synthetic import SyntheticScene, make_scene, write_recording, load_recorded_scene
+from .harness import measure, save_results, load_results, compare_results, print_comparison
+from .suites import (COMPONENTS, bench_segment_frame, bench_draw_segmentation, bench_depth_colormap,
+                     bench_depth_stats, bench_pipeline, run_components, default_scenes)
+
+__all__ = ['SyntheticScene', 'make_scene', 'write_recording', 'load_recorded_scene',
+           'measure', 'save_results', 'load_results', 'compare_results', 'print_comparison',
+           'COMPONENTS', 'bench_segment_frame', 'bench_draw_segmentation', 'bench_depth_colormap',
+           'bench_depth_stats', 'bench_pipeline', 'run_components', 'default_scenes']
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+基准测试计时 - 延迟分位数、吞吐量、峰值RSS、每帧内存分配，结果以JSON保存并与基线比较
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+def latency_summary(latencies_ms):
+    """延迟样本的统计摘要（毫秒）"""
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+def measure_allocations(fn, iterations):
+    """用tracemalloc测量每次调用的峰值分配量和净增长（KB）
+
+    tracemalloc会明显拖慢被测代码，因此与计时分开进行。numpy数组（包括OpenCV
+    返回的数组）的内存分配都会被跟踪。
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        fn()
+        start_current, _ = tracemalloc.get_traced_memory()
+        peaks = []
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        end_current, _ = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return {
+        "alloc_kb_per_frame": round(float(np.mean(peaks)) / 1024.0, 1),
+        "retained_kb": round((end_current - start_current) / 1024.0, 1),
+    }
+
+def measure(name, fn, iterations=100, warmup=5, alloc_iterations=20, params=None):
+    """重复调用fn并返回一个基准结果字典
+
+    fn每次调用处理一帧；先调用warmup次不计时，再计时iterations次，
+    最后另行测量alloc_iterations次的内存分配（为0时跳过）。
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - call_start) * 1000.0)
+    elapsed = time.perf_counter() - start
+    result = {
+        "name": name,
+        "params": params or {},
+        "iterations": iterations,
+        "latency_ms": latency_summary(latencies),
+        "throughput_fps": round(iterations / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    if alloc_iterations > 0:
+        result.update(measure_allocations(fn, alloc_iterations))
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(format_result(result))
+    return result
+
+def format_result(result):
+    """单条结果的一行文本"""
+    latency = result["latency_ms"]
+    text = (f"{result['name']:<36} p50 {latency['p50']:8.2f}ms  p95 {latency['p95']:8.2f}ms  "
+            f"p99 {latency['p99']:8.2f}ms  {result['throughput_fps']:8.1f} FPS")
+    if "alloc_kb_per_frame" in result:
+        text += f"  alloc {result['alloc_kb_per_frame']:.0f}KB/帧"
+    if result.get("peak_rss_mb") is not None:
+        text += f"  RSS峰值 {result['peak_rss_mb']:.0f}MB"
+    return text
+
+def environment_info():
+    """记录运行环境，便于判断两次结果是否可比"""
+    import cv2
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        info["torch"] = getattr(torch, "__version__", None)
+        if hasattr(torch, "cuda"):
+            info["cuda"] = bool(torch.cuda.is_available())
+    return info
+
+def save_results(path, results, config=None):
+    """以JSON保存一次运行的全部结果"""
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment_info(),
+        "config": config or {},
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"基准结果已保存: {path}")
+    return report
+
+def load_results(path):
+    """读取save_results保存的结果"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def result_key(result):
+    """用于在两次运行之间匹配同一项基准的键"""
+    params = ",".join(f"{k}={v}" for k, v in sorted(result.get("params", {}).items()))
+    return f"{result['name']}[{params}]"
+
+def compare_results(current, baseline, threshold=0.1):
+    """与基线比较，返回回归列表[(基准, 指标, 基线值, 当前值, 变化比例)]
+
+    延迟（p50/p95）和每帧分配量变大、吞吐量变小超过threshold比例视为回归。
+    """
+    baseline_results = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        key = result_key(result)
+        old = baseline_results.get(key)
+        if old is None:
+            continue
+        checks = [
+            ("p50_ms", old["latency_ms"]["p50"], result["latency_ms"]["p50"], 1),
+            ("p95_ms", old["latency_ms"]["p95"], result["latency_ms"]["p95"], 1),
+            ("throughput_fps", old["throughput_fps"], result["throughput_fps"], -1),
+        ]
+        if "alloc_kb_per_frame" in old and "alloc_kb_per_frame" in result:
+            checks.append(("alloc_kb_per_frame", old["alloc_kb_per_frame"], result["alloc_kb_per_frame"], 1))
+        for metric, old_value, new_value, direction in checks:
+            if not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if change * direction > threshold:
+                regressions.append((key, metric, old_value, new_value, change))
+    return regressions
+
+def print_comparison(current, baseline, threshold=0.1):
+    """打印与基线的逐项对比，返回回归列表"""
+    baseline_results = {result_key(r): r for r in baseline.get("results", [])}
+    print(f"与基线对比（{baseline.get('timestamp', '未知时间')}）:")
+    for result in current.get("results", []):
+        old = baseline_results.get(result_key(result))
+        if old is None:
+            print(f"  {result_key(result):<48} 基线中没有该项")
+            continue
+        old_p50, new_p50 = old["latency_ms"]["p50"], result["latency_ms"]["p50"]
+        change = (new_p50 - old_p50) / old_p50 * 100.0 if old_p50 else 0.0
+        print(f"  {result_key(result):<48} p50 {old_p50:.2f} → {new_p50:.2f}ms ({change:+.1f}%)")
+    regressions = compare_results(current, baseline, threshold)
+    if regressions:
+        print(f"发现 {len(regressions)} 项回归（阈值 {threshold * 100:.0f}%）:")
+        for key, metric, old_value, new_value, change in regressions:
+            print(f"  {key} {metric}: {old_value} → {new_value} ({change * 100:+.1f}%)")
+    else:
+        print("未发现回归")
+    return regressions
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+基准测试项 - 模型推理、分割结果渲染、深度图着色、实例深度统计和完整流水线
+"""
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from segmentation.segmentation_visualizer import SegmentationVisualizer
+from segmentation.depth_statistics import compute_instance_depth_stats
+from .harness import measure, peak_rss_mb
+from .synthetic import make_scene, write_recording
+
+COMPONENTS = ['segment', 'draw', 'colormap', 'depth_stats', 'pipeline']
+
+def bench_segment_frame(segmentor, scene, iterations=50, warmup=5, alloc_iterations=10):
+    """YOLOv11Segmentation.segment_frame（模型已初始化）"""
+    params = {"instances": scene.num_instances, "imgsz": segmentor.imgsz,
+              "width": scene.color.shape[1], "height": scene.color.shape[0]}
+    return measure("segment_frame", lambda: segmentor.segment_frame(scene.color), iterations, warmup,
+                   alloc_iterations, params)
+
+def bench_draw_segmentation(scene, iterations=200, warmup=10, alloc_iterations=20):
+    """SegmentationVisualizer.draw_segmentation（掩码合成和标签，深度统计与流水线一样预先算好）"""
+    visualizer = SegmentationVisualizer()
+    _, masks, boxes, classes, confidences, class_names = scene.result
+    depth_stats = compute_instance_depth_stats(scene.depth, masks, boxes, scene.depth_scale)
+    canvas = scene.color.copy()
+    fps_info = {"Camera FPS": "30.0", "Processing FPS": "30.0", "Persons": int(np.count_nonzero(classes == 0))}
+
+    def run():
+        np.copyto(canvas, scene.color)
+        visualizer.draw_segmentation(canvas, masks, boxes, classes, confidences, class_names,
+                                     scene.depth_frame, fps_info, depth_stats, in_place=True)
+
+    params = {"instances": scene.num_instances, "masks": mask_kind(masks)}
+    return measure("draw_segmentation", run, iterations, warmup, alloc_iterations, params)
+
+def bench_depth_colormap(scene, iterations=200, warmup=10, alloc_iterations=20):
+    """SegmentationVisualizer.create_depth_colormap"""
+    visualizer = SegmentationVisualizer()
+    params = {"width": scene.depth.shape[1], "height": scene.depth.shape[0]}
+    return measure("create_depth_colormap", lambda: visualizer.create_depth_colormap(scene.depth_frame),
+                   iterations, warmup, alloc_iterations, params)
+
+def bench_depth_stats(scene, iterations=200, warmup=10, alloc_iterations=20):
+    """compute_instance_depth_stats"""
+    _, masks, boxes, _, _, _ = scene.result
+    params = {"instances": scene.num_instances, "masks": mask_kind(masks)}
+    return measure("compute_instance_depth_stats",
+                   lambda: compute_instance_depth_stats(scene.depth, masks, boxes, scene.depth_scale),
+                   iterations, warmup, alloc_iterations, params)
+
+def bench_pipeline(model_path, num_frames=120, num_instances=3, recording=None, app_options=None):
+    """完整流水线：回放源→推理→后处理→渲染，无界面、不限速运行
+
+    recording为None时先写出一段合成录制数据。延迟取流水线的端到端延迟
+    （采集完成到输出），吞吐量为持续帧率。app_options传给InstanceSegmentationApp，
+    例如drop_policy='block'使每一帧都被处理。
+    """
+    from app.instance_segmentation_app import InstanceSegmentationApp
+    from camera.replay_source import ReplaySource
+
+    temp_dir = None
+    if recording is None:
+        temp_dir = tempfile.mkdtemp(prefix="yolo11_bench_")
+        recording = write_recording(temp_dir, num_frames, num_instances)
+    try:
+        app = InstanceSegmentationApp(model_path, frame_source=ReplaySource(recording, fps=0), headless=True,
+                                      **(app_options or {}))
+        report = app.run_headless(max_frames=num_frames)
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    if report is None:
+        return None
+
+    end_to_end = report["metrics"]["latency_ms"].get("end_to_end")
+    latency = {key: 0.0 for key in ("mean", "p50", "p95", "p99", "max")}
+    if end_to_end is not None:
+        latency = {key: round(end_to_end[key], 3) for key in ("mean", "p50", "p95", "p99", "max")}
+    params = {"frames": num_frames, "recorded": temp_dir is None}
+    if temp_dir is not None:
+        params["instances"] = num_instances
+    params.update({key: str(value) for key, value in (app_options or {}).items()})
+    return {
+        "name": "pipeline",
+        "params": params,
+        "iterations": report["frames"],
+        "latency_ms": latency,
+        "throughput_fps": round(report["sustained_fps"], 2),
+        "captured_frames": report["captured_frames"],
+        "stage_latency_ms": {name: round(summary["p50"], 3)
+                             for name, summary in report["metrics"]["latency_ms"].items()},
+        "startup": report.get("startup"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def mask_kind(masks):
+    """掩码形式：原型数组或BoxMask列表"""
+    return "proto" if isinstance(masks, np.ndarray) else "box"
+
+def run_components(components, scenes, segmentor=None, iterations=100, warmup=5, alloc_iterations=20):
+    """在每个场景上运行选定的组件基准，返回结果列表"""
+    results = []
+    for scene in scenes:
+        if 'segment' in components and segmentor is not None:
+            results.append(bench_segment_frame(segmentor, scene, max(10, iterations // 4), warmup,
+                                               min(alloc_iterations, 10)))
+        if 'draw' in components:
+            results.append(bench_draw_segmentation(scene, iterations, warmup, alloc_iterations))
+        if 'depth_stats' in components:
+            results.append(bench_depth_stats(scene, iterations, warmup, alloc_iterations))
+    if 'colormap' in components and scenes:
+        # 深度图着色与人数无关，只测一次
+        results.append(bench_depth_colormap(scenes[0], iterations, warmup, alloc_iterations))
+    return results
+
+def default_scenes(instance_counts, mask_format, imgsz=320, seed=0):
+    """每个人数一帧合成数据"""
+    return [make_scene(count, seed=seed, mask_format=mask_format, imgsz=imgsz) for count in instance_counts]
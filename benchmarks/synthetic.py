@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+合成测试数据 - 带指定人数的848x480彩色/深度帧以及对应的分割结果
+"""
+
+import os
+import json
+
+import cv2
+import numpy as np
+
+from camera.frame_source import DepthFrame
+from segmentation.mask_utils import BoxMask, letterbox_params
+
+MASKS_PROTO = 'proto'  # 原型分辨率掩码数组，与模型默认输出一致
+MASKS_BOX = 'box'      # BoxMask列表，与compact_masks模式一致
+
+class SyntheticScene:
+    """一帧合成数据：彩色图、深度图和与segment_frame格式相同的分割结果"""
+
+    def __init__(self, color, depth, result, depth_scale=0.001):
+        self.color = color
+        self.depth = depth
+        self.depth_frame = DepthFrame(depth, depth_scale)
+        self.result = result
+        self.depth_scale = depth_scale
+
+    @property
+    def num_instances(self):
+        return len(self.result[2])
+
+def person_layout(num_instances, width, height, rng, shift=0):
+    """随机生成num_instances个人的(中心x, 脚底y, 身高像素, 距离米)，shift为整体水平平移"""
+    people = []
+    for i in range(num_instances):
+        distance = rng.uniform(1.2, 4.5)
+        body_height = int(min(height * 0.9, 900.0 / distance))
+        center_x = int((width * (i + 0.5) / max(num_instances, 1) + rng.uniform(-30, 30) + shift) % width)
+        foot_y = int(min(height - 1, height * 0.55 + body_height * 0.5))
+        people.append((center_x, foot_y, body_height, distance))
+    # 远处的人先画，近处的人遮挡远处的人
+    people.sort(key=lambda p: -p[3])
+    return people
+
+def draw_person(canvas, center_x, foot_y, body_height, value):
+    """用椭圆躯干和圆形头部画一个人形"""
+    head = max(4, body_height // 10)
+    body_w = max(6, body_height // 6)
+    head_y = foot_y - body_height + head
+    cv2.ellipse(canvas, (center_x, (head_y + head + foot_y) // 2), (body_w, (foot_y - head_y - head) // 2),
+                0, 0, 360, value, -1)
+    cv2.circle(canvas, (center_x, head_y), head, value, -1)
+
+def make_scene(num_instances=3, width=848, height=480, seed=0, shift=0, mask_format=MASKS_PROTO,
+               imgsz=320, depth_scale=0.001, hole_ratio=0.03):
+    """生成一帧合成数据
+
+    背景为带纹理的渐变和远处墙面深度，人形在彩色图上为随机颜色、在深度图上为对应距离，
+    深度图含hole_ratio比例的无效（0）像素。分割结果的掩码为人形的可见部分。
+    """
+    rng = np.random.default_rng(seed)
+    color = np.empty((height, width, 3), dtype=np.uint8)
+    color[:] = np.linspace(40, 200, width, dtype=np.uint8)[None, :, None]
+    color = cv2.add(color, rng.integers(0, 40, (height, width, 3), dtype=np.uint8))
+    depth = np.tile(np.linspace(4500, 6000, height, dtype=np.float32)[:, None], (1, width))
+    depth = (depth / (depth_scale * 1000.0)).astype(np.uint16)
+
+    layout = person_layout(num_instances, width, height, np.random.default_rng(seed + 1), shift)
+    labels = np.zeros((height, width), dtype=np.int32)
+    for index, (center_x, foot_y, body_height, distance) in enumerate(layout, start=1):
+        draw_person(labels, center_x, foot_y, body_height, index)
+        person_color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        draw_person(color, center_x, foot_y, body_height, person_color)
+        draw_person(depth, center_x, foot_y, body_height, int(distance / depth_scale))
+    depth[rng.random((height, width)) < hole_ratio] = 0
+
+    boxes = []
+    full_masks = []
+    for index in range(1, len(layout) + 1):
+        mask = labels == index
+        ys, xs = np.nonzero(mask)
+        if ys.size == 0:
+            continue
+        boxes.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+        full_masks.append(mask)
+    count = len(boxes)
+    boxes = np.array(boxes, dtype=np.float32).reshape(count, 4)
+    classes = np.zeros(count, dtype=np.float32)
+    confidences = rng.uniform(0.5, 0.95, count).astype(np.float32)
+
+    if mask_format == MASKS_BOX:
+        masks = [BoxMask(int(x1), int(y1), m[int(y1):int(y2), int(x1):int(x2)])
+                 for m, (x1, y1, x2, y2) in zip(full_masks, boxes)]
+    else:
+        masks = proto_masks(full_masks, (height, width), imgsz)
+    result = (color, masks, boxes, classes, confidences, {0: "person"})
+    return SyntheticScene(color, depth, result, depth_scale)
+
+def proto_masks(full_masks, frame_shape, imgsz=320, stride=32):
+    """把整帧掩码缩放到模型输出的原型分辨率（letterbox，短边按stride对齐）"""
+    height, width = frame_shape
+    gain = imgsz / max(height, width)
+    mask_h = int(np.ceil(height * gain / stride) * stride)
+    mask_w = int(np.ceil(width * gain / stride) * stride)
+    gain, pad_x, pad_y = letterbox_params((mask_h, mask_w), frame_shape)
+    scaled_w, scaled_h = int(round(width * gain)), int(round(height * gain))
+    protos = np.zeros((len(full_masks), mask_h, mask_w), dtype=np.float32)
+    for proto, mask in zip(protos, full_masks):
+        scaled = cv2.resize(mask.astype(np.float32), (scaled_w, scaled_h), interpolation=cv2.INTER_LINEAR)
+        proto[pad_y:pad_y + scaled_h, pad_x:pad_x + scaled_w] = scaled[:mask_h - pad_y, :mask_w - pad_x]
+    return protos
+
+def write_recording(path, num_frames=120, num_instances=3, width=848, height=480, seed=0,
+                    depth_scale=0.001, speed=4):
+    """写出ReplaySource可读取的内存映射格式录制数据，人形每帧水平移动speed像素"""
+    os.makedirs(path, exist_ok=True)
+    color = np.lib.format.open_memmap(os.path.join(path, "color.npy"), mode="w+", dtype=np.uint8,
+                                      shape=(num_frames, height, width, 3))
+    depth = np.lib.format.open_memmap(os.path.join(path, "depth.npy"), mode="w+", dtype=np.uint16,
+                                      shape=(num_frames, height, width))
+    for i in range(num_frames):
+        scene = make_scene(num_instances, width, height, seed, shift=i * speed, depth_scale=depth_scale)
+        color[i] = scene.color
+        depth[i] = scene.depth
+    color.flush()
+    depth.flush()
+    del color, depth
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"depth_scale": depth_scale}, f)
+    return path
+
+def load_recorded_scene(path, index=0, num_instances=3, mask_format=MASKS_PROTO, imgsz=320):
+    """取录制数据中的一帧彩色/深度图，分割结果仍为合成人形（不依赖模型）"""
+    from camera.replay_source import ReplaySource
+    source = ReplaySource(path, fps=0)
+    if not source.initialize():
+        return None
+    color, depth = source.read_frame(index % source.num_frames)
+    height, width = color.shape[:2]
+    synthetic = make_scene(num_instances, width, height, mask_format=mask_format, imgsz=imgsz,
+                           depth_scale=source.depth_scale)
+    color = np.ascontiguousarray(color)
+    result = (color,) + synthetic.result[1:]
+    return SyntheticScene(color, np.ascontiguousarray(depth), result, source.depth_scale)
@@ -1,9 +1,14 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-from .realsense_d455 import RealSenseD455
-
-__all__ = ['RealSenseD455']
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+from .frame_source import FrameSource, DepthFrame
+from .frame_pool import FrameBuffer, FrameBufferPool
+from .stream_geometry import StreamGeometry
+from .replay_source import ReplaySource
+from .realsense_d455 import RealSenseD455
+
+__all__ = ['FrameSource', 'DepthFrame', 'FrameBuffer', 'FrameBufferPool', 'StreamGeometry',
+           'ReplaySource', 'RealSenseD455']
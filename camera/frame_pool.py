@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+预分配帧缓冲池 - 采集直接写入池中缓冲，下游阶段借用后归还
+"""
+
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+from .frame_source import DepthFrame
+
+class FrameBuffer:
+    """池中的一组预分配彩色/深度缓冲"""
+
+    def __init__(self, pool, index, width, height, depth_scale=0.001, color=None, depth=None):
+        self.pool = pool
+        self.index = index
+        self.color = color if color is not None else np.zeros((height, width, 3), dtype=np.uint8)
+        self.depth = depth if depth is not None else np.zeros((height, width), dtype=np.uint16)
+        self.depth_frame = DepthFrame(self.depth, depth_scale)
+        self.timestamp = 0.0
+        self.in_use = False
+
+    def release(self):
+        """归还到缓冲池"""
+        self.pool.release(self)
+
+class FrameBufferPool:
+    """固定大小的帧缓冲池
+
+    整个运行期间只分配size组缓冲，内存占用恒定。缓冲被借出后由持有者负责归还，
+    流水线中被丢弃的帧通过on_drop回调归还。
+
+    shared为True时所有缓冲分配在一块共享内存中，工作进程按缓冲序号直接访问，
+    帧数据跨进程传递时无需序列化。
+    """
+
+    def __init__(self, width, height, size=12, depth_scale=0.001, shared=False):
+        self.width = width
+        self.height = height
+        self.shm = None
+        if shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=size * shared_frame_bytes(width, height))
+            self.buffers = []
+            for i in range(size):
+                color, depth = shared_frame_views(self.shm.buf, i, width, height)
+                self.buffers.append(FrameBuffer(self, i, width, height, depth_scale, color, depth))
+        else:
+            self.buffers = [FrameBuffer(self, i, width, height, depth_scale) for i in range(size)]
+        self.free = list(self.buffers)
+        self.condition = threading.Condition()
+        self.misses = 0
+
+    def acquire(self, timeout=None):
+        """借出一个空闲缓冲，超时返回None"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.free, timeout):
+                self.misses += 1
+                return None
+            buffer = self.free.pop()
+            buffer.in_use = True
+            return buffer
+
+    def release(self, buffer):
+        """归还缓冲，重复归还会被忽略"""
+        with self.condition:
+            if not buffer.in_use:
+                return
+            buffer.in_use = False
+            self.free.append(buffer)
+            self.condition.notify()
+
+    def available(self):
+        """当前空闲缓冲数量"""
+        with self.condition:
+            return len(self.free)
+
+    @property
+    def shm_name(self):
+        """共享内存名称，非共享缓冲池为None"""
+        return self.shm.name if self.shm is not None else None
+
+    def close(self):
+        """释放共享内存（调用后不得再访问缓冲）
+
+        需在使用缓冲的工作进程全部退出后调用；先丢弃缓冲上的数组视图，再关闭共享内存。
+        """
+        if self.shm is not None:
+            for buffer in self.buffers:
+                buffer.color = buffer.depth = buffer.depth_frame = None
+            self.buffers = []
+            self.free = []
+            close_shared_memory(self.shm, unlink=True)
+            self.shm = None
+
+    def __len__(self):
+        return len(self.buffers)
+
+def shared_frame_bytes(width, height):
+    """共享缓冲池中每组彩色+深度缓冲占用的字节数"""
+    return height * width * 3 + height * width * 2
+
+def shared_frame_views(buf, index, width, height):
+    """共享内存中第index组缓冲的(彩色, 深度)数组视图"""
+    offset = index * shared_frame_bytes(width, height)
+    color = np.ndarray((height, width, 3), dtype=np.uint8, buffer=buf, offset=offset)
+    depth = np.ndarray((height, width), dtype=np.uint16, buffer=buf, offset=offset + height * width * 3)
+    return color, depth
+
+def close_shared_memory(shm, unlink=False):
+    """关闭共享内存，unlink为True时同时删除
+
+    仍有数组视图引用共享内存时close会抛出BufferError，此时只打印警告，
+    映射在这些视图被回收后释放，名称照常删除。
+    """
+    try:
+        shm.close()
+    except BufferError:
+        print(f"共享内存 {shm.name} 仍被数组视图引用，延迟到视图回收后释放")
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+帧源接口 - 相机与回放源的统一抽象
+"""
+
+import numpy as np
+
+class DepthFrame:
+    """基于numpy数组的深度帧，接口与pyrealsense2的depth_frame保持一致"""
+
+    def __init__(self, depth_image, depth_scale=0.001):
+        self.depth_image = depth_image
+        self.depth_scale = depth_scale
+
+    def get_data(self):
+        """获取原始uint16深度数据"""
+        return self.depth_image
+
+    def get_units(self):
+        """获取深度单位（米/单位）"""
+        return self.depth_scale
+
+    def get_width(self):
+        return self.depth_image.shape[1]
+
+    def get_height(self):
+        return self.depth_image.shape[0]
+
+    def get_distance(self, x, y):
+        """获取指定像素的距离（米）"""
+        height, width = self.depth_image.shape[:2]
+        if 0 <= x < width and 0 <= y < height:
+            return float(self.depth_image[y, x]) * self.depth_scale
+        return 0.0
+
+class FrameSource:
+    """帧源基类 - 所有相机和回放源都实现该接口"""
+
+    def __init__(self, width=848, height=480, fps=30):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.depth_scale = 0.001
+        # 可选的MetricsRegistry，用于记录帧源内部步骤（如对齐）的耗时
+        self.metrics = None
+        # 深度图未对齐到彩色图时为StreamGeometry，深度统计据此按实例投影
+        self.geometry = None
+
+    def initialize(self):
+        """初始化帧源，成功返回True"""
+        raise NotImplementedError
+
+    def get_frames(self):
+        """获取一帧数据，返回(彩色图像, 深度帧)，失败时返回(None, None)"""
+        raise NotImplementedError
+
+    def read_into(self, buffer):
+        """将一帧数据写入预分配的FrameBuffer，成功返回True
+
+        默认实现基于get_frames，子类可覆盖以直接从底层数据拷贝，每帧只拷贝一次
+        """
+        color_image, depth_frame = self.get_frames()
+        if color_image is None or depth_frame is None:
+            return False
+        np.copyto(buffer.color, color_image)
+        np.copyto(buffer.depth, np.asanyarray(depth_frame.get_data()))
+        buffer.depth_frame.depth_scale = self.depth_scale
+        return True
+
+    def is_finished(self):
+        """帧源是否已耗尽（实时相机永远返回False）"""
+        return False
+
+    def stop(self):
+        """停止帧源"""
+        pass
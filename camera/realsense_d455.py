@@ -1,158 +1,244 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-"""
-RealSense D455相机控制类
-"""
-
-import cv2
-import numpy as np
-import pyrealsense2 as rs
-
-class RealSenseD455:
-    """RealSense D455相机控制类 - 修复版本"""
-    
-    def __init__(self, width=848, height=480, fps=30):  # 使用D455支持的常见配置
-        self.width = width
-        self.height = height
-        self.fps = fps
-        self.pipeline = None
-        self.config = None
-        self.align = None
-        self.running = False
-        
-    def initialize(self):
-        """初始化RealSense相机"""
-        try:
-            # 检查设备连接
-            ctx = rs.context()
-            devices = ctx.query_devices()
-            if len(devices) == 0:
-                print("未检测到RealSense设备")
-                return False
-                
-            print(f"检测到RealSense设备: {devices[0].get_info(rs.camera_info.name)}")
-            
-            # 创建管道和配置
-            self.pipeline = rs.pipeline()
-            self.config = rs.config()
-            
-            # 启用彩色和深度流 - 使用D455支持的配置
-            # D455通常支持848x480 @ 30fps 或 1280x720 @ 30fps
-            print(f"尝试配置: 彩色流 {self.width}x{self.height} @ {self.fps}fps")
-            self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
-            print(f"尝试配置: 深度流 {self.width}x{self.height} @ {self.fps}fps")
-            self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
-            
-            # 创建对齐对象（将深度图对齐到彩色图）
-            self.align = rs.align(rs.stream.color)
-            
-            # 尝试启动管道
-            print("启动RealSense管道...")
-            profile = self.pipeline.start(self.config)
-            
-            # 获取深度传感器并设置参数
-            depth_sensor = profile.get_device().first_depth_sensor()
-            if depth_sensor.supports(rs.option.depth_units):
-                depth_sensor.set_option(rs.option.depth_units, 0.001)  # 设置深度单位为米
-            
-            print("RealSense D455初始化成功")
-            print(f"分辨率: {self.width}x{self.height}, FPS: {self.fps}")
-            return True
-            
-        except Exception as e:
-            print(f"RealSense初始化失败: {e}")
-            # 尝试备用配置
-            return self.try_alternative_configs()
-    
-    def try_alternative_configs(self):
-        """尝试备用配置"""
-        alternative_configs = [
-            (640, 480, 30),   # 640x480 @ 30fps
-            (1280, 720, 30),  # 1280x720 @ 30fps
-            (848, 480, 15),   # 848x480 @ 15fps
-            (640, 480, 15),   # 640x480 @ 15fps
-        ]
-        
-        for width, height, fps in alternative_configs:
-            try:
-                print(f"尝试备用配置: {width}x{height} @ {fps}fps")
-                
-                # 创建新的配置
-                self.config = rs.config()
-                self.config.enable_stream(rs.stream.color, width, height, rs.format.bgr8, fps)
-                self.config.enable_stream(rs.stream.depth, width, height, rs.format.z16, fps)
-                
-                # 启动管道
-                profile = self.pipeline.start(self.config)
-                
-                # 更新参数
-                self.width = width
-                self.height = height
-                self.fps = fps
-                
-                print(f"备用配置成功: {width}x{height} @ {fps}fps")
-                return True
-                
-            except Exception as e:
-                print(f"备用配置 {width}x{height} @ {fps}fps 失败: {e}")
-                continue
-        
-        print("所有配置尝试均失败")
-        return False
-    
-    def get_frames(self):
-        """获取对齐的彩色和深度帧"""
-        if not self.pipeline:
-            return None, None
-            
-        try:
-            # 等待帧
-            frames = self.pipeline.wait_for_frames()
-            
-            # 对齐深度帧到彩色帧
-            aligned_frames = self.align.process(frames)
-            
-            # 获取对齐后的帧
-            color_frame = aligned_frames.get_color_frame()
-            depth_frame = aligned_frames.get_depth_frame()
-            
-            if not color_frame or not depth_frame:
-                return None, None
-                
-            # 转换为numpy数组
-            color_image = np.asanyarray(color_frame.get_data())
-            depth_image = np.asanyarray(depth_frame.get_data())
-            
-            return color_image, depth_frame  # 返回深度帧对象而不是numpy数组
-            
-        except Exception as e:
-            print(f"获取帧失败: {e}")
-            return None, None
-    
-    def get_depth_at_point(self, depth_frame, x, y):
-        """获取指定点的深度值（米）"""
-        if 0 <= x < self.width and 0 <= y < self.height:
-            try:
-                return depth_frame.get_distance(x, y)
-            except:
-                return 0.0
-        return 0.0
-    
-    def get_depth_map(self, depth_frame):
-        """获取深度图的可视化"""
-        depth_image = np.asanyarray(depth_frame.get_data())
-        depth_colormap = cv2.applyColorMap(
-            cv2.convertScaleAbs(depth_image, alpha=0.03), 
-            cv2.COLORMAP_JET
-        )
-        return depth_colormap
-    
-    def stop(self):
-        """停止相机"""
-        self.running = False
-        if self.pipeline:
-            self.pipeline.stop()
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+"""
+RealSense D455相机控制类
+"""
+
+import time
+import numpy as np
+
+from .frame_source import FrameSource
+from .stream_geometry import StreamGeometry
+from utils.depth_colorizer import DepthColorizer
+
+# pyrealsense2在首次打开相机时才导入，只做回放/批处理时不加载SDK
+rs = None
+
+def import_realsense():
+    """导入pyrealsense2（只导入一次）"""
+    global rs
+    if rs is None:
+        import pyrealsense2
+        rs = pyrealsense2
+    return rs
+
+class RealSenseD455(FrameSource):
+    """RealSense D455相机控制类 - 修复版本"""
+    
+    def __init__(self, width=848, height=480, fps=30, serial=None, align=True):  # 使用D455支持的常见配置
+        super().__init__(width, height, fps)
+        # 多台相机时按序列号打开指定设备，None表示第一台
+        self.serial = serial
+        # align为False时跳过整帧深度对齐，深度统计改为只投影实例区域内的像素
+        self.align_enabled = align
+        self.pipeline = None
+        self.config = None
+        self.align = None
+        self.running = False
+        self.depth_colorizer = None
+        
+    def initialize(self):
+        """初始化RealSense相机"""
+        import_realsense()
+        try:
+            # 检查设备连接
+            ctx = rs.context()
+            devices = ctx.query_devices()
+            if len(devices) == 0:
+                print("未检测到RealSense设备")
+                return False
+                
+            device = devices[0]
+            if self.serial is not None:
+                matched = [d for d in devices if d.get_info(rs.camera_info.serial_number) == self.serial]
+                if not matched:
+                    print(f"未找到序列号为 {self.serial} 的RealSense设备")
+                    return False
+                device = matched[0]
+            self.serial = device.get_info(rs.camera_info.serial_number)
+            print(f"检测到RealSense设备: {device.get_info(rs.camera_info.name)} ({self.serial})")
+            
+            # 创建管道和配置
+            self.pipeline = rs.pipeline()
+            self.config = rs.config()
+            self.config.enable_device(self.serial)
+            
+            # 启用彩色和深度流 - 使用D455支持的配置
+            # D455通常支持848x480 @ 30fps 或 1280x720 @ 30fps
+            print(f"尝试配置: 彩色流 {self.width}x{self.height} @ {self.fps}fps")
+            self.config.enable_stream(rs.stream.color, self.width, self.height, rs.format.bgr8, self.fps)
+            print(f"尝试配置: 深度流 {self.width}x{self.height} @ {self.fps}fps")
+            self.config.enable_stream(rs.stream.depth, self.width, self.height, rs.format.z16, self.fps)
+            
+            # 创建对齐对象（将深度图对齐到彩色图）
+            if self.align_enabled:
+                self.align = rs.align(rs.stream.color)
+            
+            # 尝试启动管道
+            print("启动RealSense管道...")
+            profile = self.pipeline.start(self.config)
+            
+            # 获取深度传感器并设置参数
+            depth_sensor = profile.get_device().first_depth_sensor()
+            if depth_sensor.supports(rs.option.depth_units):
+                depth_sensor.set_option(rs.option.depth_units, 0.001)  # 设置深度单位为米
+            self.depth_scale = depth_sensor.get_depth_scale()
+            self.setup_geometry(profile)
+            
+            print("RealSense D455初始化成功")
+            print(f"分辨率: {self.width}x{self.height}, FPS: {self.fps}")
+            return True
+            
+        except Exception as e:
+            print(f"RealSense初始化失败: {e}")
+            # 尝试备用配置
+            return self.try_alternative_configs()
+    
+    def try_alternative_configs(self):
+        """尝试备用配置"""
+        alternative_configs = [
+            (640, 480, 30),   # 640x480 @ 30fps
+            (1280, 720, 30),  # 1280x720 @ 30fps
+            (848, 480, 15),   # 848x480 @ 15fps
+            (640, 480, 15),   # 640x480 @ 15fps
+        ]
+        
+        for width, height, fps in alternative_configs:
+            try:
+                print(f"尝试备用配置: {width}x{height} @ {fps}fps")
+                
+                # 创建新的配置
+                self.config = rs.config()
+                if self.serial is not None:
+                    self.config.enable_device(self.serial)
+                self.config.enable_stream(rs.stream.color, width, height, rs.format.bgr8, fps)
+                self.config.enable_stream(rs.stream.depth, width, height, rs.format.z16, fps)
+                
+                # 启动管道
+                profile = self.pipeline.start(self.config)
+                self.depth_scale = profile.get_device().first_depth_sensor().get_depth_scale()
+                self.setup_geometry(profile)
+                
+                # 更新参数
+                self.width = width
+                self.height = height
+                self.fps = fps
+                
+                print(f"备用配置成功: {width}x{height} @ {fps}fps")
+                return True
+                
+            except Exception as e:
+                print(f"备用配置 {width}x{height} @ {fps}fps 失败: {e}")
+                continue
+        
+        print("所有配置尝试均失败")
+        return False
+    
+    def setup_geometry(self, profile):
+        """不做整帧对齐时读取两路流的内参和深度→彩色外参"""
+        if self.align_enabled:
+            self.geometry = None
+            return
+        depth_profile = profile.get_stream(rs.stream.depth).as_video_stream_profile()
+        color_profile = profile.get_stream(rs.stream.color).as_video_stream_profile()
+        intrinsics = []
+        for stream_profile in (depth_profile, color_profile):
+            i = stream_profile.get_intrinsics()
+            intrinsics.append((i.width, i.height, i.fx, i.fy, i.ppx, i.ppy))
+        extrinsics = depth_profile.get_extrinsics_to(color_profile)
+        # SDK的旋转矩阵按列存放
+        rotation = np.asarray(extrinsics.rotation, dtype=np.float64).reshape(3, 3).T
+        self.geometry = StreamGeometry(intrinsics[0], intrinsics[1], rotation, extrinsics.translation)
+        print("跳过整帧深度对齐，深度统计按实例投影")
+    
+    def get_frames(self):
+        """获取对齐的彩色和深度帧"""
+        if not self.pipeline:
+            return None, None
+            
+        try:
+            # 等待帧并对齐深度帧到彩色帧
+            color_frame, depth_frame = self.wait_for_aligned_frames()
+            if color_frame is None:
+                return None, None
+                
+            # 转换为numpy数组
+            color_image = np.asanyarray(color_frame.get_data())
+            depth_image = np.asanyarray(depth_frame.get_data())
+            
+            return color_image, depth_frame  # 返回深度帧对象而不是numpy数组
+            
+        except Exception as e:
+            print(f"获取帧失败: {e}")
+            return None, None
+    
+    def wait_for_aligned_frames(self):
+        """等待并对齐一组帧，返回SDK的(彩色帧, 深度帧)；不对齐时深度帧保持深度相机视角"""
+        frames = self.pipeline.wait_for_frames()
+        if self.align is None:
+            color_frame = frames.get_color_frame()
+            depth_frame = frames.get_depth_frame()
+            if not color_frame or not depth_frame:
+                return None, None
+            return color_frame, depth_frame
+        align_start = time.perf_counter()
+        aligned_frames = self.align.process(frames)
+        if self.metrics is not None:
+            self.metrics.observe("align", (time.perf_counter() - align_start) * 1000.0)
+        color_frame = aligned_frames.get_color_frame()
+        depth_frame = aligned_frames.get_depth_frame()
+        if not color_frame or not depth_frame:
+            return None, None
+        return color_frame, depth_frame
+    
+    def read_into(self, buffer):
+        """将对齐后的帧直接拷贝到预分配缓冲
+
+        拷贝完成后SDK帧对象随即释放，不会被下游线程长期占用
+        """
+        if not self.pipeline:
+            return False
+            
+        try:
+            color_frame, depth_frame = self.wait_for_aligned_frames()
+            if color_frame is None:
+                return False
+            np.copyto(buffer.color, np.asanyarray(color_frame.get_data()))
+            np.copyto(buffer.depth, np.asanyarray(depth_frame.get_data()))
+            buffer.depth_frame.depth_scale = self.depth_scale
+            return True
+            
+        except Exception as e:
+            print(f"获取帧失败: {e}")
+            return False
+    
+    @staticmethod
+    def list_serials():
+        """列出已连接RealSense设备的序列号"""
+        import_realsense()
+        return [d.get_info(rs.camera_info.serial_number) for d in rs.context().query_devices()]
+    
+    def get_depth_at_point(self, depth_frame, x, y):
+        """获取指定点的深度值（米）"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            try:
+                return depth_frame.get_distance(x, y)
+            except:
+                return 0.0
+        return 0.0
+    
+    def get_depth_map(self, depth_frame):
+        """获取深度图的可视化（不带刻度叠加层）"""
+        if self.depth_colorizer is None:
+            self.depth_colorizer = DepthColorizer(depth_scale=self.depth_scale)
+        return self.depth_colorizer.colorize_frame(depth_frame, overlay=False)
+    
+    def stop(self):
+        """停止相机"""
+        self.running = False
+        if self.pipeline:
+            self.pipeline.stop()
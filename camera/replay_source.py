@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+录制数据回放源 - 无需相机即可运行完整流水线
+"""
+
+import os
+import json
+import time
+import glob
+import bisect
+import cv2
+import numpy as np
+
+from .frame_source import FrameSource, DepthFrame
+
+class ReplaySource(FrameSource):
+    """回放录制的彩色和深度数据
+
+    支持三种录制格式:
+      1. 内存映射格式: 目录下包含 color.npy (N,H,W,3 uint8) 和 depth.npy (N,H,W uint16)
+      2. 图像目录格式: 目录下包含 color/ (png/jpg) 和 depth/ (16位png) 两个子目录
+      3. FrameRecorder录制格式: 目录下包含 index.json、彩色视频和按块压缩的深度
+    目录下可选的 meta.json 可提供 depth_scale。
+    fps 为 None 或 <= 0 时不限速，尽可能快地输出帧。
+    """
+
+    def __init__(self, path, fps=30, loop=False):
+        super().__init__(fps=fps)
+        self.path = path
+        self.loop = loop
+        self.color_frames = None
+        self.depth_frames = None
+        self.num_frames = 0
+        self.index = 0
+        self.finished = False
+        self.next_frame_time = None
+        # 录制格式的视频读取位置和当前解压的深度块
+        self.video = None
+        self.video_position = 0
+        self.chunk_starts = None
+        self.chunk_files = None
+        self.chunk_index = None
+        self.chunk_depth = None
+
+    def initialize(self):
+        """加载录制数据"""
+        if not os.path.isdir(self.path):
+            print(f"回放目录不存在: {self.path}")
+            return False
+
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.depth_scale = meta.get("depth_scale", self.depth_scale)
+
+        color_npy = os.path.join(self.path, "color.npy")
+        depth_npy = os.path.join(self.path, "depth.npy")
+        index_path = os.path.join(self.path, "index.json")
+        if os.path.exists(index_path):
+            if not self.open_recording(index_path):
+                return False
+        elif os.path.exists(color_npy) and os.path.exists(depth_npy):
+            # 内存映射，避免一次性加载全部数据
+            self.color_frames = np.load(color_npy, mmap_mode='r')
+            self.depth_frames = np.load(depth_npy, mmap_mode='r')
+        else:
+            self.color_frames = sorted(
+                glob.glob(os.path.join(self.path, "color", "*.png")) +
+                glob.glob(os.path.join(self.path, "color", "*.jpg"))
+            )
+            self.depth_frames = sorted(glob.glob(os.path.join(self.path, "depth", "*.png")))
+
+        self.num_frames = min(len(self.color_frames), len(self.depth_frames))
+        if self.num_frames == 0:
+            print(f"回放目录中没有可用的帧: {self.path}")
+            return False
+
+        first_color, _ = self.read_frame(0)
+        self.height, self.width = first_color.shape[:2]
+        self.index = 0
+        self.finished = False
+        self.next_frame_time = None
+
+        rate = f"{self.fps}fps" if self.fps and self.fps > 0 else "不限速"
+        print(f"回放源初始化成功: {self.path}")
+        print(f"帧数: {self.num_frames}, 分辨率: {self.width}x{self.height}, 速率: {rate}")
+        return True
+
+    def open_recording(self, index_path):
+        """打开FrameRecorder录制的视频和深度块索引"""
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.depth_scale = index.get("depth_scale", self.depth_scale)
+        self.video = cv2.VideoCapture(os.path.join(self.path, index["video"]))
+        if not self.video.isOpened():
+            print(f"无法打开录制视频: {index['video']}")
+            return False
+        self.video_position = 0
+        chunks = index["chunks"]
+        self.chunk_starts = [chunk["start"] for chunk in chunks]
+        self.chunk_files = [os.path.join(self.path, chunk["file"]) for chunk in chunks]
+        # 视频可能比索引多出最后一个未写完的深度块，帧数以索引为准；帧按序号读取
+        self.color_frames = self.depth_frames = range(int(index["frames"]))
+        self.chunk_index = None
+        self.chunk_depth = None
+        return True
+
+    def read_recorded_frame(self, index):
+        """录制格式：顺序读取时直接解码下一帧，否则先定位；深度所在块只解压一次"""
+        if index != self.video_position:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ok, color_image = self.video.read()
+        self.video_position = index + 1
+        if not ok:
+            return None, None
+        chunk = bisect.bisect_right(self.chunk_starts, index) - 1
+        if chunk != self.chunk_index:
+            with np.load(self.chunk_files[chunk]) as data:
+                self.chunk_depth = data["depth"]
+            self.chunk_index = chunk
+        return color_image, self.chunk_depth[index - self.chunk_starts[chunk]]
+
+    def read_frame(self, index):
+        """读取指定索引的彩色图像和深度图像"""
+        if self.video is not None:
+            return self.read_recorded_frame(index)
+        if isinstance(self.color_frames, np.ndarray):
+            return self.color_frames[index], self.depth_frames[index]
+        color_image = cv2.imread(self.color_frames[index], cv2.IMREAD_COLOR)
+        depth_image = cv2.imread(self.depth_frames[index], cv2.IMREAD_UNCHANGED)
+        return color_image, depth_image
+
+    def throttle(self):
+        """按固定帧率节流"""
+        if not self.fps or self.fps <= 0:
+            return
+        now = time.perf_counter()
+        if self.next_frame_time is None:
+            self.next_frame_time = now
+        delay = self.next_frame_time - now
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # 落后太多时不追帧，从当前时间重新计时
+            self.next_frame_time = max(self.next_frame_time, now - 1.0 / self.fps)
+        self.next_frame_time += 1.0 / self.fps
+
+    def next_frame(self):
+        """按节流速率读取下一帧的原始数据，回放结束时返回(None, None)"""
+        if self.finished or self.num_frames == 0:
+            return None, None
+
+        if self.index >= self.num_frames:
+            if not self.loop:
+                self.finished = True
+                return None, None
+            self.index = 0
+
+        self.throttle()
+        color_image, depth_image = self.read_frame(self.index)
+        self.index += 1
+        return color_image, depth_image
+
+    def get_frames(self):
+        """获取下一帧，与RealSenseD455.get_frames返回格式一致"""
+        color_image, depth_image = self.next_frame()
+        if color_image is None or depth_image is None:
+            return None, None
+
+        # 内存映射数据是只读的，复制后再交给下游
+        color_image = np.array(color_image)
+        depth_frame = DepthFrame(np.array(depth_image, dtype=np.uint16), self.depth_scale)
+        return color_image, depth_frame
+
+    def read_into(self, buffer):
+        """直接从内存映射/解码结果拷贝到预分配缓冲"""
+        color_image, depth_image = self.next_frame()
+        if color_image is None or depth_image is None:
+            return False
+        np.copyto(buffer.color, color_image)
+        np.copyto(buffer.depth, depth_image, casting='unsafe')
+        buffer.depth_frame.depth_scale = self.depth_scale
+        return True
+
+    def is_finished(self):
+        return self.finished
+
+    def stop(self):
+        """释放回放数据"""
+        self.finished = True
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        self.chunk_depth = None
+        self.color_frames = None
+        self.depth_frames = None
+        self.num_frames = 0
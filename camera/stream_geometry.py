@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+深度/彩色流的内外参 - 不做整帧对齐时在两个相机坐标系之间投影像素
+"""
+
+import numpy as np
+
+class StreamGeometry:
+    """深度流和彩色流的针孔内参以及深度→彩色外参
+
+    内参为(width, height, fx, fy, ppx, ppy)；rotation为按行存放的3x3矩阵，
+    translation单位为米，满足 P_color = rotation @ P_depth + translation。
+    只使用针孔模型，忽略镜头畸变（D455彩色流畸变很小，误差在一两个像素以内）。
+    对象只包含numpy数组，可直接传给工作进程。
+    """
+
+    def __init__(self, depth_intrinsics, color_intrinsics, rotation, translation):
+        self.depth_intrinsics = tuple(depth_intrinsics)
+        self.color_intrinsics = tuple(color_intrinsics)
+        self.rotation = np.asarray(rotation, dtype=np.float64).reshape(3, 3)
+        self.translation = np.asarray(translation, dtype=np.float64).reshape(3)
+        self.rays = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["rays"] = None
+        return state
+
+    def depth_rays(self):
+        """深度图每列/每行像素的归一化射线坐标(x/z, y/z)，只计算一次"""
+        if self.rays is None:
+            width, height, fx, fy, ppx, ppy = self.depth_intrinsics
+            self.rays = ((np.arange(width, dtype=np.float64) - ppx) / fx,
+                         (np.arange(height, dtype=np.float64) - ppy) / fy)
+        return self.rays
+
+    def depth_to_color(self, us, vs, z):
+        """深度图像素(us, vs)及其深度z（米）变换到彩色相机坐标系，返回(N, 3)的点"""
+        ray_x, ray_y = self.depth_rays()
+        points = np.empty((len(z), 3), dtype=np.float64)
+        points[:, 0] = ray_x[us] * z
+        points[:, 1] = ray_y[vs] * z
+        points[:, 2] = z
+        return points @ self.rotation.T + self.translation
+
+    def project_color(self, points):
+        """彩色相机坐标系下的点投影为彩色图像素坐标，返回取整后的(us, vs)"""
+        _, _, fx, fy, ppx, ppy = self.color_intrinsics
+        inv_z = 1.0 / np.maximum(points[:, 2], 1e-6)
+        us = np.rint(points[:, 0] * inv_z * fx + ppx).astype(np.int64)
+        vs = np.rint(points[:, 1] * inv_z * fy + ppy).astype(np.int64)
+        return us, vs
+
+    def color_box_to_depth(self, box, near, far):
+        """彩色图中的框在深度[near, far]米范围内对应的深度图区域(x1, y1, x2, y2)
+
+        框的四个角分别按最近和最远深度反投影到深度相机再投影，取外接矩形，
+        保证落在框内的彩色像素所对应的深度像素都在区域内。
+        """
+        _, _, cfx, cfy, cppx, cppy = self.color_intrinsics
+        width, height, dfx, dfy, dppx, dppy = self.depth_intrinsics
+        x1, y1, x2, y2 = box
+        corners = np.array([[x1, y1], [x2, y1], [x1, y2], [x2, y2]], dtype=np.float64)
+        points = []
+        for z in (near, far):
+            points.append(np.column_stack(((corners[:, 0] - cppx) / cfx * z,
+                                           (corners[:, 1] - cppy) / cfy * z,
+                                           np.full(4, z))))
+        points = (np.concatenate(points) - self.translation) @ self.rotation
+        us = points[:, 0] / points[:, 2] * dfx + dppx
+        vs = points[:, 1] / points[:, 2] * dfy + dppy
+        dx1, dx2 = int(max(0, np.floor(us.min()) - 1)), int(min(width, np.ceil(us.max()) + 2))
+        dy1, dy2 = int(max(0, np.floor(vs.min()) - 1)), int(min(height, np.ceil(vs.max()) + 2))
+        return dx1, dy1, max(dx1, dx2), max(dy1, dy2)
+
+    def depth_box_to_color(self, box, near, far):
+        """深度图中的框在深度[near, far]米范围内对应的彩色图区域(x1, y1, x2, y2)
+
+        与color_box_to_depth相反：框的四个角按最近和最远深度反投影后变换到彩色相机再投影，
+        取外接矩形，保证框内深度在该范围内的像素投影到彩色图后都落在区域内。
+        """
+        width, height, cfx, cfy, cppx, cppy = self.color_intrinsics
+        _, _, dfx, dfy, dppx, dppy = self.depth_intrinsics
+        x1, y1, x2, y2 = box
+        corners = np.array([[x1, y1], [x2, y1], [x1, y2], [x2, y2]], dtype=np.float64)
+        points = []
+        for z in (near, far):
+            points.append(np.column_stack(((corners[:, 0] - dppx) / dfx * z,
+                                           (corners[:, 1] - dppy) / dfy * z,
+                                           np.full(4, z))))
+        points = np.concatenate(points) @ self.rotation.T + self.translation
+        inv_z = 1.0 / np.maximum(points[:, 2], 1e-6)
+        us = points[:, 0] * inv_z * cfx + cppx
+        vs = points[:, 1] * inv_z * cfy + cppy
+        cx1, cx2 = int(max(0, np.floor(us.min()) - 1)), int(min(width, np.ceil(us.max()) + 2))
+        cy1, cy2 = int(max(0, np.floor(vs.min()) - 1)), int(min(height, np.ceil(vs.max()) + 2))
+        return cx1, cy1, max(cx1, cx2), max(cy1, cy2)
@@ -1,50 +1,281 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-
-"""
-YOLOv11 RealSense D455 人体检测应用程序 - 主入口文件
-"""
-
-import os
-from app.instance_segmentation_app import InstanceSegmentationApp
-
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("YOLOv11 RealSense D455 人体检测应用程序 - 无边界框版本")
-    print("=" * 60)
-    
-    # 优先使用小模型
-    model_paths = [
-        # "./weights/yolo11n-seg.pt",  # Nano版本
-        # "./weights/yolo11s-seg.pt",  # Small版本
-        # "./weights/yolo11m-seg.pt",  # Medium版本
-        # "./weights/yolo11l-seg.pt",  # Large版本
-        "./weights/yolo11x-seg.pt",  # XLarge版本
-    ]
-    
-    # 自动检测可用的模型
-    selected_model = None
-    for model_path in model_paths:
-        if os.path.exists(model_path):
-            selected_model = model_path
-            print(f"找到模型: {model_path}")
-            break
-    
-    if selected_model is None:
-        print("警告: 未找到YOLOv11分割模型文件")
-        print("请将模型文件放在以下位置之一:")
-        for model_path in model_paths:
-            print(f"  - {model_path}")
-        return
-    
-    # 创建并运行应用程序
-    app = InstanceSegmentationApp(selected_model)
-    app.run()
-
-if __name__ == "__main__":
-    main()
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+
+"""
+YOLOv11 RealSense D455 人体检测应用程序 - 主入口文件
+"""
+
+import os
+import argparse
+from app.instance_segmentation_app import InstanceSegmentationApp
+from app.multi_camera_app import MultiCameraApp
+from segmentation.model_export import BACKENDS, BACKEND_PYTORCH, candidate_models, select_backend
+
+# 多相机模式（--source指定多个帧源）不支持的单相机参数
+MULTI_CAMERA_UNSUPPORTED = [
+    "results_file", "mask_format", "keyframe_interval", "min_track_confidence", "latency_budget",
+    "input_sizes", "cascade_model", "motion_gate", "max_stale_frames", "roi_depth", "roi_zone",
+    "drop_policy", "frame_deadline", "render_workers", "stream_port", "stream_host", "depth_view_range",
+    "record", "record_mode", "record_policy", "record_queue", "record_chunk", "record_hold",
+]
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="YOLOv11 RealSense D455 人体检测应用程序")
+    parser.add_argument("--source", nargs="+", default=["realsense"],
+                        help="帧源: realsense、realsense:<序列号>、realsense:all 或录制数据目录（回放）；"
+                             "多个帧源时共享一个模型跨相机批量推理")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="多相机模式下每批推理的最大帧数，默认为相机数")
+    parser.add_argument("--replay-fps", type=float, default=30,
+                        help="回放帧率，<=0 表示不限速")
+    parser.add_argument("--loop", action="store_true", help="循环回放")
+    parser.add_argument("--headless", action="store_true",
+                        help="无界面模式，不调用cv2.imshow，结束时报告持续帧率")
+    parser.add_argument("--max-frames", type=int, default=None, help="无界面模式下处理的最大帧数")
+    parser.add_argument("--duration", type=float, default=None, help="无界面模式下运行的最长秒数")
+    parser.add_argument("--compact-masks", action="store_true",
+                        help="掩码全程保持检测框内的紧凑形式")
+    parser.add_argument("--drop-policy", choices=["latest", "block", "deadline"], default="latest",
+                        help="采集到推理之间的丢帧策略")
+    parser.add_argument("--frame-deadline", type=float, default=0.1,
+                        help="deadline策略下帧的最长等待时间（秒）")
+    parser.add_argument("--metrics-file", default=None,
+                        help="定期写出指标的文件，后缀.prom为Prometheus文本格式，否则为JSON")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="指标写出间隔（秒）")
+    parser.add_argument("--results-file", default=None,
+                        help="逐帧检测结果输出文件，后缀.bin为二进制记录流，否则为JSON lines")
+    parser.add_argument("--mask-format", choices=["rle", "polygon", "none"], default="rle",
+                        help="结果中掩码的编码方式")
+    parser.add_argument("--no-render", action="store_true", help="无界面模式下跳过渲染阶段")
+    parser.add_argument("--keyframe-interval", type=int, default=1,
+                        help="每N帧运行一次完整推理，其余帧用跟踪结果传播掩码（1表示每帧推理）")
+    parser.add_argument("--min-track-confidence", type=float, default=0.5,
+                        help="跟踪可信度低于该值时立即运行完整推理")
+    parser.add_argument("--imgsz", type=int, default=320, help="推理尺寸")
+    parser.add_argument("--latency-budget", type=float, default=None,
+                        help="推理延迟预算（毫秒），设置后按实测延迟在--input-sizes之间自动切换推理尺寸")
+    parser.add_argument("--input-sizes", default="256,320,480,640",
+                        help="自动切换时可用的推理尺寸，逗号分隔，启动时逐一预热")
+    parser.add_argument("--backend", choices=["auto"] + BACKENDS, default="auto",
+                        help="推理后端；auto时导出ONNX/OpenVINO（缓存在weights/下）并通过短时标定选择最快的后端，"
+                             "标定结果按模型、推理尺寸和设备缓存，之后的启动直接复用")
+    parser.add_argument("--recalibrate", action="store_true",
+                        help="忽略缓存的后端标定结果，重新标定（驱动或运行时更新后使用）")
+    parser.add_argument("--cascade-model", default=None,
+                        help="级联模式的小模型（如yolo11n-seg.pt），逐帧运行；所选大模型只在难帧上运行")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="画面无明显变化时跳过推理，复用上一次结果")
+    parser.add_argument("--max-stale-frames", type=int, default=30,
+                        help="运动门控下结果最多复用的帧数")
+    parser.add_argument("--no-align", action="store_true",
+                        help="跳过整帧深度对齐，只把实例区域内的深度投影到彩色图，并输出每人的三维位置和尺寸")
+    parser.add_argument("--depth-view-range", default=None,
+                        help="深度图显示的着色范围，格式为 最近,最远（米），默认 0,8.5")
+    parser.add_argument("--roi-depth", default=None,
+                        help="只对该深度范围内的前景推理，格式为 最近,最远（米），例如 0.5,4")
+    parser.add_argument("--roi-zone", default=None,
+                        help="只对该区域内的前景推理，格式为相对整帧的 x1,y1,x2,y2（0~1）")
+    parser.add_argument("--render-workers", type=int, default=0,
+                        help="后处理/渲染工作进程数，>0时帧经共享内存交给进程池处理（0表示在线程中处理）")
+    parser.add_argument("--stream-port", type=int, default=None,
+                        help="启动局域网推流服务的端口：/stream.mjpg 视频流，/results 检测结果WebSocket")
+    parser.add_argument("--stream-host", default="0.0.0.0", help="推流服务监听地址")
+    parser.add_argument("--classes", default="0",
+                        help="允许的类别索引，逗号分隔，在NMS之前过滤；all表示全部类别（默认只检测人）")
+    parser.add_argument("--class-conf", default=None,
+                        help="逐类别置信度阈值，如 0:0.4,2:0.6，未列出的类别使用默认阈值")
+    parser.add_argument("--max-det", type=int, default=100, help="每帧最多保留的实例数")
+    parser.add_argument("--record", default=None,
+                        help="录制目录，后台写出彩色视频、按块压缩的原始深度和检测结果，每段一个子目录")
+    parser.add_argument("--record-mode", choices=["continuous", "manual", "person"], default="continuous",
+                        help="continuous持续录制，manual按'r'键开始/停止，person检测到人时自动录制")
+    parser.add_argument("--record-policy", choices=["drop_new", "block"], default="drop_new",
+                        help="录制队列满时丢弃新帧（不影响推理）或阻塞等待")
+    parser.add_argument("--record-queue", type=int, default=32, help="录制队列可容纳的帧数")
+    parser.add_argument("--record-chunk", type=int, default=30, help="每个深度压缩块的帧数")
+    parser.add_argument("--record-hold", type=float, default=3.0, help="person模式下最后一次检测到人后继续录制的秒数")
+    return parser
+
+def parse_floats(text, count):
+    """解析逗号分隔的数值参数，未提供时返回None"""
+    if text is None:
+        return None
+    values = tuple(float(value) for value in text.split(","))
+    if len(values) != count:
+        raise SystemExit(f"参数格式错误: {text}，需要{count}个逗号分隔的数值")
+    return values
+
+def parse_classes(text):
+    """解析--classes，all表示不过滤类别"""
+    if text.strip().lower() == "all":
+        return None
+    return [int(value) for value in text.split(",") if value.strip()]
+
+def parse_class_conf(text):
+    """解析--class-conf的 类别:阈值 列表"""
+    if not text:
+        return None
+    class_conf = {}
+    for item in text.split(","):
+        try:
+            cls, threshold = item.split(":")
+            class_conf[int(cls)] = float(threshold)
+        except ValueError:
+            raise SystemExit(f"参数格式错误: {item}，需要 类别:阈值")
+    return class_conf
+
+def check_multi_camera_args(parser, args):
+    """多相机模式下设置了不支持的参数时报错退出，避免结果输出、录制等被静默忽略"""
+    unsupported = [dest for dest in MULTI_CAMERA_UNSUPPORTED if getattr(args, dest) != parser.get_default(dest)]
+    if unsupported:
+        flags = ", ".join("--" + dest.replace("_", "-") for dest in unsupported)
+        parser.error(f"多相机模式不支持以下参数: {flags}")
+
+def create_frame_source(source, args):
+    """根据命令行参数创建单个帧源，None表示使用默认的RealSense相机"""
+    if source == "realsense" and not args.no_align:
+        return None
+    if source == "realsense" or source.startswith("realsense:"):
+        from camera.realsense_d455 import RealSenseD455
+        serial = source.split(":", 1)[1] if ":" in source else None
+        return RealSenseD455(width=848, height=480, fps=30, serial=serial, align=not args.no_align)
+    from camera.replay_source import ReplaySource
+    return ReplaySource(source, fps=args.replay_fps, loop=args.loop)
+
+def create_frame_sources(args):
+    """创建--source指定的全部帧源，realsense:all展开为所有已连接的相机"""
+    sources = []
+    for source in args.source:
+        if source == "realsense:all":
+            from camera.realsense_d455 import RealSenseD455
+            sources.extend(RealSenseD455(width=848, height=480, fps=30, serial=serial,
+                                         align=not args.no_align)
+                           for serial in RealSenseD455.list_serials())
+        else:
+            sources.append(create_frame_source(source, args))
+    return sources
+
+def select_model_backend(model_path, args, batch=1):
+    """按--backend选择推理后端，返回实际加载的模型路径，batch为每次推理的最大帧数"""
+    if not model_path.endswith('.pt') or args.backend == BACKEND_PYTORCH:
+        return model_path
+    
+    if batch > 1:
+        # 导出模型的批大小固定为1，标定也只测单帧，多相机批量推理需要PyTorch后端
+        print("多相机批量推理，使用PyTorch后端")
+        return model_path
+    
+    if args.backend != "auto":
+        candidates = candidate_models(model_path, args.imgsz, [args.backend])
+        if not candidates:
+            print(f"后端 {args.backend} 不可用，使用PyTorch")
+            return model_path
+        return candidates[0][1]
+    
+    if args.latency_budget is not None:
+        # 导出模型的推理尺寸固定，延迟预算控制需要PyTorch后端
+        print("启用了延迟预算，使用PyTorch后端")
+        return model_path
+    backend, selected_path, timings = select_backend(model_path, args.imgsz, recalibrate=args.recalibrate)
+    if len(timings) > 1:
+        print("后端标定结果: " + ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings.items()))
+    print(f"选择后端: {backend} ({selected_path})")
+    return selected_path
+
+def main():
+    """主函数"""
+    parser = build_parser()
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("YOLOv11 RealSense D455 人体检测应用程序 - 无边界框版本")
+    print("=" * 60)
+    
+    # 优先使用小模型
+    model_paths = [
+        # "./weights/yolo11n-seg.pt",  # Nano版本
+        # "./weights/yolo11s-seg.pt",  # Small版本
+        # "./weights/yolo11m-seg.pt",  # Medium版本
+        # "./weights/yolo11l-seg.pt",  # Large版本
+        "./weights/yolo11x-seg.pt",  # XLarge版本
+    ]
+    
+    # 自动检测可用的模型
+    selected_model = None
+    for model_path in model_paths:
+        if os.path.exists(model_path):
+            selected_model = model_path
+            print(f"找到模型: {model_path}")
+            break
+    
+    if selected_model is None:
+        print("警告: 未找到YOLOv11分割模型文件")
+        print("请将模型文件放在以下位置之一:")
+        for model_path in model_paths:
+            print(f"  - {model_path}")
+        return
+    
+    # 多个帧源时共享一个模型
+    frame_sources = create_frame_sources(args)
+    if len(frame_sources) > 1:
+        check_multi_camera_args(parser, args)
+    
+    batch = (args.batch_size or len(frame_sources)) if len(frame_sources) > 1 else 1
+    selected_model = select_model_backend(selected_model, args, batch)
+    
+    # 只有启用延迟预算时才需要预热多个推理尺寸
+    input_sizes = None
+    if args.latency_budget is not None:
+        input_sizes = [int(size) for size in args.input_sizes.split(",") if size.strip()]
+    
+    if len(frame_sources) > 1:
+        from camera.realsense_d455 import RealSenseD455
+        frame_sources = [source if source is not None else RealSenseD455(width=848, height=480, fps=30)
+                         for source in frame_sources]
+        app = MultiCameraApp(selected_model, frame_sources, headless=args.headless,
+                             batch_size=args.batch_size, compact_masks=args.compact_masks, imgsz=args.imgsz,
+                             metrics_path=args.metrics_file, metrics_interval=args.metrics_interval,
+                             render=not args.no_render, classes=parse_classes(args.classes),
+                             class_conf=parse_class_conf(args.class_conf), max_det=args.max_det)
+        if args.headless:
+            app.run_headless(max_frames=args.max_frames, duration=args.duration)
+        else:
+            app.run()
+        return
+    if not frame_sources:
+        print("未找到可用的帧源")
+        return
+    
+    # 创建并运行应用程序
+    app = InstanceSegmentationApp(selected_model, frame_source=frame_sources[0],
+                                  headless=args.headless, compact_masks=args.compact_masks,
+                                  drop_policy=args.drop_policy, frame_deadline=args.frame_deadline,
+                                  metrics_path=args.metrics_file, metrics_interval=args.metrics_interval,
+                                  results_path=args.results_file, mask_format=args.mask_format,
+                                  render=not args.no_render, keyframe_interval=args.keyframe_interval,
+                                  min_track_confidence=args.min_track_confidence, imgsz=args.imgsz,
+                                  input_sizes=input_sizes, latency_budget_ms=args.latency_budget,
+                                  cascade_model_path=args.cascade_model, motion_gate=args.motion_gate,
+                                  max_stale_frames=args.max_stale_frames,
+                                  roi_depth_range=parse_floats(args.roi_depth, 2),
+                                  roi_zone=parse_floats(args.roi_zone, 4),
+                                  render_workers=args.render_workers, stream_port=args.stream_port,
+                                  stream_host=args.stream_host,
+                                  depth_view_range=parse_floats(args.depth_view_range, 2),
+                                  record_path=args.record, record_mode=args.record_mode,
+                                  record_policy=args.record_policy, record_queue_size=args.record_queue,
+                                  record_chunk_size=args.record_chunk, record_hold=args.record_hold,
+                                  classes=parse_classes(args.classes),
+                                  class_conf=parse_class_conf(args.class_conf), max_det=args.max_det)
+    if args.headless:
+        app.run_headless(max_frames=args.max_frames, duration=args.duration)
+    else:
+        app.run()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,22 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-from .yolov11_segmentation import YOLOv11Segmentation
-from .segmentation_visualizer import SegmentationVisualizer
-
-__all__ = ['YOLOv11Segmentation', 'SegmentationVisualizer']
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+from .yolov11_segmentation import YOLOv11Segmentation
+from .segmentation_visualizer import SegmentationVisualizer
+from .mask_utils import BoxMask, crop_mask_to_box, decode_masks
+from .depth_statistics import compute_instance_depth_stats, compute_unaligned_depth_stats
+from .mask_codec import encode_rle, decode_rle, encode_polygons
+from .tracker import IoUTracker, TrackingSegmentor
+from .resolution_controller import ResolutionController
+from .cascade_segmentation import CascadeSegmentation
+from .motion_gate import MotionGate
+from .depth_roi import DepthROISelector, DepthROISegmentor
+
+__all__ = ['YOLOv11Segmentation', 'SegmentationVisualizer', 'BoxMask', 'crop_mask_to_box', 'decode_masks',
+           'compute_instance_depth_stats', 'compute_unaligned_depth_stats', 'encode_rle', 'decode_rle', 'encode_polygons',
+           'IoUTracker', 'TrackingSegmentor', 'ResolutionController',
+           'CascadeSegmentation', 'MotionGate',
+           'DepthROISelector', 'DepthROISegmentor']
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+级联分割 - 小模型逐帧运行，难帧升级到大模型并合并结果
+"""
+
+import numpy as np
+
+from .yolov11_segmentation import YOLOv11Segmentation, PERSON_CLASS
+from .mask_utils import decode_masks
+from .tracker import box_iou_matrix
+
+ESCALATE_LOW_CONFIDENCE = 'low_confidence'
+ESCALATE_CROWDED = 'crowded'
+ESCALATE_REFRESH = 'refresh'
+
+class CascadeSegmentation:
+    """小模型/大模型级联分割，接口与YOLOv11Segmentation一致
+
+    小模型以较低的候选阈值逐帧运行。出现以下情况时，同一帧再交给大模型：
+    存在检测但最高置信度低于escalate_confidence、人数或框重叠表明场景拥挤、
+    距上次大模型推理已达refresh_interval帧。升级帧以大模型结果为准，
+    小模型中未被大模型覆盖的高置信度检测也予以保留。
+    """
+
+    def __init__(self, light_model_path, heavy_model_path, conf_threshold=0.5, iou_threshold=0.45,
+                 compact_masks=False, imgsz=320, input_sizes=None, candidate_conf=0.25,
+                 escalate_confidence=0.6, crowd_count=4, crowd_iou=0.3, refresh_interval=30,
+                 merge_iou=0.5, classes=(PERSON_CLASS,), class_conf=None, max_det=100):
+        # 小模型用较低阈值输出候选，用于判断是否需要升级；逐类别阈值低于候选阈值的类别按其
+        # 自身阈值输出候选，最终的逐类别阈值在合并时再应用
+        light_class_conf = {cls: min(candidate_conf, threshold) for cls, threshold in (class_conf or {}).items()}
+        self.light = YOLOv11Segmentation(light_model_path, candidate_conf, iou_threshold,
+                                         compact_masks, imgsz, input_sizes, classes, light_class_conf,
+                                         max_det)
+        self.heavy = YOLOv11Segmentation(heavy_model_path, conf_threshold, iou_threshold,
+                                         compact_masks, imgsz, input_sizes, classes, class_conf, max_det)
+        self.conf_threshold = conf_threshold
+        self.class_conf = self.heavy.class_conf
+        self.escalate_confidence = escalate_confidence
+        self.crowd_count = crowd_count
+        self.crowd_iou = crowd_iou
+        self.refresh_interval = refresh_interval
+        self.merge_iou = merge_iou
+        self.frames_since_heavy = 0
+        self.frames = 0
+        self.escalations = {ESCALATE_LOW_CONFIDENCE: 0, ESCALATE_CROWDED: 0, ESCALATE_REFRESH: 0}
+        self.last_escalation = None
+
+    @property
+    def imgsz(self):
+        """当前推理尺寸（两个模型保持一致）"""
+        return self.light.imgsz
+
+    @imgsz.setter
+    def imgsz(self, size):
+        self.light.imgsz = size
+        self.heavy.imgsz = size
+
+    @property
+    def input_sizes(self):
+        """两个模型都支持的推理尺寸"""
+        return sorted(set(self.light.input_sizes) & set(self.heavy.input_sizes))
+
+    def initialize(self, frame_shape=None, profile=None):
+        """初始化两个模型"""
+        print("初始化级联小模型...")
+        if not self.light.initialize(frame_shape, profile):
+            return False
+        print("初始化级联大模型...")
+        return self.heavy.initialize(frame_shape, profile)
+
+    def escalation_reason(self, result):
+        """判断小模型结果是否需要升级到大模型，返回原因或None"""
+        _, _, boxes, _, confidences, _ = result
+        if self.frames_since_heavy + 1 >= self.refresh_interval:
+            return ESCALATE_REFRESH
+        if len(confidences) == 0:
+            return None
+        if float(np.max(confidences)) < self.escalate_confidence:
+            return ESCALATE_LOW_CONFIDENCE
+        if len(boxes) >= self.crowd_count:
+            return ESCALATE_CROWDED
+        if len(boxes) > 1:
+            iou = box_iou_matrix(boxes, boxes)
+            np.fill_diagonal(iou, 0.0)
+            if iou.max() >= self.crowd_iou:
+                return ESCALATE_CROWDED
+        return None
+
+    def filter_result(self, result):
+        """去掉低于最终置信度阈值（含逐类别阈值）的小模型候选"""
+        image, masks, boxes, classes, confidences, class_names = result
+        if len(confidences) == 0:
+            return result
+        thresholds = self.conf_threshold
+        if self.class_conf:
+            thresholds = np.array([self.class_conf.get(int(cls), self.conf_threshold) for cls in classes])
+        keep = np.flatnonzero(np.asarray(confidences) >= thresholds)
+        if len(keep) == len(confidences):
+            return result
+        return (image, select_masks(masks, keep), np.asarray(boxes)[keep], np.asarray(classes)[keep],
+                np.asarray(confidences)[keep], class_names)
+
+    def merge_results(self, light_result, heavy_result):
+        """合并同一帧的结果：以大模型为准，补充大模型未覆盖的小模型检测"""
+        light_result = self.filter_result(light_result)
+        image, heavy_masks, heavy_boxes, heavy_classes, heavy_confidences, class_names = heavy_result
+        _, light_masks, light_boxes, light_classes, light_confidences, light_names = light_result
+        if len(light_boxes) == 0:
+            return heavy_result
+        if len(heavy_boxes) == 0:
+            return light_result
+
+        iou = box_iou_matrix(light_boxes, heavy_boxes)
+        same_class = np.asarray(light_classes)[:, None] == np.asarray(heavy_classes)[None, :]
+        extra = np.flatnonzero(((iou * same_class) < self.merge_iou).all(axis=1))
+        if len(extra) == 0:
+            return heavy_result
+
+        light_extra = select_masks(light_masks, extra)
+        if isinstance(heavy_masks, np.ndarray) and isinstance(light_extra, np.ndarray) \
+                and heavy_masks.shape[1:] == light_extra.shape[1:]:
+            masks = np.concatenate([heavy_masks, light_extra])
+        else:
+            # 原型掩码尺寸不一致时统一转换为整帧坐标下的BoxMask
+            masks = decode_masks(heavy_masks, heavy_boxes, image.shape) + \
+                decode_masks(light_extra, np.asarray(light_boxes)[extra], image.shape)
+        return (image, masks,
+                np.concatenate([heavy_boxes, np.asarray(light_boxes)[extra]]),
+                np.concatenate([heavy_classes, np.asarray(light_classes)[extra]]),
+                np.concatenate([heavy_confidences, np.asarray(light_confidences)[extra]]),
+                class_names or light_names)
+
+    def record(self, reason):
+        """更新升级统计"""
+        self.frames += 1
+        self.last_escalation = reason
+        if reason is None:
+            self.frames_since_heavy += 1
+        else:
+            self.frames_since_heavy = 0
+            self.escalations[reason] += 1
+
+    def segment_frame(self, image):
+        """对图像进行级联分割，返回格式与YOLOv11Segmentation.segment_frame一致"""
+        light_result = self.light.segment_frame(image)
+        if light_result[0] is None:
+            return light_result
+        reason = self.escalation_reason(light_result)
+        self.record(reason)
+        if reason is None:
+            return self.filter_result(light_result)
+        return self.merge_results(light_result, self.heavy.segment_frame(image))
+
+    def segment_batch(self, images):
+        """批量级联分割，只把需要升级的帧组成一批交给大模型"""
+        light_results = self.light.segment_batch(images)
+        reasons = []
+        for result in light_results:
+            reason = self.escalation_reason(result)
+            self.record(reason)
+            reasons.append(reason)
+        escalated = [i for i, reason in enumerate(reasons) if reason is not None]
+        results = [self.filter_result(result) for result in light_results]
+        if escalated:
+            heavy_results = self.heavy.segment_batch([images[i] for i in escalated])
+            for i, heavy_result in zip(escalated, heavy_results):
+                results[i] = self.merge_results(light_results[i], heavy_result)
+        return results
+
+def select_masks(masks, indices):
+    """按索引选取掩码，兼容原型掩码数组和BoxMask列表"""
+    if isinstance(masks, np.ndarray):
+        return masks[indices]
+    return [masks[i] for i in indices]
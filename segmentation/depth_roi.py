@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+深度感兴趣区域 - 只对关注深度范围/区域内的前景做推理，结果映射回整帧坐标
+"""
+
+import cv2
+import numpy as np
+
+from .mask_utils import BoxMask, decode_masks
+
+class DepthROISelector:
+    """根据对齐后的深度图选出候选前景区域
+
+    在缩小的深度图上取[min_depth, max_depth]米范围内且位于zone内的像素，开运算去噪后
+    保留面积足够的连通域，取它们的外接矩形并加边距作为裁剪区域。区域为空时返回None；
+    区域占整帧比例超过max_crop_ratio时直接使用整帧，裁剪已没有收益。
+    """
+
+    def __init__(self, min_depth=0.5, max_depth=4.0, zone=None, depth_scale=0.001, scale=0.25,
+                 min_area_ratio=0.002, padding=0.1, max_crop_ratio=0.8, min_crop_size=64):
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        # zone为相对整帧的(x1, y1, x2, y2)，取值0~1，例如只关注地面区域
+        self.zone = zone
+        self.depth_scale = depth_scale
+        self.scale = scale
+        self.min_area_ratio = min_area_ratio
+        self.padding = padding
+        self.max_crop_ratio = max_crop_ratio
+        self.min_crop_size = min_crop_size
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    def foreground_mask(self, depth_image):
+        """缩小后的深度范围前景掩码"""
+        small = cv2.resize(depth_image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_NEAREST)
+        lower = int(np.ceil(self.min_depth / self.depth_scale))
+        upper = int(self.max_depth / self.depth_scale)
+        mask = ((small >= max(lower, 1)) & (small <= upper)).astype(np.uint8)
+        if self.zone is not None:
+            height, width = mask.shape
+            zx1, zy1, zx2, zy2 = self.zone
+            zone_mask = np.zeros_like(mask)
+            zone_mask[int(zy1 * height):int(np.ceil(zy2 * height)),
+                      int(zx1 * width):int(np.ceil(zx2 * width))] = 1
+            mask &= zone_mask
+        return cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+
+    def select(self, depth_image):
+        """返回整帧坐标下的裁剪区域(x1, y1, x2, y2)，没有前景时返回None"""
+        height, width = depth_image.shape[:2]
+        mask = self.foreground_mask(depth_image)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        min_area = self.min_area_ratio * mask.size
+        components = [stats[i] for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= min_area]
+        if not components:
+            return None
+
+        components = np.array(components)
+        x1 = components[:, cv2.CC_STAT_LEFT].min()
+        y1 = components[:, cv2.CC_STAT_TOP].min()
+        x2 = (components[:, cv2.CC_STAT_LEFT] + components[:, cv2.CC_STAT_WIDTH]).max()
+        y2 = (components[:, cv2.CC_STAT_TOP] + components[:, cv2.CC_STAT_HEIGHT]).max()
+        # 映射回整帧并加边距，保证人体边缘（深度噪声较大）也在裁剪区域内
+        x1, y1, x2, y2 = np.array([x1, y1, x2, y2]) / self.scale
+        pad_x = max((x2 - x1) * self.padding, (self.min_crop_size - (x2 - x1)) / 2)
+        pad_y = max((y2 - y1) * self.padding, (self.min_crop_size - (y2 - y1)) / 2)
+        x1, x2 = int(max(0, x1 - pad_x)), int(min(width, np.ceil(x2 + pad_x)))
+        y1, y2 = int(max(0, y1 - pad_y)), int(min(height, np.ceil(y2 + pad_y)))
+        if (x2 - x1) * (y2 - y1) > self.max_crop_ratio * width * height:
+            return 0, 0, width, height
+        return x1, y1, x2, y2
+
+def map_result_to_frame(result, roi, image):
+    """将裁剪图上的分割结果映射回整帧坐标，掩码转换为整帧坐标下的BoxMask"""
+    crop, masks, boxes, classes, confidences, class_names = result
+    x1, y1 = roi[0], roi[1]
+    if len(boxes) == 0:
+        return image, [], boxes, classes, confidences, class_names
+    box_masks = [BoxMask(m.x1 + x1, m.y1 + y1, m.mask) for m in decode_masks(masks, boxes, crop.shape)]
+    boxes = np.asarray(boxes) + np.array([x1, y1, x1, y1], dtype=np.float32)
+    return image, box_masks, boxes, classes, confidences, class_names
+
+class DepthROISegmentor:
+    """只在深度前景区域内推理的分割器包装，接口与YOLOv11Segmentation一致
+
+    segment_frame额外接受depth_image，未提供时退化为整帧推理。深度图未对齐时需提供
+    geometry（StreamGeometry），深度图上选出的区域按深度范围投影到彩色图后再裁剪，
+    此时zone为相对深度图整帧的比例。
+    """
+
+    def __init__(self, segmentor, selector, geometry=None, min_depth=0.3):
+        self.segmentor = segmentor
+        self.selector = selector
+        self.geometry = geometry
+        # 投影区域时深度范围的下限，避免近处视差把区域撑满整帧
+        self.min_depth = min_depth
+        self.frames = 0
+        self.empty_frames = 0
+        self.pixel_ratio_sum = 0.0
+        self.last_roi = None
+
+    @property
+    def imgsz(self):
+        """当前推理尺寸"""
+        return self.segmentor.imgsz
+
+    @imgsz.setter
+    def imgsz(self, size):
+        self.segmentor.imgsz = size
+
+    @property
+    def input_sizes(self):
+        """可用的推理尺寸"""
+        return self.segmentor.input_sizes
+
+    def initialize(self, frame_shape=None, profile=None):
+        """初始化被包装的分割器"""
+        return self.segmentor.initialize(frame_shape, profile)
+
+    @property
+    def pixel_ratio(self):
+        """送入模型的像素占整帧的平均比例"""
+        return self.pixel_ratio_sum / self.frames if self.frames else 1.0
+
+    def depth_roi_to_color(self, roi, depth_shape, color_shape):
+        """未对齐深度图上的区域映射为彩色图区域，投影后为空时返回None"""
+        if roi == (0, 0, depth_shape[1], depth_shape[0]):
+            return 0, 0, color_shape[1], color_shape[0]
+        near = max(self.selector.min_depth, self.min_depth)
+        far = max(self.selector.max_depth, near)
+        x1, y1, x2, y2 = self.geometry.depth_box_to_color(roi, near, far)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def segment_frame(self, image, depth_image=None):
+        """对深度前景区域进行实例分割，返回整帧坐标下的结果"""
+        if image is None or depth_image is None:
+            return self.segmentor.segment_frame(image)
+
+        self.frames += 1
+        height, width = image.shape[:2]
+        roi = self.selector.select(depth_image)
+        if roi is not None and self.geometry is not None:
+            roi = self.depth_roi_to_color(roi, depth_image.shape, (height, width))
+        self.last_roi = roi
+        if roi is None:
+            # 关注范围内没有前景，直接跳过推理
+            self.empty_frames += 1
+            return image, [], [], [], [], {}
+
+        x1, y1, x2, y2 = roi
+        self.pixel_ratio_sum += (x2 - x1) * (y2 - y1) / float(width * height)
+        if (x2 - x1, y2 - y1) == (width, height):
+            return self.segmentor.segment_frame(image)
+        result = self.segmentor.segment_frame(image[y1:y2, x1:x2])
+        if result[0] is None:
+            return result
+        return map_result_to_frame(result, roi, image)
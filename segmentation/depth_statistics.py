@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+实例深度统计 - 基于对齐深度图和实例掩码的向量化计算
+
+不做整帧对齐时，只把各实例框对应区域内的深度像素投影到彩色图，
+统计落在掩码内的点，同时给出每个实例在相机坐标系下的三维位置和尺寸。
+"""
+
+import numpy as np
+
+from .mask_utils import decode_masks
+
+def empty_depth_stats(count=0, positions=False):
+    """返回count个实例的空统计结果，positions为True时包含三维位置和尺寸"""
+    stats = {
+        "median": np.zeros(count, dtype=np.float32),
+        "min": np.zeros(count, dtype=np.float32),
+        "percentile": np.zeros(count, dtype=np.float32),
+        "valid_ratio": np.zeros(count, dtype=np.float32),
+        "valid_pixels": np.zeros(count, dtype=np.int64),
+    }
+    if positions:
+        stats["centroid"] = np.zeros((count, 3), dtype=np.float32)
+        stats["extent"] = np.zeros((count, 3), dtype=np.float32)
+    return stats
+
+def sorted_quantile(sorted_values, starts, counts, q):
+    """在按实例分段排序的数组上计算每段的分位数（线性插值，与np.percentile一致）"""
+    result = np.zeros(len(counts), dtype=np.float64)
+    has_values = counts > 0
+    if not np.any(has_values):
+        return result
+    position = (counts[has_values] - 1) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    base = starts[has_values]
+    low_values = sorted_values[base + lower].astype(np.float64)
+    high_values = sorted_values[base + upper].astype(np.float64)
+    result[has_values] = low_values + (high_values - low_values) * (position - lower)
+    return result
+
+def compute_instance_depth_stats(depth_image, masks, boxes, depth_scale=0.001,
+                                 percentile=10, max_depth=None, geometry=None):
+    """一次计算所有实例的深度统计
+
+    depth_image: 与彩色图对齐的uint16深度图
+    masks/boxes: segment_frame返回的掩码和边界框（原型掩码或BoxMask均可）
+    depth_scale: 深度单位（米/单位），来自深度传感器
+    percentile: 额外输出的分位数（0-100），近处分位数比中心点更能代表人体前表面
+    max_depth: 超过该距离（米）的像素视为无效
+    geometry: 深度图未对齐时的StreamGeometry，提供时改用compute_unaligned_depth_stats
+
+    返回字典，每项为长度等于实例数的数组（单位米）:
+      median, min, percentile, valid_ratio（有效深度像素占掩码像素的比例）, valid_pixels
+    """
+    if geometry is not None:
+        return compute_unaligned_depth_stats(depth_image, masks, boxes, geometry, depth_scale,
+                                             percentile, max_depth)
+    count = len(boxes)
+    stats = empty_depth_stats(count)
+    if count == 0 or depth_image is None:
+        return stats
+
+    box_masks = decode_masks(masks, boxes, depth_image.shape)
+
+    # 收集每个实例掩码下的深度值，拼接后统一处理
+    values = []
+    labels = []
+    mask_pixels = np.zeros(count, dtype=np.int64)
+    for i, bm in enumerate(box_masks):
+        if bm is None or bm.mask.size == 0:
+            continue
+        instance_values = depth_image[bm.y1:bm.y2, bm.x1:bm.x2][bm.mask]
+        mask_pixels[i] = instance_values.size
+        values.append(instance_values)
+        labels.append(np.full(instance_values.size, i, dtype=np.int32))
+
+    if not values:
+        return stats
+
+    values = np.concatenate(values)
+    labels = np.concatenate(labels)
+
+    # 0为无效深度（空洞），超出量程的像素同样丢弃
+    valid = values > 0
+    if max_depth is not None:
+        valid &= values <= int(max_depth / depth_scale)
+    values = values[valid]
+    labels = labels[valid]
+
+    # 按(实例, 深度)排序，每个实例的深度值成为连续的有序片段
+    order = np.lexsort((values, labels))
+    sorted_values = values[order]
+    counts = np.bincount(labels, minlength=count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    stats["valid_pixels"] = counts
+    has_pixels = mask_pixels > 0
+    stats["valid_ratio"][has_pixels] = counts[has_pixels] / mask_pixels[has_pixels]
+    stats["min"] = (sorted_quantile(sorted_values, starts, counts, 0.0) * depth_scale).astype(np.float32)
+    stats["median"] = (sorted_quantile(sorted_values, starts, counts, 0.5) * depth_scale).astype(np.float32)
+    stats["percentile"] = (sorted_quantile(sorted_values, starts, counts, percentile / 100.0)
+                           * depth_scale).astype(np.float32)
+    return stats
+
+def compute_unaligned_depth_stats(depth_image, masks, boxes, geometry, depth_scale=0.001,
+                                  percentile=10, max_depth=None, min_depth=0.3, extent_percentile=5):
+    """在未对齐的深度图上计算实例深度统计和三维位置
+
+    每个实例只处理其框在[min_depth, max_depth]深度范围内可能对应的深度图区域：
+    区域内的有效深度像素反投影为三维点，经外参变换到彩色相机坐标系后投影到彩色图，
+    落在实例掩码内的点即为该实例的点。开销随人数和人体大小增长，与整帧分辨率无关。
+    同一彩色像素只保留最近的点（与整帧对齐的遮挡处理一致），位置和尺寸用分位数
+    计算以抑制掩码边缘的残余噪声。
+
+    在compute_instance_depth_stats的结果之外增加（彩色相机坐标系，单位米）:
+      centroid: (N, 3) 各轴中位数
+      extent: (N, 3) 各轴 extent_percentile ~ 100-extent_percentile 分位数之差
+    深度统计取点在彩色相机坐标系下的z值，valid_ratio和valid_pixels按被覆盖的掩码像素计。
+    """
+    count = len(boxes)
+    stats = empty_depth_stats(count, positions=True)
+    if count == 0 or depth_image is None:
+        return stats
+
+    # 掩码在彩色图坐标系下，按彩色帧尺寸解码，两路流分辨率可以不同
+    color_width, color_height = geometry.color_intrinsics[:2]
+    box_masks = decode_masks(masks, boxes, (int(color_height), int(color_width)))
+    far = max_depth if max_depth is not None else 65535 * depth_scale
+    upper = int(far / depth_scale)
+    quantiles = [0.0, percentile, 50.0, extent_percentile, 100.0 - extent_percentile]
+    for i, bm in enumerate(box_masks):
+        if bm is None or bm.mask.size == 0:
+            continue
+        x1, y1, x2, y2 = geometry.color_box_to_depth((bm.x1, bm.y1, bm.x2, bm.y2), min_depth, far)
+        region = depth_image[y1:y2, x1:x2]
+        vs, us = np.nonzero((region > 0) & (region <= upper))
+        if vs.size == 0:
+            continue
+        z = region[vs, us] * depth_scale
+        points = geometry.depth_to_color(us + x1, vs + y1, z)
+        cu, cv = geometry.project_color(points)
+
+        # 只保留投影落在实例掩码内的点
+        cu -= bm.x1
+        cv -= bm.y1
+        height, width = bm.mask.shape
+        inside = (cu >= 0) & (cu < width) & (cv >= 0) & (cv < height) & (points[:, 2] > 0)
+        cu, cv, points = cu[inside], cv[inside], points[inside]
+        hit = bm.mask[cv, cu]
+        cu, cv, points = cu[hit], cv[hit], points[hit]
+        if points.shape[0] == 0:
+            continue
+
+        # 多个深度像素落在同一彩色像素时只保留最近的点，被遮挡的背景点随之剔除
+        pixel = cv * width + cu
+        order = np.lexsort((points[:, 2], pixel))
+        _, first = np.unique(pixel[order], return_index=True)
+        points = points[order[first]]
+        mask_pixels = np.count_nonzero(bm.mask)
+        minimum, near, center, low, high = np.percentile(points, quantiles, axis=0)
+        stats["min"][i] = minimum[2]
+        stats["percentile"][i] = near[2]
+        stats["median"][i] = center[2]
+        stats["valid_pixels"][i] = points.shape[0]
+        stats["valid_ratio"][i] = points.shape[0] / mask_pixels if mask_pixels else 0.0
+        stats["centroid"][i] = center
+        stats["extent"][i] = high - low
+    return stats
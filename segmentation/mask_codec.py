@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+掩码编码 - 游程编码(RLE)和多边形，用于结果的紧凑存储与传输
+"""
+
+import cv2
+import numpy as np
+
+from .mask_utils import BoxMask
+
+def encode_rle(box_mask):
+    """将BoxMask编码为游程
+
+    按列优先展开（与COCO RLE一致），counts从0值的长度开始交替记录，
+    坐标相对于检测框左上角origin。
+    """
+    mask = np.asarray(box_mask.mask, dtype=bool)
+    height, width = mask.shape[:2]
+    flat = mask.ravel(order='F')
+    if flat.size == 0:
+        counts = np.zeros(0, dtype=np.uint32)
+    else:
+        changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+        boundaries = np.concatenate(([0], changes, [flat.size]))
+        counts = np.diff(boundaries).astype(np.uint32)
+        if flat[0]:
+            counts = np.concatenate(([0], counts)).astype(np.uint32)
+    return {"origin": [int(box_mask.x1), int(box_mask.y1)], "size": [height, width], "counts": counts}
+
+def decode_rle(rle):
+    """将游程解码为BoxMask"""
+    height, width = rle["size"]
+    counts = np.asarray(rle["counts"], dtype=np.int64)
+    values = np.zeros(len(counts), dtype=bool)
+    values[1::2] = True
+    flat = np.repeat(values, counts)
+    mask = flat.reshape((width, height)).T if flat.size else np.zeros((height, width), dtype=bool)
+    x1, y1 = rle["origin"]
+    return BoxMask(x1, y1, np.ascontiguousarray(mask))
+
+def encode_polygons(box_mask, epsilon=1.0):
+    """将BoxMask编码为多边形列表，每个多边形为整帧坐标下的[x0, y0, x1, y1, ...]"""
+    if box_mask.mask.size == 0:
+        return []
+    contours, _ = cv2.findContours(box_mask.mask.astype(np.uint8), cv2.RETR_EXTERNAL,
+                                   cv2.CHAIN_APPROX_SIMPLE)
+    polygons = []
+    for contour in contours:
+        if epsilon > 0:
+            contour = cv2.approxPolyDP(contour, epsilon, True)
+        if len(contour) < 3:
+            continue
+        points = contour.reshape(-1, 2) + (box_mask.x1, box_mask.y1)
+        polygons.append(points.ravel().tolist())
+    return polygons
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+掩码工具 - 只在检测框区域内上采样原型分辨率掩码
+"""
+
+import cv2
+import numpy as np
+
+class BoxMask:
+    """以检测框为参考的紧凑二值掩码，mask只覆盖框内区域"""
+
+    __slots__ = ('x1', 'y1', 'mask')
+
+    def __init__(self, x1, y1, mask):
+        self.x1 = x1
+        self.y1 = y1
+        self.mask = mask
+
+    @property
+    def x2(self):
+        return self.x1 + self.mask.shape[1]
+
+    @property
+    def y2(self):
+        return self.y1 + self.mask.shape[0]
+
+    @property
+    def area(self):
+        """掩码像素数"""
+        return int(np.count_nonzero(self.mask))
+
+    def to_full(self, height, width):
+        """展开为整帧大小的二值掩码"""
+        full = np.zeros((height, width), dtype=bool)
+        full[self.y1:self.y2, self.x1:self.x2] = self.mask
+        return full
+
+    def shifted(self, dx, dy, height, width):
+        """平移(dx, dy)像素后的掩码，超出画面的部分被裁掉"""
+        x1, y1 = self.x1 + int(dx), self.y1 + int(dy)
+        x2, y2 = x1 + self.mask.shape[1], y1 + self.mask.shape[0]
+        cx1, cy1 = max(x1, 0), max(y1, 0)
+        cx2, cy2 = max(min(x2, width), cx1), max(min(y2, height), cy1)
+        mask = self.mask[cy1 - y1:cy2 - y1, cx1 - x1:cx2 - x1]
+        return BoxMask(cx1, cy1, mask)
+
+    def paste(self, target, value):
+        """将掩码区域写入target（整帧数组）"""
+        region = target[self.y1:self.y2, self.x1:self.x2]
+        region[self.mask] = value
+
+def letterbox_params(mask_shape, frame_shape):
+    """计算原型掩码到原始帧的letterbox映射参数(缩放比, x方向填充, y方向填充)
+
+    与ultralytics的LetterBox/scale_boxes保持一致：掩码分辨率为推理输入尺寸，
+    原图等比缩放后居中填充。
+    """
+    mask_h, mask_w = mask_shape[:2]
+    frame_h, frame_w = frame_shape[:2]
+    gain = min(mask_h / frame_h, mask_w / frame_w)
+    pad_x = round((mask_w - frame_w * gain) / 2 - 0.1)
+    pad_y = round((mask_h - frame_h * gain) / 2 - 0.1)
+    return gain, pad_x, pad_y
+
+def clip_box(box, frame_shape):
+    """检测框向外取整并裁剪到帧内，返回整数(x1, y1, x2, y2)，x2>=x1、y2>=y1"""
+    frame_h, frame_w = frame_shape[:2]
+    x1, y1, x2, y2 = box
+    x1 = min(max(int(np.floor(x1)), 0), frame_w)
+    y1 = min(max(int(np.floor(y1)), 0), frame_h)
+    x2 = min(max(int(np.ceil(x2)), x1), frame_w)
+    y2 = min(max(int(np.ceil(y2)), y1), frame_h)
+    return x1, y1, x2, y2
+
+def warp_mask_region(mask, region, params, out=None):
+    """把原型掩码上采样到帧内区域region=(x1, y1, x2, y2)，返回float32概率图
+
+    out为形状(y2-y1, x2-x1)的连续float32数组时直接写入，不再分配。
+    """
+    x1, y1, x2, y2 = region
+    gain, pad_x, pad_y = params
+    # 逆映射：框内每个输出像素在原型掩码中的采样位置（像素中心对齐，与cv2.resize一致）
+    matrix = np.array([
+        [gain, 0.0, (x1 + 0.5) * gain - 0.5 + pad_x],
+        [0.0, gain, (y1 + 0.5) * gain - 0.5 + pad_y],
+    ], dtype=np.float32)
+    return cv2.warpAffine(np.asarray(mask, dtype=np.float32), matrix, (x2 - x1, y2 - y1), dst=out,
+                          flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+def crop_mask_to_box(mask, box, frame_shape, threshold=0.5, params=None):
+    """只对检测框区域上采样原型掩码并二值化，返回BoxMask"""
+    x1, y1, x2, y2 = clip_box(box, frame_shape)
+    if x2 <= x1 or y2 <= y1:
+        return BoxMask(x1, y1, np.zeros((0, 0), dtype=bool))
+
+    if params is None:
+        params = letterbox_params(mask.shape, frame_shape)
+    region = warp_mask_region(mask, (x1, y1, x2, y2), params)
+    return BoxMask(x1, y1, region > threshold)
+
+def decode_masks(masks, boxes, frame_shape, threshold=0.5):
+    """将一组原型分辨率掩码转换为BoxMask列表，已是BoxMask的直接保留"""
+    box_masks = []
+    params = None
+    for mask, box in zip(masks, boxes):
+        if mask is None or isinstance(mask, BoxMask):
+            box_masks.append(mask)
+            continue
+        if params is None:
+            params = letterbox_params(mask.shape, frame_shape)
+        box_masks.append(crop_mask_to_box(mask, box, frame_shape, threshold, params))
+    return box_masks
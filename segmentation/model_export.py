@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+推理后端 - PyTorch权重导出为ONNX/OpenVINO并缓存，按短时标定结果自动选择最快后端
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import importlib.util
+import time
+
+import numpy as np
+
+BACKEND_PYTORCH = 'pytorch'
+BACKEND_ONNX = 'onnx'
+BACKEND_OPENVINO = 'openvino'
+BACKEND_TENSORRT = 'tensorrt'
+BACKENDS = [BACKEND_PYTORCH, BACKEND_ONNX, BACKEND_OPENVINO, BACKEND_TENSORRT]
+
+# 各后端导出所需的运行时模块
+BACKEND_MODULES = {BACKEND_ONNX: 'onnxruntime', BACKEND_OPENVINO: 'openvino'}
+
+# 权重哈希缓存，按(路径, 大小, 修改时间)为键，同一次启动中不重复读取大权重文件
+_model_hashes = {}
+
+def model_hash(model_path, length=12):
+    """权重文件内容的哈希，权重更新后缓存自动失效"""
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _model_hashes:
+        digest = hashlib.sha1()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _model_hashes[key] = digest.hexdigest()
+    return _model_hashes[key][:length]
+
+def cached_export_path(model_path, backend, imgsz, cache_dir=None):
+    """导出结果在缓存目录中的路径，以模型哈希和推理尺寸为键"""
+    if cache_dir is None:
+        cache_dir = os.path.dirname(model_path) or "."
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    name = f"{stem}-{model_hash(model_path)}-{imgsz}"
+    if backend == BACKEND_ONNX:
+        return os.path.join(cache_dir, name + ".onnx")
+    if backend == BACKEND_OPENVINO:
+        # ultralytics按目录名后缀_openvino_model识别OpenVINO IR
+        return os.path.join(cache_dir, name + "_openvino_model")
+    raise ValueError(f"不支持导出的后端: {backend}")
+
+def inference_device():
+    """标定结果适用的设备描述，如cuda-NVIDIA_GeForce_RTX_4090或cpu"""
+    import torch
+    if torch.cuda.is_available():
+        device = f"cuda-{torch.cuda.get_device_name(0)}"
+    else:
+        device = "cpu"
+    return re.sub(r"[^0-9A-Za-z.-]+", "_", device)
+
+def calibration_cache_path(model_path, imgsz, device, cache_dir=None):
+    """标定结果缓存文件路径，与导出模型放在一起，以模型哈希、推理尺寸和设备为键"""
+    if cache_dir is None:
+        cache_dir = os.path.dirname(model_path) or "."
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{model_hash(model_path)}-{imgsz}-{device}.calibration.json")
+
+def load_calibration(cache_path, backends):
+    """读取缓存的标定结果，缓存不存在、后端不在backends中或模型已被删除时返回None"""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        backend, path, timings = cached["backend"], cached["path"], cached["timings"]
+    except (OSError, ValueError, KeyError):
+        return None
+    if backend not in backends or not os.path.exists(path):
+        return None
+    return backend, path, {name: ms for name, ms in timings.items() if name in backends}
+
+def save_calibration(cache_path, backend, path, timings):
+    """写出标定结果缓存，写失败只打印警告"""
+    try:
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"backend": backend, "path": path, "timings": timings}, f, indent=1)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"无法写出标定结果缓存 {cache_path}: {e}")
+
+def backend_available(backend):
+    """后端的运行时是否已安装"""
+    module = BACKEND_MODULES.get(backend)
+    return module is None or importlib.util.find_spec(module) is not None
+
+def export_model(model_path, backend, imgsz=320, cache_dir=None):
+    """将.pt权重导出为指定后端格式，已有缓存时直接返回缓存路径，失败返回None"""
+    if not backend_available(backend):
+        print(f"未安装 {BACKEND_MODULES[backend]}，跳过 {backend} 导出")
+        return None
+    target = cached_export_path(model_path, backend, imgsz, cache_dir)
+    if os.path.exists(target):
+        return target
+
+    try:
+        from ultralytics import YOLO
+        print(f"导出 {backend} 模型 (imgsz={imgsz})...")
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz, verbose=False)
+        # 导出结果默认写在权重旁边且不带哈希，移动到缓存路径
+        if os.path.abspath(str(exported)) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            shutil.move(str(exported), target)
+        print(f"已缓存 {backend} 模型: {target}")
+        return target
+    except Exception as e:
+        print(f"{backend} 导出失败: {e}")
+        return None
+
+def candidate_models(model_path, imgsz=320, backends=None, cache_dir=None):
+    """列出可用于标定的(后端, 模型路径)，按需导出并缓存"""
+    if backends is None:
+        backends = BACKENDS
+    candidates = []
+    for backend in backends:
+        if backend == BACKEND_PYTORCH:
+            if model_path.endswith('.pt'):
+                candidates.append((backend, model_path))
+        elif backend == BACKEND_TENSORRT:
+            # TensorRT引擎依赖目标GPU，只使用已有的.engine文件，不自动导出
+            engine_path = os.path.splitext(model_path)[0] + ".engine"
+            if os.path.exists(engine_path):
+                candidates.append((backend, engine_path))
+        elif model_path.endswith('.pt'):
+            exported = export_model(model_path, backend, imgsz, cache_dir)
+            if exported is not None:
+                candidates.append((backend, exported))
+    return candidates
+
+def calibrate_backend(model_path, imgsz=320, frame_shape=(480, 848, 3), iterations=20):
+    """加载模型并在合成帧上测量单帧推理延迟中位数（毫秒），加载失败返回None"""
+    from .yolov11_segmentation import YOLOv11Segmentation
+    segmentor = YOLOv11Segmentation(model_path, imgsz=imgsz)
+    if not segmentor.initialize(frame_shape):
+        return None
+    frame = np.random.default_rng(0).integers(0, 256, frame_shape, dtype=np.uint8)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        segmentor.segment_frame(frame)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(latencies))
+
+def select_backend(model_path, imgsz=320, backends=None, cache_dir=None, frame_shape=(480, 848, 3),
+                   iterations=20, recalibrate=False):
+    """对每个可用后端做短时标定，返回(最快后端, 模型路径, {后端: 延迟毫秒})
+
+    标定结果按模型哈希、推理尺寸和设备缓存在导出模型旁边，之后的启动直接复用，
+    不再逐一加载各后端；recalibrate为True时忽略缓存重新标定。
+    """
+    if backends is None:
+        backends = BACKENDS
+    cache_path = calibration_cache_path(model_path, imgsz, inference_device(), cache_dir)
+    if not recalibrate:
+        cached = load_calibration(cache_path, backends)
+        if cached is not None:
+            print(f"使用缓存的后端标定结果: {cache_path}")
+            return cached
+
+    timings = {}
+    best = (BACKEND_PYTORCH, model_path)
+    best_ms = None
+    for backend, path in candidate_models(model_path, imgsz, backends, cache_dir):
+        print(f"标定后端 {backend}: {path}")
+        latency_ms = calibrate_backend(path, imgsz, frame_shape, iterations)
+        if latency_ms is None:
+            continue
+        timings[backend] = latency_ms
+        print(f"  {backend}: {latency_ms:.1f} ms/帧")
+        if best_ms is None or latency_ms < best_ms:
+            best, best_ms = (backend, path), latency_ms
+    if timings:
+        save_calibration(cache_path, best[0], best[1], timings)
+    return best[0], best[1], timings
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+运动门控 - 在缩小的彩色/深度图上检测画面变化，静止场景跳过推理
+"""
+
+import cv2
+import numpy as np
+
+class MotionGate:
+    """廉价的画面变化检测器
+
+    与上一次运行推理时的参考帧比较（而不是相邻帧），缓慢变化也会逐渐累积并触发推理。
+    彩色图转灰度后缩小到width宽，统计灰度差超过pixel_threshold的像素比例；深度图
+    最近邻缩小，统计两帧都有效且深度差超过depth_threshold（原始深度单位）的像素比例。
+    任一比例超过changed_ratio，或距上次推理已达max_stale_frames帧时需要推理。
+    """
+
+    def __init__(self, width=96, pixel_threshold=20, depth_threshold=100, changed_ratio=0.005,
+                 max_stale_frames=30, use_depth=True):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.depth_threshold = depth_threshold
+        self.changed_ratio = changed_ratio
+        self.max_stale_frames = max_stale_frames
+        self.use_depth = use_depth
+        self.reference_gray = None
+        self.reference_depth = None
+        self.frames_since_inference = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def reset(self):
+        """丢弃参考帧，下一帧一定运行推理"""
+        self.reference_gray = None
+        self.reference_depth = None
+
+    @property
+    def skip_rate(self):
+        """跳过推理的帧比例"""
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def downscale(self, image, interpolation):
+        """按固定宽度缩小"""
+        height, width = image.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    def color_changed(self, gray):
+        """灰度变化像素比例是否超过阈值"""
+        diff = cv2.absdiff(gray, self.reference_gray)
+        return np.count_nonzero(diff > self.pixel_threshold) > self.changed_ratio * diff.size
+
+    def depth_changed(self, depth):
+        """深度变化像素比例是否超过阈值（忽略无效深度）"""
+        reference = self.reference_depth
+        valid = (depth > 0) & (reference > 0)
+        diff = np.abs(depth.astype(np.int32) - reference.astype(np.int32))
+        # 有效性翻转（遮挡/出现）本身也算变化
+        changed = (valid & (diff > self.depth_threshold)) | ((depth > 0) != (reference > 0))
+        return np.count_nonzero(changed) > self.changed_ratio * depth.size
+
+    def should_run(self, color, depth=None):
+        """判断本帧是否需要推理；需要时同时把本帧设为新的参考帧"""
+        self.frames += 1
+        gray = self.downscale(cv2.cvtColor(color, cv2.COLOR_BGR2GRAY), cv2.INTER_AREA)
+        small_depth = None
+        if self.use_depth and depth is not None:
+            small_depth = self.downscale(depth, cv2.INTER_NEAREST)
+
+        run = (self.reference_gray is None
+               or self.frames_since_inference + 1 >= self.max_stale_frames
+               or gray.shape != self.reference_gray.shape
+               or self.color_changed(gray))
+        if not run and small_depth is not None:
+            run = self.reference_depth is None or self.depth_changed(small_depth)
+
+        if run:
+            self.reference_gray = gray
+            self.reference_depth = small_depth
+            self.frames_since_inference = 0
+        else:
+            self.frames_since_inference += 1
+            self.skipped += 1
+        return run
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+推理尺寸控制器 - 根据实测推理延迟在一组输入尺寸之间切换，维持目标帧预算
+"""
+
+class ResolutionController:
+    """延迟预算控制器
+
+    对当前尺寸的推理延迟做指数滑动平均。超出预算时降一级尺寸；延迟充足且按面积
+    估算的上一级尺寸延迟仍在预算内时升一级。每次切换后等待cooldown帧再做判断，
+    避免在两个尺寸之间来回抖动。
+    """
+
+    def __init__(self, segmentor, target_ms, input_sizes=(256, 320, 480, 640), smoothing=0.2,
+                 cooldown=30, upscale_margin=0.85):
+        self.segmentor = segmentor
+        self.target_ms = target_ms
+        self.input_sizes = sorted(input_sizes)
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        # 预测的升级后延迟低于 target_ms * upscale_margin 才升级
+        self.upscale_margin = upscale_margin
+        if segmentor.imgsz not in self.input_sizes:
+            segmentor.imgsz = min(self.input_sizes, key=lambda size: abs(size - segmentor.imgsz))
+        self.level = self.input_sizes.index(segmentor.imgsz)
+        self.average_ms = None
+        self.frames_since_switch = 0
+        self.switches = 0
+
+    @property
+    def imgsz(self):
+        """当前推理尺寸"""
+        return self.input_sizes[self.level]
+
+    def set_level(self, level):
+        """切换到指定档位"""
+        self.level = level
+        self.segmentor.imgsz = self.input_sizes[level]
+        self.average_ms = None
+        self.frames_since_switch = 0
+        self.switches += 1
+
+    def update(self, latency_ms):
+        """记录一次推理延迟，必要时切换尺寸，返回当前尺寸"""
+        if self.average_ms is None:
+            self.average_ms = latency_ms
+        else:
+            self.average_ms += self.smoothing * (latency_ms - self.average_ms)
+        self.frames_since_switch += 1
+        if self.frames_since_switch < self.cooldown:
+            return self.imgsz
+
+        if self.average_ms > self.target_ms and self.level > 0:
+            self.set_level(self.level - 1)
+        elif self.level + 1 < len(self.input_sizes):
+            # 推理耗时近似与输入面积成正比
+            ratio = (self.input_sizes[self.level + 1] / self.imgsz) ** 2
+            if self.average_ms * ratio < self.target_ms * self.upscale_margin:
+                self.set_level(self.level + 1)
+        return self.imgsz
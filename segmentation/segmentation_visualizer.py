@@ -1,133 +1,212 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-"""
-分割结果可视化类
-"""
-
-import cv2
-import numpy as np
-
-class SegmentationVisualizer:
-    """分割结果可视化类 - 无边界框版本"""
-    
-    def __init__(self):
-        # 定义颜色调色板
-        self.colors = [
-            (255, 0, 0), (0, 255, 0), (0, 0, 255),
-            (255, 255, 0), (255, 0, 255), (0, 255, 255),
-            (128, 0, 0), (0, 128, 0), (0, 0, 128),
-            (128, 128, 0), (128, 0, 128), (0, 128, 128)
-        ]
-        
-    def draw_segmentation(self, image, masks, boxes, classes, confidences, class_names, 
-                         depth_frame=None, fps_info=None):
-        """在图像上绘制分割结果，包含深度信息，但不绘制边界框"""
-        if image is None:
-            return image
-            
-        result_image = image.copy()
-        
-        # 绘制帧率信息
-        if fps_info:
-            # 创建半透明背景
-            overlay = result_image.copy()
-            cv2.rectangle(overlay, (10, 10), (300, 110), (0, 0, 0), -1)
-            cv2.addWeighted(overlay, 0.7, result_image, 0.3, 0, result_image)
-            
-            # 绘制帧率文本
-            y_offset = 30
-            line_height = 20
-            for key, value in fps_info.items():
-                text = f"{key}: {value}"
-                cv2.putText(result_image, text, (15, y_offset), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-                y_offset += line_height
-        
-        # 绘制每个检测到的实例
-        for i, (mask, box, cls, conf) in enumerate(zip(masks, boxes, classes, confidences)):
-            color = self.colors[i % len(self.colors)]
-            
-            # 获取边界框坐标（用于计算中心点）
-            x1, y1, x2, y2 = map(int, box)
-            
-            # 计算边界框中心点
-            center_x = (x1 + x2) // 2
-            center_y = (y1 + y2) // 2
-            
-            # 获取中心点深度
-            depth_value = 0.0
-            if depth_frame is not None:
-                depth_value = depth_frame.get_distance(center_x, center_y)
-                if depth_value > 0:
-                    # 在中心点绘制深度标记
-                    cv2.circle(result_image, (center_x, center_y), 8, color, -1)
-                    cv2.putText(result_image, f"{depth_value:.2f}m", 
-                               (center_x + 10, center_y), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            # 绘制分割掩码
-            if mask is not None:
-                # 将掩码调整为图像大小
-                mask_resized = cv2.resize(mask, (image.shape[1], image.shape[0]))
-                
-                # 创建彩色掩码
-                colored_mask = np.zeros_like(image)
-                colored_mask[mask_resized > 0.5] = color
-                
-                # 将掩码叠加到原图上
-                result_image = cv2.addWeighted(result_image, 0.7, colored_mask, 0.3, 0)
-            
-            # 添加标签（不绘制边界框，只显示标签）
-            class_name = class_names.get(int(cls), f"Class_{int(cls)}")
-            if depth_value > 0:
-                label = f"{class_name} {conf:.2f} ({depth_value:.2f}m)"
-            else:
-                label = f"{class_name} {conf:.2f}"
-            
-            # 计算标签位置（放在检测到的物体上方）
-            label_x = max(10, center_x - 50)
-            label_y = max(30, center_y - 20)
-            
-            # 计算标签背景大小
-            (label_width, label_height), baseline = cv2.getTextSize(
-                label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2
-            )
-            
-            # 绘制标签背景
-            cv2.rectangle(result_image, 
-                         (label_x, label_y - label_height - 5), 
-                         (label_x + label_width, label_y), 
-                         color, -1)
-            
-            # 绘制标签文本
-            cv2.putText(result_image, label, 
-                       (label_x, label_y - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        return result_image
-    
-    def create_depth_colormap(self, depth_frame):
-        """创建深度图的彩色可视化"""
-        depth_image = np.asanyarray(depth_frame.get_data())
-        depth_colormap = cv2.applyColorMap(
-            cv2.convertScaleAbs(depth_image, alpha=0.03), 
-            cv2.COLORMAP_JET
-        )
-        
-        # 在深度图上添加距离刻度
-        height, width = depth_colormap.shape[:2]
-        cv2.putText(depth_colormap, "Depth Map", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # 添加距离刻度
-        for i, dist in enumerate([1, 2, 3, 4, 5]):
-            y_pos = int(height * 0.1 * (i + 1))
-            cv2.line(depth_colormap, (width - 50, y_pos), (width - 30, y_pos), (255, 255, 255), 2)
-            cv2.putText(depth_colormap, f"{dist}m", (width - 45, y_pos + 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.3, (255, 255, 255), 1)
-        
-        return depth_colormap
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+"""
+分割结果可视化类
+"""
+
+import cv2
+import numpy as np
+
+from .mask_utils import BoxMask, clip_box, letterbox_params, warp_mask_region
+from .depth_statistics import compute_instance_depth_stats
+from utils.depth_colorizer import DepthColorizer
+from utils.label_sprites import LabelSpriteCache
+
+class SegmentationVisualizer:
+    """分割结果可视化类 - 无边界框版本"""
+    
+    def __init__(self):
+        # 定义颜色调色板
+        self.colors = [
+            (255, 0, 0), (0, 255, 0), (0, 0, 255),
+            (255, 255, 0), (255, 0, 255), (0, 255, 255),
+            (128, 0, 0), (0, 128, 0), (0, 0, 128),
+            (128, 128, 0), (128, 0, 128), (0, 128, 128)
+        ]
+        # 可选的MetricsRegistry，用于记录掩码合成耗时
+        self.metrics = None
+        # 深度图着色（预计算查找表，缓存静态叠加层）
+        self.depth_colorizer = DepthColorizer()
+        # 标签精灵缓存和跨帧复用的暂存缓冲，稳定运行时每帧几乎不分配内存
+        self.label_sprites = LabelSpriteCache()
+        self.buffers = {}
+        
+    def draw_segmentation(self, image, masks, boxes, classes, confidences, class_names, 
+                         depth_frame=None, fps_info=None, depth_stats=None, in_place=False,
+                         track_ids=None, out=None):
+        """在图像上绘制分割结果，包含深度信息，但不绘制边界框
+
+        depth_stats为compute_instance_depth_stats的结果，未提供时根据depth_frame计算
+        in_place为True时直接在image上绘制（调用方需独占该图像），省去整帧拷贝
+        out为与image同形状的预分配画布时先把image拷贝进去再绘制，画布可跨帧复用
+        track_ids提供时按跟踪ID选取颜色，同一个人在相邻帧之间颜色保持不变
+        """
+        if image is None:
+            return image
+        
+        if depth_stats is None and depth_frame is not None:
+            depth_stats = compute_instance_depth_stats(
+                np.asanyarray(depth_frame.get_data()), masks, boxes, depth_frame.get_units()
+            )
+            
+        if in_place:
+            result_image = image
+        elif out is not None:
+            np.copyto(out, image)
+            result_image = out
+        else:
+            result_image = image.copy()
+        
+        # 绘制帧率信息
+        if fps_info:
+            # 创建半透明背景（只处理面板区域，不再拷贝整帧）
+            panel_bottom = max(110, 25 + 20 * len(fps_info))
+            panel = result_image[10:panel_bottom + 1, 10:301]
+            cv2.addWeighted(panel, 0.3, panel, 0, 0, dst=panel)
+            
+            # 绘制帧率文本
+            y_offset = 30
+            line_height = 20
+            for key, value in fps_info.items():
+                text = f"{key}: {value}"
+                cv2.putText(result_image, text, (15, y_offset), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                y_offset += line_height
+        
+        # 一次性合成所有实例的掩码
+        if track_ids is not None:
+            instance_colors = [self.colors[int(tid) % len(self.colors)] for tid in track_ids]
+        else:
+            instance_colors = [self.colors[i % len(self.colors)] for i in range(len(boxes))]
+        if self.metrics is not None:
+            with self.metrics.timer("mask_processing"):
+                self.composite_masks(result_image, masks, boxes, instance_colors)
+        else:
+            self.composite_masks(result_image, masks, boxes, instance_colors)
+        
+        # 绘制每个检测到的实例的深度标记和标签
+        for i, (box, cls, conf) in enumerate(zip(boxes, classes, confidences)):
+            color = instance_colors[i]
+            
+            # 获取边界框坐标（用于计算中心点）
+            x1, y1, x2, y2 = map(int, box)
+            
+            # 计算边界框中心点
+            center_x = (x1 + x2) // 2
+            center_y = (y1 + y2) // 2
+            
+            # 获取实例掩码内的深度中位数
+            depth_value = 0.0
+            if depth_stats is not None:
+                depth_value = float(depth_stats["median"][i])
+                if depth_value > 0:
+                    # 在中心点绘制深度标记
+                    cv2.circle(result_image, (center_x, center_y), 8, color, -1)
+                    cv2.putText(result_image, f"{depth_value:.2f}m", 
+                               (center_x + 10, center_y), 
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            
+            # 添加标签（不绘制边界框，只显示标签）
+            class_name = class_names.get(int(cls), f"Class_{int(cls)}")
+            if track_ids is not None:
+                class_name = f"{class_name} #{int(track_ids[i])}"
+            label_parts = (class_name, f"{conf:.2f}")
+            if depth_value > 0:
+                label_parts += (f"({depth_value:.2f}m)",)
+            
+            # 计算标签位置（放在检测到的物体上方）
+            label_x = max(10, center_x - 50)
+            label_y = max(30, center_y - 20)
+            
+            # 带背景框的标签按段取缓存的精灵整块拷贝
+            self.label_sprites.draw(result_image, label_parts, label_x, label_y - 5, color)
+        
+        return result_image
+    
+    def scratch(self, name, shape, dtype):
+        """按名称复用的暂存缓冲，返回指定形状的连续视图，容量不够时才重新分配"""
+        size = int(np.prod(shape))
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(size, dtype=dtype)
+            self.buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+    
+    def composite_masks(self, result_image, masks, boxes, instance_colors, alpha=0.3):
+        """单次混合合成所有实例掩码
+
+        每个掩码只在检测框区域内上采样，写入一张标签图（重叠区域后绘制的实例覆盖先绘制的），
+        再通过调色板查表得到彩色图，最后只在所有检测框的并集区域内做一次混合，
+        因此开销与人物覆盖的面积成正比，与实例数量基本无关。
+        标签图、上采样结果、彩色掩码和混合结果都写入复用的暂存缓冲。
+        """
+        frame_shape = result_image.shape
+        regions = []
+        params = None
+        for i, (mask, box) in enumerate(zip(masks[:len(instance_colors)], boxes)):
+            if mask is None:
+                continue
+            if isinstance(mask, BoxMask):
+                if mask.mask.size > 0:
+                    regions.append((i, (mask.x1, mask.y1, mask.x2, mask.y2), mask))
+                continue
+            region = clip_box(box, frame_shape)
+            if region[2] > region[0] and region[3] > region[1]:
+                if params is None:
+                    params = letterbox_params(mask.shape, frame_shape)
+                regions.append((i, region, mask))
+        if not regions:
+            return result_image
+        
+        # 所有实例框的并集区域
+        rx1 = min(region[0] for _, region, _ in regions)
+        ry1 = min(region[1] for _, region, _ in regions)
+        rx2 = max(region[2] for _, region, _ in regions)
+        ry2 = max(region[3] for _, region, _ in regions)
+        union_shape = (ry2 - ry1, rx2 - rx1)
+        
+        label_dtype = np.uint8 if len(instance_colors) < 255 else np.uint16
+        label_map = self.scratch("labels", union_shape, label_dtype)
+        label_map.fill(0)
+        for i, (x1, y1, x2, y2), mask in regions:
+            target = label_map[y1 - ry1:y2 - ry1, x1 - rx1:x2 - rx1]
+            if isinstance(mask, BoxMask):
+                np.copyto(target, i + 1, where=mask.mask)
+                continue
+            probability = warp_mask_region(mask, (x1, y1, x2, y2), params,
+                                           out=self.scratch("probability", (y2 - y1, x2 - x1), np.float32))
+            inside = self.scratch("inside", probability.shape, np.bool_)
+            np.greater(probability, 0.5, out=inside)
+            np.copyto(target, i + 1, where=inside)
+        
+        # 标签0为背景，调色板查表得到彩色掩码
+        colored_mask = self.scratch("colored", union_shape + (3,), np.uint8)
+        if label_dtype == np.uint8:
+            # 每个通道一次LUT再合并；np.take会为索引分配一份intp拷贝
+            lut = self.scratch("lut", (3, 256), np.uint8)
+            lut.fill(0)
+            lut[:, 1:len(instance_colors) + 1] = np.asarray(instance_colors, dtype=np.uint8).T
+            planes = self.scratch("planes", (3,) + union_shape, np.uint8)
+            for channel in range(3):
+                cv2.LUT(label_map, lut[channel], dst=planes[channel])
+            cv2.merge(list(planes), dst=colored_mask)
+        else:
+            palette = np.zeros((len(instance_colors) + 1, 3), dtype=np.uint8)
+            palette[1:] = instance_colors
+            np.take(palette, label_map, axis=0, out=colored_mask, mode='clip')
+        
+        # 只在掩码区域内写回混合结果，背景保持不变
+        roi = result_image[ry1:ry2, rx1:rx2]
+        cv2.addWeighted(roi, 1.0 - alpha, colored_mask, alpha, 0, dst=colored_mask)
+        covered = self.scratch("covered", union_shape, np.bool_)
+        np.greater(label_map, 0, out=covered)
+        np.copyto(roi, colored_mask, where=covered[..., None])
+        return result_image
+    
+    def create_depth_colormap(self, depth_frame):
+        """创建深度图的彩色可视化（结果写入复用的缓冲，下一次调用前有效）"""
+        return self.depth_colorizer.colorize_frame(depth_frame)
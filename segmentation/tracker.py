@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+轻量多目标跟踪 - 关键帧之间用跟踪结果代替完整推理
+"""
+
+import cv2
+import numpy as np
+
+from .mask_utils import decode_masks
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """两组xyxy边界框的IoU矩阵"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+class Track:
+    """单个跟踪目标"""
+
+    def __init__(self, track_id, box, box_mask, cls, conf):
+        self.track_id = track_id
+        self.box = np.asarray(box, dtype=np.float32)
+        self.box_mask = box_mask
+        self.cls = cls
+        self.conf = conf
+        self.hits = 1
+        self.misses = 0
+        self.quality = 1.0  # 最近一次传播的可信度
+
+class IoUTracker:
+    """基于IoU/中心距离关联的多目标跟踪器
+
+    关键帧上用检测结果更新轨迹并分配稳定的跟踪ID；非关键帧上用稀疏光流估计
+    每个目标的平移，同时平移其边界框和掩码。update时propagate为False（每帧都是关键帧）
+    则只做关联，不解码掩码也不保留光流所需的灰度图。
+    """
+
+    def __init__(self, iou_threshold=0.3, max_center_distance=0.15, max_missed=5,
+                 use_optical_flow=True, flow_scale=0.5):
+        self.iou_threshold = iou_threshold
+        # 中心距离阈值，相对于画面对角线
+        self.max_center_distance = max_center_distance
+        self.max_missed = max_missed
+        self.use_optical_flow = use_optical_flow
+        self.flow_scale = flow_scale
+        self.tracks = []
+        self.next_id = 1
+        self.prev_gray = None
+        self.class_names = {}
+
+    def reset(self):
+        """清空所有轨迹"""
+        self.tracks = []
+        self.prev_gray = None
+
+    def prepare_gray(self, image):
+        """缩小后的灰度图，用于光流"""
+        if not self.use_optical_flow or image is None:
+            return None
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.flow_scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.flow_scale, fy=self.flow_scale,
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def associate(self, boxes, classes, frame_shape):
+        """将检测与已有轨迹关联，返回与检测对齐的轨迹索引（-1表示新目标）"""
+        assignment = np.full(len(boxes), -1, dtype=np.int64)
+        if not self.tracks or len(boxes) == 0:
+            return assignment
+
+        track_boxes = np.stack([track.box for track in self.tracks])
+        track_classes = np.array([track.cls for track in self.tracks])
+        classes = np.asarray(classes)
+        same_class = classes[:, None] == track_classes[None, :]
+        iou = box_iou_matrix(boxes, track_boxes) * same_class
+
+        # 按IoU从大到小贪心匹配
+        used_tracks = set()
+        for flat_index in np.argsort(-iou, axis=None):
+            det, trk = np.unravel_index(flat_index, iou.shape)
+            if iou[det, trk] < self.iou_threshold:
+                break
+            if assignment[det] >= 0 or trk in used_tracks:
+                continue
+            assignment[det] = trk
+            used_tracks.add(trk)
+
+        # IoU匹配失败的检测再按中心距离匹配（快速移动或框尺寸突变）
+        unmatched = np.flatnonzero(assignment < 0)
+        if len(unmatched) and len(used_tracks) < len(self.tracks):
+            diagonal = np.hypot(frame_shape[0], frame_shape[1])
+            det_centers = (np.asarray(boxes)[unmatched, :2] + np.asarray(boxes)[unmatched, 2:]) / 2
+            trk_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+            distance = np.linalg.norm(det_centers[:, None] - trk_centers[None, :], axis=2) / diagonal
+            distance[~same_class[unmatched]] = np.inf
+            distance[:, list(used_tracks)] = np.inf
+            for flat_index in np.argsort(distance, axis=None):
+                row, trk = np.unravel_index(flat_index, distance.shape)
+                if distance[row, trk] > self.max_center_distance:
+                    break
+                det = unmatched[row]
+                if assignment[det] >= 0 or trk in used_tracks:
+                    continue
+                assignment[det] = trk
+                used_tracks.add(trk)
+        return assignment
+
+    def update(self, image, masks, boxes, classes, confidences, class_names=None, propagate=True):
+        """关键帧：用检测结果更新轨迹，返回与检测对齐的跟踪ID数组
+
+        propagate为False时后续不会调用predict，跳过掩码解码和灰度图准备
+        """
+        if class_names:
+            self.class_names = class_names
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        if propagate and len(masks):
+            box_masks = decode_masks(masks, boxes, image.shape)
+        else:
+            box_masks = [None] * len(boxes)
+        assignment = self.associate(boxes, classes, image.shape)
+
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        existing_tracks = len(self.tracks)
+        matched = set()
+        for det, trk in enumerate(assignment):
+            if trk >= 0:
+                track = self.tracks[trk]
+                track.box = boxes[det]
+                track.box_mask = box_masks[det]
+                track.cls = classes[det]
+                track.conf = confidences[det]
+                track.hits += 1
+                track.misses = 0
+                track.quality = 1.0
+                matched.add(trk)
+            else:
+                track = Track(self.next_id, boxes[det], box_masks[det], classes[det], confidences[det])
+                self.next_id += 1
+                self.tracks.append(track)
+            track_ids[det] = track.track_id
+
+        # 未匹配的轨迹累计丢失次数，超过上限后删除
+        for index in range(existing_tracks):
+            if index not in matched:
+                self.tracks[index].misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_missed]
+
+        self.prev_gray = self.prepare_gray(image) if propagate else None
+        return track_ids
+
+    def estimate_shift(self, track, gray):
+        """用稀疏光流估计目标在两帧之间的平移（原图像素），返回(dx, dy, 可信度)"""
+        if self.prev_gray is None or gray is None:
+            return 0.0, 0.0, 0.5
+
+        scale = self.flow_scale
+        height, width = gray.shape[:2]
+        x1, y1, x2, y2 = (track.box * scale).astype(int)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, width), min(y2, height)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return 0.0, 0.0, 0.0
+
+        region = np.zeros((height, width), dtype=np.uint8)
+        region[y1:y2, x1:x2] = 255
+        points = cv2.goodFeaturesToTrack(self.prev_gray, maxCorners=40, qualityLevel=0.01,
+                                         minDistance=4, mask=region)
+        if points is None or len(points) < 4:
+            return 0.0, 0.0, 0.0
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None,
+                                                          winSize=(15, 15), maxLevel=2)
+        tracked = status.ravel() == 1
+        if np.count_nonzero(tracked) < 4:
+            return 0.0, 0.0, 0.0
+        displacement = (next_points[tracked] - points[tracked]).reshape(-1, 2)
+        dx, dy = np.median(displacement, axis=0) / scale
+        # 可信度：成功跟踪的特征点比例 × 位移一致性
+        spread = np.median(np.abs(displacement - np.median(displacement, axis=0))) / scale
+        quality = float(np.count_nonzero(tracked)) / len(points) / (1.0 + spread / 4.0)
+        return float(dx), float(dy), quality
+
+    def predict(self, image):
+        """非关键帧：传播已有轨迹，返回(掩码, 边界框, 类别, 置信度, 跟踪ID, 跟踪可信度)"""
+        height, width = image.shape[:2]
+        gray = self.prepare_gray(image)
+        masks, boxes, classes, confidences, track_ids = [], [], [], [], []
+        qualities = []
+        for track in self.tracks:
+            if track.misses > 0:
+                continue
+            dx, dy, quality = self.estimate_shift(track, gray)
+            if dx or dy:
+                shift = np.array([dx, dy, dx, dy], dtype=np.float32)
+                track.box = np.clip(track.box + shift, 0, [width, height, width, height])
+                if track.box_mask is not None:
+                    track.box_mask = track.box_mask.shifted(round(dx), round(dy), height, width)
+            track.quality = quality if self.use_optical_flow else track.quality
+            qualities.append(track.quality)
+            masks.append(track.box_mask)
+            boxes.append(track.box)
+            classes.append(track.cls)
+            confidences.append(track.conf)
+            track_ids.append(track.track_id)
+        self.prev_gray = gray
+
+        confidence = min(qualities) if qualities else 1.0
+        boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+        return (masks, boxes, np.array(classes), np.array(confidences),
+                np.array(track_ids, dtype=np.int64), confidence)
+
+class TrackingSegmentor:
+    """关键帧调度 - 每N帧或跟踪可信度下降时运行完整推理，其余帧复用跟踪结果"""
+
+    def __init__(self, segmentor, tracker=None, keyframe_interval=1, min_track_confidence=0.5):
+        self.segmentor = segmentor
+        self.tracker = tracker if tracker is not None else IoUTracker()
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.min_track_confidence = min_track_confidence
+        self.frames_since_keyframe = 0
+
+    def segment_frame(self, image, depth_image=None):
+        """返回(分割结果, 跟踪ID, 是否关键帧)，分割结果格式与segment_frame一致
+
+        depth_image只在被包装的分割器需要深度时传入（如DepthROISegmentor）
+        """
+        if self.frames_since_keyframe + 1 < self.keyframe_interval and self.tracker.tracks:
+            masks, boxes, classes, confidences, track_ids, confidence = self.tracker.predict(image)
+            if confidence >= self.min_track_confidence:
+                self.frames_since_keyframe += 1
+                result = (image, masks, boxes, classes, confidences, self.tracker.class_names)
+                return result, track_ids, False
+
+        if depth_image is None:
+            result = self.segmentor.segment_frame(image)
+        else:
+            result = self.segmentor.segment_frame(image, depth_image)
+        self.frames_since_keyframe = 0
+        if result[0] is None:
+            return result, np.zeros(0, dtype=np.int64), True
+        _, masks, boxes, classes, confidences, class_names = result
+        # 每帧都是关键帧时不会传播，光流状态无需维护
+        track_ids = self.tracker.update(image, masks, boxes, classes, confidences, class_names,
+                                        propagate=self.keyframe_interval > 1)
+        return result, track_ids, True
@@ -1,97 +1,237 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-"""
-YOLOv11实例分割类
-"""
-
-import torch
-from ultralytics import YOLO
-
-class YOLOv11Segmentation:
-    """YOLOv11实例分割类 - 只检测人"""
-    
-    def __init__(self, model_path, conf_threshold=0.5, iou_threshold=0.45):
-        self.model_path = model_path
-        self.conf_threshold = conf_threshold
-        self.iou_threshold = iou_threshold
-        self.model = None
-        self.device = None
-        self.imgsz = 640  # 固定为640x640，与TensorRT引擎匹配
-        
-    def initialize(self):
-        """初始化YOLOv11模型"""
-        try:
-            # 检测设备类型
-            if torch.cuda.is_available():
-                self.device = torch.device('cuda')
-                print("使用CUDA加速")
-            else:
-                self.device = torch.device('cpu')
-                print("使用CPU")
-            
-            # 加载模型
-            if self.model_path.endswith('.engine'):  # TensorRT引擎
-                self.model = YOLO(self.model_path)
-                print(f"加载TensorRT模型: {self.model_path}")
-            else:  # PyTorch模型
-                self.model = YOLO(self.model_path)
-                print(f"加载PyTorch模型: {self.model_path}")
-            
-            # 预热模型
-            dummy_input = torch.randn(1, 3, 320, 320).to(self.device)
-            if hasattr(self.model, 'predict'):
-                self.model.predict(dummy_input, verbose=False)
-            else:
-                self.model(dummy_input)
-                
-            print("YOLOv11模型初始化成功")
-            print("配置为只检测'人'类别")
-            return True
-            
-        except Exception as e:
-            print(f"YOLOv11初始化失败: {e}")
-            return False
-    
-    def segment_frame(self, image):
-        """对图像进行实例分割 - 只检测人"""
-        if self.model is None or image is None:
-            return None, None, None
-            
-        try:
-            # 使用YOLO进行推理 - 只检测人（类别0）
-            results = self.model(image, 
-                               conf=self.conf_threshold, 
-                               iou=self.iou_threshold, 
-                               verbose=False,
-                               imgsz=320)  # 固定推理尺寸
-                               # classes=[0])  # 只检测人（类别索引0）
-            
-            if len(results) == 0:
-                return image, [], []
-                
-            result = results[0]
-            
-            # 获取分割结果
-            if result.masks is not None:
-                masks = result.masks.data.cpu().numpy()  # 分割掩码
-                boxes = result.boxes.xyxy.cpu().numpy()  # 边界框
-                classes = result.boxes.cls.cpu().numpy()  # 类别
-                confidences = result.boxes.conf.cpu().numpy()  # 置信度
-                
-                # 获取类别名称
-                if hasattr(result, 'names'):
-                    class_names = result.names
-                else:
-                    class_names = {i: f"Class_{i}" for i in range(int(classes.max()) + 1)}
-                
-                return image, masks, boxes, classes, confidences, class_names
-            else:
-                return image, [], [], [], [], {}
-                
-        except Exception as e:
-            print(f"分割失败: {e}")
-            return image, [], [], [], [], {}
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+"""
+YOLOv11实例分割类
+"""
+
+import os
+import contextlib
+
+import numpy as np
+
+from .mask_utils import decode_masks
+
+PERSON_CLASS = 0  # COCO类别中的"人"
+# 有逐类别阈值时NMS保留的候选数为max_det的倍数，按类别阈值筛选后再截断到max_det
+CLASS_CONF_CANDIDATE_FACTOR = 3
+
+def phase_timer(profile, name):
+    """profile（StartupProfile）为None时不计时"""
+    return profile.timer(name) if profile is not None else contextlib.nullcontext()
+
+class YOLOv11Segmentation:
+    """YOLOv11实例分割类 - 默认只检测人
+
+    classes为允许的类别列表（None表示全部类别），在NMS之前过滤，原型掩码只为保留下来的
+    检测组装。没有class_conf时max_det同样交给NMS，掩码最多组装max_det个。
+    class_conf为{类别: 置信度阈值}，未列出的类别使用conf_threshold；此时模型按所有阈值中的
+    最小值输出，NMS最多保留max_det的CLASS_CONF_CANDIDATE_FACTOR倍候选并为其组装掩码，
+    之后在设备端按逐类别阈值筛选并截断到max_det，只把筛选后的检测拷回CPU。
+    """
+    
+    def __init__(self, model_path, conf_threshold=0.5, iou_threshold=0.45, compact_masks=False,
+                 imgsz=320, input_sizes=None, classes=(PERSON_CLASS,), class_conf=None, max_det=100):
+        self.model_path = model_path
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.classes = sorted(set(int(c) for c in classes)) if classes is not None else None
+        self.class_conf = {int(c): float(t) for c, t in (class_conf or {}).items()}
+        self.max_det = max_det
+        # 逐类别阈值表（设备端张量），第一次筛选时按类别数创建
+        self.threshold_table = None
+        # 为True时掩码以框内相对坐标的BoxMask形式返回，不再展开到整帧
+        self.compact_masks = compact_masks
+        self.model = None
+        self.device = None
+        self.imgsz = imgsz  # 当前推理尺寸，可由ResolutionController在运行时切换
+        # 运行时可能用到的全部推理尺寸，初始化时逐一预热，切换时不会出现首次调用卡顿
+        self.input_sizes = sorted(set(input_sizes or []) | {imgsz})
+        
+    def initialize(self, frame_shape=None, profile=None):
+        """初始化YOLOv11模型
+
+        torch和ultralytics在这里才导入，只用到相机/回放的进程不必承担导入开销。
+        frame_shape为实际输入帧的(高, 宽)，预热走与推理相同的BGR预处理路径；
+        profile提供时记录导入、加载和预热各阶段耗时。
+        """
+        name = os.path.basename(self.model_path.rstrip('/\\'))
+        try:
+            with phase_timer(profile, "import torch/ultralytics"):
+                import torch
+                import ultralytics  # 提前导入，单独计入导入耗时
+            
+            # 检测设备类型
+            if torch.cuda.is_available():
+                self.device = torch.device('cuda')
+                print("使用CUDA加速")
+            else:
+                self.device = torch.device('cpu')
+                print("使用CPU")
+            
+            # 加载模型
+            with phase_timer(profile, f"load {name}"):
+                fixed_size = self.load_model()
+            
+            if fixed_size and len(self.input_sizes) > 1:
+                # 导出模型的输入尺寸在导出时固定，不能运行时切换
+                print(f"导出模型不支持切换推理尺寸，固定使用 {self.imgsz}")
+                self.input_sizes = [self.imgsz]
+            
+            # 预热模型，每个推理尺寸各一次
+            with phase_timer(profile, f"warmup {name}"):
+                for size in self.input_sizes:
+                    self.warmup(size, frame_shape)
+                
+            print("YOLOv11模型初始化成功")
+            if self.classes == [PERSON_CLASS]:
+                print("配置为只检测'人'类别")
+            elif self.classes is not None:
+                print(f"配置为只检测类别 {self.classes}")
+            return True
+            
+        except Exception as e:
+            print(f"YOLOv11初始化失败: {e}")
+            return False
+    
+    def load_model(self):
+        """按模型文件类型加载模型，返回输入尺寸是否在导出时固定"""
+        from ultralytics import YOLO
+        
+        fixed_size = True
+        if self.model_path.endswith('.engine'):  # TensorRT引擎
+            self.model = YOLO(self.model_path, task='segment')
+            print(f"加载TensorRT模型: {self.model_path}")
+        elif self.model_path.endswith('.onnx'):  # ONNX Runtime
+            self.model = YOLO(self.model_path, task='segment')
+            print(f"加载ONNX模型: {self.model_path}")
+        elif self.model_path.rstrip('/\\').endswith('_openvino_model'):  # OpenVINO IR
+            self.model = YOLO(self.model_path, task='segment')
+            print(f"加载OpenVINO模型: {self.model_path}")
+        else:  # PyTorch模型
+            self.model = YOLO(self.model_path)
+            print(f"加载PyTorch模型: {self.model_path}")
+            fixed_size = False
+        return fixed_size
+    
+    def warmup(self, size, frame_shape=None):
+        """以指定推理尺寸预热一次模型
+
+        输入为实际帧形状的全零BGR图像，和segment_frame走同一条预处理（letterbox）、
+        推理和后处理路径，预热后的首帧不会再触发新形状的初始化。
+        """
+        height, width = frame_shape[:2] if frame_shape is not None else (size, size)
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.model(frame, verbose=False, imgsz=size, **self.predict_options())
+    
+    def predict_options(self):
+        """模型调用参数：类别过滤在NMS之前进行，置信度取所有阈值中的最小值
+
+        没有逐类别阈值时数量上限直接交给NMS；有逐类别阈值时NMS按上限的倍数保留候选，
+        先按类别阈值筛选再截断，避免本可以通过自己类别阈值的检测被低阈值类别挤掉。
+        """
+        thresholds = [threshold for cls, threshold in self.class_conf.items()
+                      if self.classes is None or cls in self.classes]
+        options = {
+            "conf": min([self.conf_threshold] + thresholds),
+            "iou": self.iou_threshold,
+            "classes": self.classes,
+        }
+        if self.max_det:
+            factor = CLASS_CONF_CANDIDATE_FACTOR if self.class_conf else 1
+            options["max_det"] = self.max_det * factor
+        return options
+    
+    def select_detections(self, boxes, num_classes):
+        """在设备端按逐类别阈值和数量上限筛选检测，返回保留的索引（None表示全部保留）
+
+        NMS的输出已按置信度从高到低排序，截断前max_det个即为置信度最高的检测。
+        """
+        keep = None
+        if self.class_conf:
+            import torch
+            table = self.threshold_table
+            if table is None or table.device != boxes.conf.device or len(table) < num_classes:
+                size = max(max(self.class_conf) + 1, num_classes)
+                values = np.full(size, self.conf_threshold, dtype=np.float32)
+                for cls, threshold in self.class_conf.items():
+                    values[cls] = threshold
+                table = self.threshold_table = torch.as_tensor(values, device=boxes.conf.device)
+            keep = (boxes.conf >= table[boxes.cls.long()]).nonzero().flatten()
+        if self.max_det:
+            count = len(boxes) if keep is None else len(keep)
+            if count > self.max_det:
+                keep = keep[:self.max_det] if keep is not None else slice(0, self.max_det)
+        return keep
+    
+    def parse_result(self, image, result):
+        """将单帧推理结果转换为(图像, 掩码, 边界框, 类别, 置信度, 类别名称)"""
+        # 获取分割结果
+        if result.masks is not None:
+            names = getattr(result, 'names', None) or {}
+            keep = self.select_detections(result.boxes, max(names) + 1 if names else 0)
+            masks, boxes = result.masks.data, result.boxes
+            xyxy, cls, conf = boxes.xyxy, boxes.cls, boxes.conf
+            if keep is not None:
+                # 只拷回筛选后的检测
+                masks, xyxy, cls, conf = masks[keep], xyxy[keep], cls[keep], conf[keep]
+            masks = masks.cpu().numpy()  # 分割掩码
+            boxes = xyxy.cpu().numpy()  # 边界框
+            classes = cls.cpu().numpy()  # 类别
+            confidences = conf.cpu().numpy()  # 置信度
+            
+            if self.compact_masks:
+                # 只在检测框区域内上采样，保持紧凑形式
+                masks = decode_masks(masks, boxes, image.shape)
+            
+            # 获取类别名称
+            if hasattr(result, 'names'):
+                class_names = result.names
+            else:
+                class_names = {i: f"Class_{i}" for i in range(int(classes.max()) + 1 if len(classes) else 0)}
+            
+            return image, masks, boxes, classes, confidences, class_names
+        else:
+            return image, [], [], [], [], {}
+    
+    def segment_frame(self, image):
+        """对图像进行实例分割 - 只保留classes中的类别（默认只检测人）"""
+        if self.model is None or image is None:
+            return None, [], [], [], [], {}
+            
+        try:
+            # 使用YOLO进行推理，类别过滤在NMS之前进行
+            results = self.model(image, 
+                               verbose=False,
+                               imgsz=self.imgsz,
+                               **self.predict_options())
+            
+            if len(results) == 0:
+                return image, [], [], [], [], {}
+                
+            return self.parse_result(image, results[0])
+                
+        except Exception as e:
+            print(f"分割失败: {e}")
+            return image, [], [], [], [], {}
+    
+    def segment_batch(self, images):
+        """对一批图像进行实例分割，返回与segment_frame格式相同的结果列表"""
+        if self.model is None or len(images) == 0:
+            return [(image, [], [], [], [], {}) for image in images]
+            
+        try:
+            # 一次调用处理整批图像，分摊每次调用的Python和预处理开销
+            results = self.model(list(images), 
+                               verbose=False,
+                               imgsz=self.imgsz,
+                               **self.predict_options())
+            
+            return [self.parse_result(image, result) for image, result in zip(images, results)]
+                
+        except Exception as e:
+            print(f"批量分割失败: {e}")
+            return [(image, [], [], [], [], {}) for image in images]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+流水线环形缓冲区 - latest/block/deadline三种丢帧策略
+"""
+
+import time
+import threading
+
+import pytest
+
+from utils.pipeline import RingBuffer, FramePacket, POLICY_LATEST, POLICY_BLOCK, POLICY_DEADLINE
+
+def make_packet(frame_id, age=0.0):
+    """age秒之前采集的帧"""
+    packet = FramePacket(frame_id, None, None)
+    packet.timestamp -= age
+    return packet
+
+def test_latest_drops_oldest():
+    dropped = []
+    buffer = RingBuffer(capacity=2, policy=POLICY_LATEST, on_drop=dropped.append)
+    for frame_id in range(5):
+        assert buffer.put(frame_id)
+    assert dropped == [0, 1, 2]
+    assert buffer.dropped == 3
+    assert [buffer.get(timeout=0), buffer.get(timeout=0)] == [3, 4]
+    assert buffer.get(timeout=0) is None
+
+def test_block_waits_for_space():
+    buffer = RingBuffer(capacity=1, policy=POLICY_BLOCK)
+    assert buffer.put(1)
+    done = threading.Event()
+
+    def producer():
+        buffer.put(2)
+        done.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    # 缓冲区满时生产者阻塞，不丢帧
+    assert not done.wait(0.1)
+    assert buffer.get(timeout=1.0) == 1
+    assert done.wait(1.0)
+    thread.join()
+    assert buffer.get(timeout=1.0) == 2
+    assert buffer.dropped == 0
+
+def test_block_timeout_and_close_drop():
+    dropped = []
+    buffer = RingBuffer(capacity=1, policy=POLICY_BLOCK, on_drop=dropped.append)
+    assert buffer.put(1)
+    start = time.perf_counter()
+    assert not buffer.put(2, timeout=0.05)
+    assert time.perf_counter() - start >= 0.05
+    assert dropped == [2]
+
+    # 关闭会唤醒阻塞的生产者，其数据被丢弃
+    result = []
+    thread = threading.Thread(target=lambda: result.append(buffer.put(3)))
+    thread.start()
+    time.sleep(0.05)
+    buffer.close()
+    thread.join(1.0)
+    assert result == [False]
+    assert dropped == [2, 3]
+    # 关闭后仍可取出剩余数据，取完返回None
+    assert buffer.get(timeout=0) == 1
+    assert buffer.get(timeout=0) is None
+
+def test_deadline_drops_expired():
+    dropped = []
+    buffer = RingBuffer(capacity=3, policy=POLICY_DEADLINE, deadline=0.1, on_drop=dropped.append)
+    stale, fresh = make_packet(1, age=0.5), make_packet(2)
+    buffer.put(stale)
+    buffer.put(fresh)
+    assert buffer.get(timeout=0) is fresh
+    assert dropped == [stale]
+
+    # 缓冲区满时与latest一样丢弃最旧的帧
+    packets = [make_packet(frame_id) for frame_id in range(3, 7)]
+    for packet in packets:
+        buffer.put(packet)
+    assert dropped == [stale, packets[0]]
+    assert buffer.get(timeout=0) is packets[1]
+
+def test_deadline_requires_deadline():
+    with pytest.raises(ValueError):
+        RingBuffer(policy=POLICY_DEADLINE)
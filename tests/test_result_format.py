@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+结果格式 - RLE掩码编解码以及JSON lines/二进制记录的写出和读回
+"""
+
+import json
+
+import numpy as np
+
+from segmentation.mask_utils import BoxMask
+from segmentation.mask_codec import encode_rle, decode_rle
+from utils.result_writer import ResultWriter, read_binary_records, record_masks, MASK_POLYGON
+
+def rle_round_trip(mask, x1=7, y1=3):
+    """编码再解码，返回解码后的BoxMask"""
+    decoded = decode_rle(encode_rle(BoxMask(x1, y1, mask)))
+    assert (decoded.x1, decoded.y1) == (x1, y1)
+    return decoded
+
+def test_rle_empty_masks():
+    for shape in ((0, 0), (5, 4)):
+        mask = np.zeros(shape, dtype=bool)
+        decoded = rle_round_trip(mask)
+        assert decoded.mask.shape == shape
+        assert not decoded.mask.any()
+
+def test_rle_full_mask():
+    mask = np.ones((6, 9), dtype=bool)
+    rle = encode_rle(BoxMask(0, 0, mask))
+    # 游程从0值的长度开始
+    assert list(rle["counts"]) == [0, 54]
+    assert np.array_equal(rle_round_trip(mask).mask, mask)
+
+def test_rle_single_pixel():
+    for y, x in ((0, 0), (2, 3), (4, 5)):
+        mask = np.zeros((5, 6), dtype=bool)
+        mask[y, x] = True
+        assert np.array_equal(rle_round_trip(mask).mask, mask)
+    mask = np.ones((1, 1), dtype=bool)
+    assert np.array_equal(rle_round_trip(mask).mask, mask)
+
+def test_rle_random_mask():
+    mask = np.random.default_rng(0).random((37, 23)) > 0.5
+    assert np.array_equal(rle_round_trip(mask).mask, mask)
+
+def make_result():
+    """两个实例的分割结果（紧凑掩码）及对应的深度统计和跟踪ID"""
+    rng = np.random.default_rng(1)
+    masks = [BoxMask(10, 20, rng.random((30, 15)) > 0.3), BoxMask(100, 50, np.ones((12, 40), dtype=bool))]
+    boxes = np.array([[10, 20, 25, 50], [100, 50, 140, 62]], dtype=np.float32)
+    result = (None, masks, boxes, np.array([0, 2]), np.array([0.91, 0.62]), {0: "person", 2: "car"})
+    depth_stats = {
+        "median": np.array([1.5, 3.25], dtype=np.float32),
+        "min": np.array([1.2, 3.0], dtype=np.float32),
+        "percentile": np.array([1.3, 3.1], dtype=np.float32),
+        "valid_ratio": np.array([0.9, 0.5], dtype=np.float32),
+    }
+    return result, masks, depth_stats, np.array([4, 9])
+
+def write_results(path, **kwargs):
+    """写出两帧结果：第一帧两个实例，第二帧没有实例"""
+    result, _, depth_stats, track_ids = make_result()
+    writer = ResultWriter(str(path), **kwargs)
+    writer.start()
+    assert writer.submit(1, 0.5, (480, 848), result, depth_stats, track_ids, block=True)
+    empty = (None, [], np.zeros((0, 4), dtype=np.float32), [], [], {})
+    assert writer.submit(2, 0.533333, (480, 848), empty, block=True)
+    writer.stop()
+    assert writer.written == 2
+
+def check_records(records, masks):
+    """两种格式读回的记录内容一致"""
+    assert [r["frame"] for r in records] == [1, 2]
+    assert [r["timestamp"] for r in records] == [0.5, 0.533333]
+    assert (records[0]["width"], records[0]["height"]) == (848, 480)
+    assert records[1]["detections"] == []
+    detections = records[0]["detections"]
+    assert [d["class"] for d in detections] == [0, 2]
+    assert [d["track_id"] for d in detections] == [4, 9]
+    assert np.allclose([d["conf"] for d in detections], [0.91, 0.62], atol=1e-4)
+    assert np.allclose(detections[1]["box"], [100, 50, 140, 62])
+    assert np.allclose([d["depth"]["median"] for d in detections], [1.5, 3.25], atol=1e-3)
+    for decoded, mask in zip(record_masks(records[0]), masks):
+        assert (decoded.x1, decoded.y1) == (mask.x1, mask.y1)
+        assert np.array_equal(decoded.mask, mask.mask)
+
+def test_jsonl_round_trip(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_results(path)
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    check_records(records, make_result()[1])
+    assert records[0]["detections"][0]["name"] == "person"
+
+def test_binary_round_trip(tmp_path):
+    path = tmp_path / "results.bin"
+    write_results(path)
+    check_records(list(read_binary_records(str(path))), make_result()[1])
+
+def test_binary_polygons(tmp_path):
+    jsonl_path, binary_path = tmp_path / "results.jsonl", tmp_path / "results.bin"
+    write_results(jsonl_path, mask_format=MASK_POLYGON)
+    write_results(binary_path, mask_format=MASK_POLYGON)
+    with open(jsonl_path, encoding="utf-8") as f:
+        expected = json.loads(f.readline())["detections"]
+    detections = next(read_binary_records(str(binary_path)))["detections"]
+    assert [d["polygons"] for d in detections] == [d["polygons"] for d in expected]
+    assert all(d["polygons"] for d in detections)
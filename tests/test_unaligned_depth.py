@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+不做整帧对齐（--no-align）时深度图与彩色图坐标的映射
+"""
+
+import numpy as np
+
+from camera.stream_geometry import StreamGeometry
+from segmentation.depth_roi import DepthROISelector, DepthROISegmentor
+from segmentation.depth_statistics import compute_unaligned_depth_stats
+
+DEPTH_SCALE = 0.001
+
+def make_geometry():
+    """深度流640x360、彩色流1280x720，两相机水平相距6cm
+
+    彩色像素u = 2 * 深度像素u + 0.06 / z * 640，z=2米时 u = 2u + 19.2，v = 2v。
+    """
+    depth_intrinsics = (640, 360, 320.0, 320.0, 320.0, 180.0)
+    color_intrinsics = (1280, 720, 640.0, 640.0, 640.0, 360.0)
+    return StreamGeometry(depth_intrinsics, color_intrinsics, np.eye(3), (0.06, 0.0, 0.0))
+
+def make_depth_image():
+    """画面右侧边缘2米处站着一个人，深度像素列500~600、行100~300"""
+    depth = np.zeros((360, 640), dtype=np.uint16)
+    depth[100:300, 500:600] = int(2.0 / DEPTH_SCALE)
+    return depth
+
+class RecordingSegmentor:
+    """记录送入模型的图像，不返回任何实例"""
+
+    imgsz = 320
+    input_sizes = None
+
+    def __init__(self):
+        self.images = []
+
+    def segment_frame(self, image):
+        self.images.append(image)
+        return image, [], [], [], [], {}
+
+def test_roi_projected_to_color_frame():
+    geometry = make_geometry()
+    color = np.zeros((720, 1280, 3), dtype=np.uint8)
+    segmentor = RecordingSegmentor()
+    roi = DepthROISegmentor(segmentor, DepthROISelector(0.5, 4.0, depth_scale=DEPTH_SCALE),
+                            geometry=geometry)
+    roi.segment_frame(color, make_depth_image())
+
+    x1, y1, x2, y2 = roi.last_roi
+    # 人在彩色图中位于列1019~1219、行200~600，裁剪区域必须完整包含
+    assert x1 <= 1019 and x2 >= 1219
+    assert y1 <= 200 and y2 >= 600
+    assert x2 <= 1280 and y2 <= 720
+    assert segmentor.images[-1].shape[:2] == (y2 - y1, x2 - x1)
+
+def test_roi_empty_depth_skips_inference():
+    geometry = make_geometry()
+    segmentor = RecordingSegmentor()
+    roi = DepthROISegmentor(segmentor, DepthROISelector(0.5, 4.0, depth_scale=DEPTH_SCALE),
+                            geometry=geometry)
+    result = roi.segment_frame(np.zeros((720, 1280, 3), dtype=np.uint8), np.zeros((360, 640), dtype=np.uint16))
+    assert roi.last_roi is None
+    assert len(result[2]) == 0
+    assert not segmentor.images
+
+def test_unaligned_stats_decode_masks_at_color_resolution():
+    geometry = make_geometry()
+    # 320x320推理尺寸下1280x720的letterbox原型掩码（80x80），整幅为前景
+    proto_mask = np.ones((80, 80), dtype=np.float32)
+    boxes = np.array([[1019, 200, 1219, 600]], dtype=np.float32)
+    stats = compute_unaligned_depth_stats(make_depth_image(), [proto_mask], boxes, geometry, DEPTH_SCALE)
+
+    assert stats["valid_pixels"][0] > 0
+    assert abs(stats["median"][0] - 2.0) < 1e-3
+    assert abs(stats["centroid"][0][0] - (550 - 320) / 320.0 * 2.0 - 0.06) < 0.02
@@ -1,9 +1,21 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-from .fps_counter import FPSCounter
-
-__all__ = ['FPSCounter']
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+from .fps_counter import FPSCounter
+from .pipeline import StagedPipeline, RingBuffer, FramePacket
+from .metrics import MetricsRegistry, MetricsExporter, RollingHistogram, StartupProfile
+from .result_writer import ResultWriter, read_binary_records
+from .render_pool import RenderProcessPool
+from .stream_server import StreamServer
+from .depth_colorizer import DepthColorizer
+from .recorder import FrameRecorder, SnapshotWriter
+from .label_sprites import LabelSpriteCache
+
+__all__ = ['FPSCounter', 'StagedPipeline', 'RingBuffer', 'FramePacket',
+           'MetricsRegistry', 'MetricsExporter', 'RollingHistogram', 'StartupProfile',
+           'ResultWriter', 'read_binary_records',
+           'RenderProcessPool', 'StreamServer', 'DepthColorizer', 'FrameRecorder', 'SnapshotWriter',
+           'LabelSpriteCache']
@@ -1,34 +1,34 @@
-#!/usr/bin/env python3
-
-# -*- coding:utf-8 -*-
-# Author：Bill Liu
-# Create：2025-11-01
-# Update：2025-11-01
-"""
-帧率计数器类
-"""
-
-import time
-
-class FPSCounter:
-    """帧率计数器类"""
-    
-    def __init__(self, window_size=10):
-        self.window_size = window_size
-        self.timestamps = []
-        
-    def update(self):
-        """更新帧率计数"""
-        self.timestamps.append(time.time())
-        if len(self.timestamps) > self.window_size:
-            self.timestamps.pop(0)
-    
-    def get_fps(self):
-        """计算当前帧率"""
-        if len(self.timestamps) < 2:
-            return 0.0
-            
-        time_span = self.timestamps[-1] - self.timestamps[0]
-        if time_span > 0:
-            return len(self.timestamps) / time_span
-        return 0.0
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2025-11-01
+# Update：2025-11-01
+"""
+帧率计数器类
+"""
+
+import time
+from collections import deque
+
+class FPSCounter:
+    """帧率计数器类"""
+    
+    def __init__(self, window_size=10):
+        self.window_size = window_size
+        # 固定长度队列，超出窗口时自动丢弃最旧的时间戳
+        self.timestamps = deque(maxlen=window_size)
+        
+    def update(self):
+        """更新帧率计数"""
+        self.timestamps.append(time.perf_counter())
+    
+    def get_fps(self):
+        """计算当前帧率"""
+        if len(self.timestamps) < 2:
+            return 0.0
+            
+        time_span = self.timestamps[-1] - self.timestamps[0]
+        if time_span > 0:
+            return (len(self.timestamps) - 1) / time_span
+        return 0.0
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+标签精灵缓存 - 带背景框的标签文字只渲染一次，之后按字符串整块拷贝
+"""
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+class LabelSpriteCache:
+    """按(字符串, 背景色)缓存的标签精灵
+
+    标签按空格分成若干段分别缓存（类别名、置信度、距离），数值变化时只有变化的那一段
+    需要重新渲染，稳定运行时几乎都能命中。精灵为不透明的BGR小图，绘制只是一次切片拷贝。
+    背景框上沿距文字顶部padding像素，下沿包含文字的下行部分。
+    """
+
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, scale=0.6, thickness=2, text_color=(255, 255, 255),
+                 padding=2, max_entries=1024):
+        self.font = font
+        self.scale = scale
+        self.thickness = thickness
+        self.text_color = text_color
+        self.padding = padding
+        self.max_entries = max_entries
+        # Hershey字体的字高和下行高度与内容无关
+        (_, self.text_height), self.baseline = cv2.getTextSize("0", font, scale, thickness)
+        self.space_width = cv2.getTextSize(" ", font, scale, thickness)[0][0]
+        # 下沿留出线宽，粗笔画的下行部分不被截断
+        self.height = self.padding + self.text_height + self.baseline + thickness
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def sprite(self, text, background):
+        """取一段文字的精灵，未缓存时渲染并按最近最少使用淘汰"""
+        key = (text, background)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        (width, _), _ = cv2.getTextSize(text, self.font, self.scale, self.thickness)
+        sprite = np.empty((self.height, width, 3), dtype=np.uint8)
+        sprite[:] = background
+        cv2.putText(sprite, text, (0, self.padding + self.text_height), self.font, self.scale,
+                    self.text_color, self.thickness)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_entries:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def draw(self, image, parts, x, y, background):
+        """在image上绘制标签，parts为以空格分隔的各段文字，(x, y)为文字基线起点
+
+        与cv2.putText的坐标约定一致；超出图像的部分被裁掉。
+        """
+        image_h, image_w = image.shape[:2]
+        top = y - self.text_height - self.padding
+        y0, y1 = max(top, 0), min(top + self.height, image_h)
+        if y1 <= y0:
+            return
+        cursor = x
+        for i, part in enumerate(parts):
+            if i > 0:
+                gap0, gap1 = max(cursor, 0), min(cursor + self.space_width, image_w)
+                if gap1 > gap0:
+                    image[y0:y1, gap0:gap1] = background
+                cursor += self.space_width
+            sprite = self.sprite(part, background)
+            x0, x1 = max(cursor, 0), min(cursor + sprite.shape[1], image_w)
+            if x1 > x0:
+                image[y0:y1, x0:x1] = sprite[y0 - top:y1 - top, x0 - cursor:x1 - cursor]
+            cursor += sprite.shape[1]
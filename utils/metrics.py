@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+性能指标 - 各阶段延迟直方图、计数器以及JSON/Prometheus文本导出
+"""
+
+import os
+import json
+import math
+import time
+import threading
+
+class RollingHistogram:
+    """滚动窗口延迟直方图
+
+    桶边界按对数均匀分布，窗口内样本以环形数组保存。每次记录只需更新
+    一个新桶和一个被挤出的旧桶，时间复杂度O(1)；分位数按桶累计计数查询。
+    """
+
+    def __init__(self, window_size=1000, min_ms=0.05, max_ms=60000.0, buckets_per_decade=24):
+        self.window_size = window_size
+        self.min_ms = min_ms
+        self.buckets_per_decade = buckets_per_decade
+        self.num_buckets = int(math.ceil(math.log10(max_ms / min_ms) * buckets_per_decade)) + 1
+        self.counts = [0] * self.num_buckets
+        self.values = [0.0] * window_size
+        self.buckets = [0] * window_size
+        self.position = 0
+        self.size = 0
+        self.window_sum = 0.0
+        self.total_count = 0
+
+    def bucket_index(self, value_ms):
+        """样本所属的桶"""
+        if value_ms <= self.min_ms:
+            return 0
+        index = int(math.log10(value_ms / self.min_ms) * self.buckets_per_decade) + 1
+        return min(index, self.num_buckets - 1)
+
+    def bucket_upper(self, index):
+        """桶的上边界（毫秒）"""
+        return self.min_ms * 10 ** (index / self.buckets_per_decade)
+
+    def add(self, value_ms):
+        """记录一个样本（毫秒）"""
+        index = self.bucket_index(value_ms)
+        if self.size == self.window_size:
+            # 挤出窗口中最旧的样本
+            self.counts[self.buckets[self.position]] -= 1
+            self.window_sum -= self.values[self.position]
+        else:
+            self.size += 1
+        self.values[self.position] = value_ms
+        self.buckets[self.position] = index
+        self.counts[index] += 1
+        self.window_sum += value_ms
+        self.position = (self.position + 1) % self.window_size
+        self.total_count += 1
+
+    def percentile(self, p):
+        """窗口内的第p百分位数（返回所在桶的上边界，相对误差约10%）"""
+        if self.size == 0:
+            return 0.0
+        rank = max(1, int(math.ceil(self.size * p / 100.0)))
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.bucket_upper(index)
+        return self.bucket_upper(self.num_buckets - 1)
+
+    def summary(self):
+        """窗口内的统计摘要，count为累计样本数，window_count/window_sum为窗口内的样本数和总和"""
+        if self.size == 0:
+            return {"count": self.total_count, "window_count": 0, "window_sum": 0.0, "mean": 0.0,
+                    "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        maximum = max(self.values[:self.size])
+        # 桶上边界可能超过实际最大值，按最大值截断
+        return {
+            "count": self.total_count,
+            "window_count": self.size,
+            "window_sum": self.window_sum,
+            "mean": self.window_sum / self.size,
+            "p50": min(self.percentile(50), maximum),
+            "p95": min(self.percentile(95), maximum),
+            "p99": min(self.percentile(99), maximum),
+            "max": maximum,
+        }
+
+class StageTimer:
+    """用单调时钟为代码块计时的上下文管理器"""
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, (time.perf_counter() - self.start) * 1000.0)
+        return False
+
+class StartupProfile:
+    """启动耗时分解
+
+    各初始化阶段可能在不同线程中并发执行，阶段耗时（毫秒）按名称记录，
+    另记录自启动开始到某个时刻（如第一帧输出）的墙钟耗时。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        """返回为阶段name计时的上下文管理器"""
+        return StageTimer(self, name)
+
+    def observe(self, name, value_ms):
+        """记录一个阶段的耗时（毫秒），同名阶段累加"""
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + value_ms
+
+    def mark(self, name):
+        """记录自启动开始到现在的墙钟耗时（毫秒）"""
+        with self.lock:
+            self.marks[name] = (time.perf_counter() - self.start) * 1000.0
+
+    def snapshot(self):
+        """各阶段和各时刻的耗时（毫秒）"""
+        with self.lock:
+            return {
+                "phases_ms": {name: round(value, 1) for name, value in self.phases.items()},
+                "marks_ms": {name: round(value, 1) for name, value in self.marks.items()},
+            }
+
+    def report(self):
+        """打印启动耗时分解"""
+        snapshot = self.snapshot()
+        print("启动耗时:")
+        for name, value in snapshot["phases_ms"].items():
+            print(f"  {name:<32} {value / 1000.0:.2f}s")
+        for name, value in snapshot["marks_ms"].items():
+            print(f"  {'[' + name + ']':<32} {value / 1000.0:.2f}s")
+
+class MetricsRegistry:
+    """指标注册表 - 延迟直方图、计数器和瞬时值"""
+
+    def __init__(self, window_size=1000):
+        self.window_size = window_size
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def timer(self, name):
+        """返回为name计时的上下文管理器"""
+        return StageTimer(self, name)
+
+    def observe(self, name, value_ms):
+        """记录一个延迟样本（毫秒）"""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram(self.window_size)
+            histogram.add(value_ms)
+
+    def inc(self, name, amount=1):
+        """计数器累加"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """设置瞬时值"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def add_collector(self, func):
+        """注册采集函数，生成快照时调用，返回{"counters": {...}, "gauges": {...}}"""
+        self.collectors.append(func)
+
+    def summary(self, name):
+        """单个直方图的统计摘要"""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            return histogram.summary() if histogram is not None else None
+
+    def snapshot(self):
+        """所有指标的快照"""
+        with self.lock:
+            snapshot = {
+                "timestamp": time.time(),
+                "latency_ms": {name: h.summary() for name, h in self.histograms.items()},
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+            }
+        for collector in self.collectors:
+            collected = collector()
+            snapshot["counters"].update(collected.get("counters", {}))
+            snapshot["gauges"].update(collected.get("gauges", {}))
+        return snapshot
+
+    def to_prometheus(self, snapshot=None, prefix="yolo"):
+        """转换为Prometheus文本格式
+
+        延迟为summary，分位数、_sum和_count都按同一个滚动窗口计算；窗口内最大值单独
+        作为gauge输出。
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        latency = sorted(snapshot["latency_ms"].items())
+        lines = [f"# TYPE {prefix}_stage_latency_ms summary"]
+        for name, summary in latency:
+            for quantile, label in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(f'{prefix}_stage_latency_ms{{stage="{name}",quantile="{label}"}} '
+                             f'{summary[quantile]:.3f}')
+            lines.append(f'{prefix}_stage_latency_ms_sum{{stage="{name}"}} {summary["window_sum"]:.3f}')
+            lines.append(f'{prefix}_stage_latency_ms_count{{stage="{name}"}} {summary["window_count"]}')
+        lines.append(f"# TYPE {prefix}_stage_latency_max_ms gauge")
+        for name, summary in latency:
+            lines.append(f'{prefix}_stage_latency_max_ms{{stage="{name}"}} {summary["max"]:.3f}')
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """后台线程定期将指标写入文件
+
+    文件后缀为.prom时写Prometheus文本格式，否则写JSON。先写临时文件再原子替换，
+    抓取方不会读到写了一半的文件。
+    """
+
+    def __init__(self, registry, path, interval=5.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """启动导出线程"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.running = True
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.export_loop, name="metrics-exporter")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def export_loop(self):
+        """导出线程主循环"""
+        while not self.stop_event.wait(self.interval):
+            self.export()
+
+    def export(self):
+        """立即写出一次指标"""
+        try:
+            snapshot = self.registry.snapshot()
+            if self.path.endswith(".prom"):
+                content = self.registry.to_prometheus(snapshot)
+            else:
+                content = json.dumps(snapshot, indent=2)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"指标导出失败: {e}")
+
+    def stop(self):
+        """停止导出线程并写出最终指标"""
+        self.running = False
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.export()
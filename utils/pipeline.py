@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+分阶段流水线执行器 - 每个阶段一个线程，阶段之间通过有界环形缓冲区连接
+"""
+
+import time
+import threading
+from collections import deque
+
+# 丢帧策略
+POLICY_LATEST = 'latest'      # 缓冲区满时丢弃最旧的数据，只保留最新帧
+POLICY_BLOCK = 'block'        # 缓冲区满时阻塞上游，不丢帧
+POLICY_DEADLINE = 'deadline'  # 同latest，且消费时丢弃超过截止时间的过期帧
+
+class FramePacket:
+    """在流水线各阶段之间传递的一帧数据"""
+
+    def __init__(self, frame_id, color, depth_frame, buffer=None):
+        self.frame_id = frame_id
+        self.timestamp = time.perf_counter()
+        self.color = color
+        self.depth_frame = depth_frame
+        self.buffer = buffer      # 借用的帧缓冲池缓冲，处理结束后必须归还
+        self.result = None        # segment_frame的返回结果
+        self.track_ids = None     # 与检测结果对齐的跟踪ID
+        self.is_keyframe = True   # 是否运行了完整推理（否则为跟踪传播结果）
+        self.sequence = None      # 多进程后处理的任务序号
+        self.depth_stats = None   # 实例深度统计
+        self.image = None         # 渲染后的图像
+
+    def release(self):
+        """归还借用的帧缓冲，之后不应再访问color/depth_frame/image"""
+        if self.buffer is not None:
+            self.buffer.release()
+            self.buffer = None
+
+class RingBuffer:
+    """有界环形缓冲区，支持latest/block/deadline三种丢帧策略"""
+
+    def __init__(self, capacity=1, policy=POLICY_LATEST, deadline=None, on_drop=None):
+        if policy not in (POLICY_LATEST, POLICY_BLOCK, POLICY_DEADLINE):
+            raise ValueError(f"未知的丢帧策略: {policy}")
+        if policy == POLICY_DEADLINE and deadline is None:
+            raise ValueError("deadline策略需要指定截止时间")
+        self.capacity = capacity
+        self.policy = policy
+        self.deadline = deadline
+        self.on_drop = on_drop
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def drop(self, item):
+        """记录并通知丢弃的数据（在锁内调用）"""
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    def put(self, item, timeout=None):
+        """放入数据，block策略下等待空间；成功放入返回True"""
+        with self.condition:
+            if self.closed:
+                self.drop(item)
+                return False
+            if len(self.items) >= self.capacity:
+                if self.policy == POLICY_BLOCK:
+                    if not self.condition.wait_for(
+                            lambda: len(self.items) < self.capacity or self.closed, timeout):
+                        self.drop(item)
+                        return False
+                    if self.closed:
+                        self.drop(item)
+                        return False
+                else:
+                    self.drop(self.items.popleft())
+            self.items.append(item)
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """取出数据；超时或缓冲区已关闭且为空时返回None"""
+        with self.condition:
+            while True:
+                if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                    return None
+                if not self.items:
+                    return None
+                item = self.items.popleft()
+                self.condition.notify_all()
+                if self.policy == POLICY_DEADLINE and \
+                        time.perf_counter() - item.timestamp > self.deadline:
+                    self.drop(item)
+                    continue
+                return item
+
+    def close(self):
+        """关闭缓冲区，唤醒所有等待的生产者和消费者"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def clear(self):
+        """丢弃缓冲区内所有数据"""
+        with self.condition:
+            while self.items:
+                self.drop(self.items.popleft())
+            self.condition.notify_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+class Stage:
+    """流水线中的一个阶段
+
+    func接收上一阶段的数据并返回交给下一阶段的数据，返回None表示丢弃该帧。
+    源阶段没有输入，func无参数调用，抛出StopIteration表示数据源已耗尽。
+    """
+
+    def __init__(self, name, func, input_buffer=None):
+        self.name = name
+        self.func = func
+        self.input = input_buffer
+        self.output = None
+        self.thread = None
+        self.processed = 0
+        self.filtered = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self.last_latency = 0.0
+
+    @property
+    def dropped(self):
+        """输入缓冲区中被丢弃的帧数"""
+        return self.input.dropped if self.input is not None else 0
+
+    def run(self, pipeline):
+        """阶段线程主循环"""
+        try:
+            while pipeline.running:
+                if self.input is None:
+                    item = None
+                else:
+                    item = self.input.get(timeout=0.1)
+                    if item is None:
+                        if self.input.closed:
+                            break
+                        continue
+
+                start = time.perf_counter()
+                try:
+                    output = self.func() if self.input is None else self.func(item)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    print(f"阶段 {self.name} 处理失败: {e}")
+                    self.errors += 1
+                    output = None
+                self.last_latency = time.perf_counter() - start
+                self.busy_time += self.last_latency
+
+                if output is None:
+                    if self.input is not None:
+                        self.filtered += 1
+                        if pipeline.on_drop is not None:
+                            pipeline.on_drop(item)
+                    continue
+                self.processed += 1
+                if self.output is not None:
+                    self.output.put(output)
+        finally:
+            # 通知下游数据已结束
+            if self.output is not None:
+                self.output.close()
+
+    def stats(self):
+        """阶段统计信息"""
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "filtered": self.filtered,
+            "errors": self.errors,
+            "avg_ms": self.busy_time / self.processed * 1000 if self.processed else 0.0,
+            "last_ms": self.last_latency * 1000,
+            "queued": len(self.input) if self.input is not None else 0,
+        }
+
+class StagedPipeline:
+    """分阶段流水线执行器
+
+    每个阶段运行在独立线程中，相邻阶段之间是有界环形缓冲区，
+    因此第N帧的推理可以和第N-1帧的渲染并行，瓶颈阶段可以从统计信息中看出。
+    最后一个阶段的输出放入output缓冲区，由调用方（如显示循环）消费。
+    """
+
+    def __init__(self, on_drop=None):
+        self.stages = []
+        self.on_drop = on_drop
+        self.output = None
+        self.running = False
+
+    def add_source(self, name, func):
+        """添加源阶段（如相机采集）"""
+        if self.stages:
+            raise ValueError("源阶段必须是第一个阶段")
+        self.stages.append(Stage(name, func))
+        return self
+
+    def add_stage(self, name, func, capacity=1, policy=POLICY_LATEST, deadline=None):
+        """添加处理阶段，capacity/policy/deadline描述该阶段的输入缓冲区"""
+        if not self.stages:
+            raise ValueError("需要先添加源阶段")
+        buffer = RingBuffer(capacity, policy, deadline, self.on_drop)
+        self.stages[-1].output = buffer
+        self.stages.append(Stage(name, func, buffer))
+        return self
+
+    def add_output(self, capacity=1, policy=POLICY_LATEST, deadline=None):
+        """为最后一个阶段添加输出缓冲区，供调用方消费"""
+        self.output = RingBuffer(capacity, policy, deadline, self.on_drop)
+        self.stages[-1].output = self.output
+        return self
+
+    def start(self):
+        """启动所有阶段线程"""
+        self.running = True
+        for stage in self.stages:
+            stage.thread = threading.Thread(target=stage.run, args=(self,), name=f"stage-{stage.name}")
+            stage.thread.daemon = True
+            stage.thread.start()
+
+    def get(self, timeout=None):
+        """从输出缓冲区取出一帧结果"""
+        return self.output.get(timeout) if self.output is not None else None
+
+    def is_finished(self):
+        """所有阶段是否都已结束（数据源耗尽且已处理完）"""
+        return all(stage.thread is not None and not stage.thread.is_alive() for stage in self.stages)
+
+    def stop(self, timeout=2.0):
+        """停止所有阶段并丢弃缓冲区中残留的数据"""
+        self.running = False
+        buffers = [stage.input for stage in self.stages if stage.input is not None]
+        if self.output is not None:
+            buffers.append(self.output)
+        for buffer in buffers:
+            buffer.close()
+        for stage in self.stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout)
+        for buffer in buffers:
+            buffer.clear()
+
+    def stats(self):
+        """各阶段统计信息，按阶段顺序排列"""
+        return {stage.name: stage.stats() for stage in self.stages}
+
+    def bottleneck(self):
+        """平均处理耗时最长的阶段名称"""
+        busiest = max(self.stages, key=lambda stage: stage.stats()["avg_ms"], default=None)
+        return busiest.name if busiest is not None else None
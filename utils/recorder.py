@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+录制 - 后台线程把彩色帧编码为视频、原始深度按块压缩保存，并写出逐帧检测结果
+
+每段录制为一个目录:
+  color.mp4        彩色视频
+  depth_000000.npz 深度块，depth (n,H,W uint16)、frame_ids、timestamps
+  index.json       各深度块的起始序号、帧号和时间范围，可按序号或时间定位
+  results.jsonl    检测结果（与ResultWriter的JSON lines格式相同）
+视频第i帧与深度第i帧一一对应，ReplaySource可以直接回放。
+"""
+
+import os
+import json
+import time
+import threading
+from queue import Queue, Empty, Full
+
+import cv2
+import numpy as np
+
+from utils.pipeline import POLICY_BLOCK
+from utils.result_writer import build_record, record_to_json, MASK_RLE
+
+# 背压策略
+POLICY_DROP_NEW = 'drop_new'  # 队列满时丢弃新提交的帧，已入队的帧保证连续写出
+
+# 录制模式
+RECORD_CONTINUOUS = 'continuous'  # 从启动到结束持续录制
+RECORD_MANUAL = 'manual'          # 按键开始/停止，每次一段
+RECORD_PERSON = 'person'          # 检测到人时自动开始，最后一次检测到人hold秒后停止
+
+class RecordingSegment:
+    """一段录制的输出文件，只在写线程中使用"""
+
+    def __init__(self, path, fps, chunk_size, depth_scale, mask_format=MASK_RLE, codec='mp4v'):
+        self.path = path
+        self.fps = fps
+        self.chunk_size = chunk_size
+        self.depth_scale = depth_scale
+        self.mask_format = mask_format
+        self.codec = codec
+        self.video = None
+        self.chunk = None
+        self.chunk_frame_ids = np.zeros(chunk_size, dtype=np.int64)
+        self.chunk_timestamps = np.zeros(chunk_size, dtype=np.float64)
+        self.chunk_count = 0
+        self.chunks = []
+        self.frames = 0
+        self.width = 0
+        self.height = 0
+        self.results_file = None
+        os.makedirs(path, exist_ok=True)
+
+    def open(self, width, height):
+        """收到第一帧时按实际分辨率打开视频文件和深度块缓冲"""
+        self.width, self.height = width, height
+        self.video = cv2.VideoWriter(os.path.join(self.path, "color.mp4"), cv2.VideoWriter_fourcc(*self.codec),
+                                     self.fps or 30, (width, height))
+        if not self.video.isOpened():
+            raise RuntimeError(f"无法创建视频文件: {self.path}/color.mp4")
+        self.chunk = np.zeros((self.chunk_size, height, width), dtype=np.uint16)
+
+    def write_frame(self, frame_id, timestamp, color, depth):
+        """写入一帧彩色和深度，深度块写满时压缩写盘"""
+        if self.video is None:
+            self.open(color.shape[1], color.shape[0])
+        self.video.write(color)
+        self.chunk[self.chunk_count] = depth
+        self.chunk_frame_ids[self.chunk_count] = frame_id
+        self.chunk_timestamps[self.chunk_count] = timestamp
+        self.chunk_count += 1
+        self.frames += 1
+        if self.chunk_count == self.chunk_size:
+            self.flush_chunk()
+
+    def flush_chunk(self):
+        """压缩写出当前深度块并更新索引"""
+        count = self.chunk_count
+        if count == 0:
+            return
+        name = f"depth_{len(self.chunks):06d}.npz"
+        np.savez_compressed(os.path.join(self.path, name), depth=self.chunk[:count],
+                            frame_ids=self.chunk_frame_ids[:count], timestamps=self.chunk_timestamps[:count])
+        self.chunks.append({
+            "file": name,
+            "start": self.frames - count,
+            "count": count,
+            "first_frame": int(self.chunk_frame_ids[0]),
+            "last_frame": int(self.chunk_frame_ids[count - 1]),
+            "start_time": round(float(self.chunk_timestamps[0]), 6),
+            "end_time": round(float(self.chunk_timestamps[count - 1]), 6),
+        })
+        self.chunk_count = 0
+        # 每块都重写索引，进程异常退出时已写出的块仍可回放
+        self.write_index()
+
+    def write_index(self):
+        """写出索引文件"""
+        index = {
+            "video": "color.mp4",
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+            "depth_scale": self.depth_scale,
+            "chunk_size": self.chunk_size,
+            "frames": self.frames - self.chunk_count,
+            "chunks": self.chunks,
+        }
+        temp_path = os.path.join(self.path, "index.json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, os.path.join(self.path, "index.json"))
+
+    def write_result(self, frame_id, timestamp, frame_shape, result, depth_stats, track_ids):
+        """追加一帧检测结果"""
+        if self.results_file is None:
+            self.results_file = open(os.path.join(self.path, "results.jsonl"), "w", encoding="utf-8")
+        record = build_record(frame_id, timestamp, frame_shape, result, depth_stats, self.mask_format,
+                              track_ids=track_ids)
+        self.results_file.write(record_to_json(record))
+
+    def close(self):
+        """写出最后一个不满的深度块并关闭文件"""
+        self.flush_chunk()
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        if self.results_file is not None:
+            self.results_file.close()
+            self.results_file = None
+        if self.frames == 0 and not self.chunks:
+            print(f"录制段没有写入任何帧: {self.path}")
+        else:
+            print(f"录制段已保存: {self.path}, {self.frames} 帧")
+
+class FrameRecorder:
+    """后台录制彩色、深度和检测结果
+
+    submit_frame把帧拷贝到预分配的槽位后入队，不做编码和写盘；槽位用完时按policy
+    处理：drop_new丢弃本帧并计数（默认，不拖慢推理），block最多等待block_timeout秒。
+    检测结果另有result_queue_size个名额，用完时丢弃。mode为continuous时start后立即
+    开始录制，manual/person模式由toggle/trigger开始和结束每一段。
+    """
+
+    def __init__(self, path, fps=30, mode=RECORD_CONTINUOUS, policy=POLICY_DROP_NEW, queue_size=32,
+                 chunk_size=30, result_queue_size=256, block_timeout=1.0, depth_scale=0.001,
+                 mask_format=MASK_RLE):
+        if policy not in (POLICY_DROP_NEW, POLICY_BLOCK):
+            raise ValueError(f"未知的录制背压策略: {policy}")
+        if mode not in (RECORD_CONTINUOUS, RECORD_MANUAL, RECORD_PERSON):
+            raise ValueError(f"未知的录制模式: {mode}")
+        self.path = path
+        self.fps = fps
+        self.mode = mode
+        self.policy = policy
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.block_timeout = block_timeout
+        self.depth_scale = depth_scale
+        self.mask_format = mask_format
+        self.free_slots = Queue()
+        self.slots_allocated = False
+        self.work_queue = Queue()
+        self.result_slots = threading.Semaphore(result_queue_size)
+        self.thread = None
+        self.running = False
+        self.lock = threading.Lock()
+        self.segment = 0
+        self.active = False
+        self.until = None
+        self.written = 0
+        self.dropped = 0
+        self.results_written = 0
+        self.results_dropped = 0
+        self.segments = []
+
+    def allocate_slots(self, color_shape, depth_shape):
+        """按第一帧的形状分配槽位"""
+        for _ in range(self.queue_size):
+            self.free_slots.put((np.empty(color_shape, dtype=np.uint8), np.empty(depth_shape, dtype=np.uint16)))
+        self.slots_allocated = True
+
+    def start(self):
+        """启动写线程，持续录制模式同时开始第一段"""
+        os.makedirs(self.path, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self.writer_loop, name="recorder")
+        self.thread.daemon = True
+        self.thread.start()
+        if self.mode == RECORD_CONTINUOUS:
+            self.start_segment()
+
+    def start_segment(self, duration=None):
+        """开始新的一段，duration秒后自动结束（None表示直到stop_segment）"""
+        with self.lock:
+            if not self.active:
+                self.segment += 1
+                self.active = True
+                print(f"开始录制第 {self.segment} 段")
+            self.until = time.time() + duration if duration is not None else None
+
+    def stop_segment(self):
+        """结束当前段，写线程写完已入队的帧后关闭文件"""
+        with self.lock:
+            if not self.active:
+                return
+            self.active = False
+            self.until = None
+            self.work_queue.put(("end", self.segment))
+
+    def toggle(self):
+        """手动开始/结束录制"""
+        if self.active:
+            self.stop_segment()
+        else:
+            self.start_segment()
+        return self.active
+
+    def trigger(self, hold):
+        """事件触发录制：未在录制时开始新的一段，并把结束时间延后到hold秒之后"""
+        with self.lock:
+            if self.active and self.until is None:
+                # 手动或持续录制中，不设结束时间
+                return
+        self.start_segment(hold)
+
+    def check_expired(self, timestamp):
+        """触发录制到达结束时间时结束当前段"""
+        until = self.until
+        if until is not None and timestamp >= until:
+            self.stop_segment()
+
+    def submit_frame(self, frame_id, timestamp, color, depth):
+        """提交一帧彩色和深度图像；未在录制或槽位不足被丢弃时返回False"""
+        if not self.running:
+            return False
+        self.check_expired(timestamp)
+        if not self.active:
+            return False
+        if not self.slots_allocated:
+            self.allocate_slots(color.shape, depth.shape)
+        try:
+            if self.policy == POLICY_BLOCK:
+                slot = self.free_slots.get(timeout=self.block_timeout)
+            else:
+                slot = self.free_slots.get_nowait()
+        except Empty:
+            self.dropped += 1
+            return False
+        np.copyto(slot[0], color)
+        np.copyto(slot[1], depth, casting='unsafe')
+        self.work_queue.put(("frame", self.segment, frame_id, timestamp, slot))
+        return True
+
+    def submit_result(self, frame_id, timestamp, frame_shape, result, depth_stats=None, track_ids=None):
+        """提交一帧检测结果，名额用完时丢弃并返回False"""
+        if not self.running or not self.active:
+            return False
+        if not self.result_slots.acquire(blocking=False):
+            self.results_dropped += 1
+            return False
+        self.work_queue.put(("result", self.segment, frame_id, timestamp, frame_shape, result, depth_stats,
+                             track_ids))
+        return True
+
+    def open_segment(self, segment):
+        """创建一段录制的输出目录"""
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{segment:03d}"
+        output = RecordingSegment(os.path.join(self.path, name), self.fps, self.chunk_size, self.depth_scale,
+                                  self.mask_format)
+        self.segments.append(output.path)
+        return output
+
+    def close_segment(self, output):
+        """关闭一段录制，出错时只打印"""
+        try:
+            output.close()
+        except Exception as e:
+            print(f"录制段关闭失败: {e}")
+
+    def writer_loop(self):
+        """写线程主循环：按段写出帧和结果，段号变化或收到结束标记时关闭当前段"""
+        output = None
+        output_segment = None
+        while self.running or not self.work_queue.empty():
+            try:
+                item = self.work_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            kind, segment = item[0], item[1]
+            if kind == "end":
+                if output is not None and output_segment == segment:
+                    self.close_segment(output)
+                    output = None
+                continue
+            if output is None or output_segment != segment:
+                if output is not None:
+                    self.close_segment(output)
+                output = self.open_segment(segment)
+                output_segment = segment
+            try:
+                if kind == "frame":
+                    frame_id, timestamp, slot = item[2:]
+                    try:
+                        output.write_frame(frame_id, timestamp, slot[0], slot[1])
+                        self.written += 1
+                    finally:
+                        self.free_slots.put(slot)
+                else:
+                    try:
+                        output.write_result(*item[2:])
+                        self.results_written += 1
+                    finally:
+                        self.result_slots.release()
+            except Exception as e:
+                print(f"录制写出失败: {e}")
+        if output is not None:
+            self.close_segment(output)
+
+    def stats(self):
+        """录制统计"""
+        return {
+            "mode": self.mode,
+            "policy": self.policy,
+            "recording": self.active,
+            "segments": len(self.segments),
+            "frames_written": self.written,
+            "frames_dropped": self.dropped,
+            "results_written": self.results_written,
+            "results_dropped": self.results_dropped,
+            "queue_depth": self.work_queue.qsize(),
+        }
+
+    def stop(self):
+        """写完队列中剩余的帧后关闭当前段"""
+        with self.lock:
+            self.active = False
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        print(f"录制: {self.path}, 写出 {self.written} 帧, 丢弃 {self.dropped} 帧（策略 {self.policy}）, "
+              f"结果 {self.results_written} 条, 丢弃 {self.results_dropped} 条")
+
+class SnapshotWriter:
+    """后台保存快照（渲染后的图像和原始16位深度PNG），不阻塞显示循环
+
+    队列满时丢弃本次快照并返回False。
+    """
+
+    def __init__(self, directory=".", prefix="person_detection_no_bbox", queue_size=4):
+        self.directory = directory
+        self.prefix = prefix
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+        self.count = 0
+        self.dropped = 0
+
+    def start(self):
+        """启动写线程"""
+        self.thread = threading.Thread(target=self.writer_loop, name="snapshot-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, image, depth=None):
+        """拷贝图像后入队，返回将要写出的图像文件名，队列满时返回None"""
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{self.count}")
+        try:
+            self.queue.put_nowait((base, image.copy(), None if depth is None else depth.copy()))
+        except Full:
+            self.dropped += 1
+            return None
+        self.count += 1
+        return base + ".jpg"
+
+    def writer_loop(self):
+        """写线程主循环，收到None时退出"""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            base, image, depth = item
+            try:
+                cv2.imwrite(base + ".jpg", image)
+                if depth is not None:
+                    cv2.imwrite(base + "_depth.png", depth)
+                print(f"保存图像: {base}.jpg")
+            except Exception as e:
+                print(f"快照保存失败: {e}")
+
+    def stop(self):
+        """写完已提交的快照后退出"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+多进程后处理 - 掩码解码、深度统计和渲染放到工作进程，绕开GIL
+
+帧数据位于共享内存帧缓冲池中，掩码写入与缓冲一一对应的共享内存掩码区，
+进程间只传递序号和少量元数据。
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Empty
+
+import numpy as np
+
+from camera.frame_pool import shared_frame_views, close_shared_memory
+
+# 掩码在掩码区中的存放形式
+MASKS_PROTO = 'proto'    # 原型掩码数组，量化为uint8
+MASKS_BOX = 'box'        # BoxMask列表，逐个以uint8存放
+MASKS_INLINE = 'inline'  # 掩码区放不下时随任务序列化传递
+
+def pack_masks(arena, masks):
+    """将掩码写入掩码区，返回描述其布局的元数据"""
+    if isinstance(masks, np.ndarray):
+        if masks.size == 0:
+            return (MASKS_BOX, [])
+        if masks.size > arena.size:
+            return (MASKS_INLINE, masks)
+        target = arena[:masks.size].reshape(masks.shape)
+        np.multiply(masks, 255, out=target, casting='unsafe')
+        return (MASKS_PROTO, masks.shape)
+
+    layout = []
+    offset = 0
+    for box_mask in masks:
+        if box_mask is None:
+            layout.append(None)
+            continue
+        size = box_mask.mask.size
+        if offset + size > arena.size:
+            return (MASKS_INLINE, masks)
+        arena[offset:offset + size] = box_mask.mask.reshape(-1)
+        layout.append((int(box_mask.x1), int(box_mask.y1), box_mask.mask.shape[0], box_mask.mask.shape[1]))
+        offset += size
+    return (MASKS_BOX, layout)
+
+def unpack_masks(arena, layout, boxes, frame_shape):
+    """从掩码区读出掩码，统一转换为BoxMask列表"""
+    from segmentation.mask_utils import BoxMask, decode_masks
+
+    kind, info = layout
+    if kind == MASKS_INLINE:
+        return decode_masks(info, boxes, frame_shape)
+    if kind == MASKS_PROTO:
+        count = int(np.prod(info))
+        protos = arena[:count].reshape(info).astype(np.float32) * (1.0 / 255.0)
+        return decode_masks(protos, boxes, frame_shape)
+
+    masks = []
+    offset = 0
+    for entry in info:
+        if entry is None:
+            masks.append(None)
+            continue
+        x1, y1, height, width = entry
+        mask = arena[offset:offset + height * width].reshape(height, width).astype(bool)
+        masks.append(BoxMask(x1, y1, mask))
+        offset += height * width
+    return masks
+
+def render_worker(task_queue, result_queue, frame_shm_name, mask_shm_name, pool_size, width, height,
+                  mask_bytes, geometry=None):
+    """工作进程主循环：解码掩码、计算深度统计并在共享帧缓冲上就地渲染"""
+    from segmentation.segmentation_visualizer import SegmentationVisualizer
+    from segmentation.depth_statistics import compute_instance_depth_stats
+
+    frame_shm = shared_memory.SharedMemory(name=frame_shm_name)
+    mask_shm = shared_memory.SharedMemory(name=mask_shm_name)
+    frames = [shared_frame_views(frame_shm.buf, i, width, height) for i in range(pool_size)]
+    arenas = [np.ndarray((mask_bytes,), dtype=np.uint8, buffer=mask_shm.buf, offset=i * mask_bytes)
+              for i in range(pool_size)]
+    visualizer = SegmentationVisualizer()
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            sequence, slot, layout, boxes, classes, confidences, class_names, track_ids, \
+                depth_scale, fps_info = task
+            try:
+                color, depth = frames[slot]
+                masks = unpack_masks(arenas[slot], layout, boxes, color.shape)
+                depth_stats = compute_instance_depth_stats(depth, masks, boxes, depth_scale, geometry=geometry)
+                if fps_info is not None:
+                    visualizer.draw_segmentation(color, masks, boxes, classes, confidences, class_names,
+                                                 None, fps_info, depth_stats, in_place=True,
+                                                 track_ids=track_ids)
+                result_queue.put((sequence, depth_stats, None))
+            except Exception as e:
+                result_queue.put((sequence, None, str(e)))
+    finally:
+        # 先释放数组视图再关闭共享内存
+        del frames, arenas
+        close_shared_memory(frame_shm)
+        close_shared_memory(mask_shm)
+
+class RenderProcessPool:
+    """后处理/渲染进程池
+
+    submit按提交顺序分配序号，wait按序号取回结果，工作进程乱序完成的结果先暂存，
+    调用方按提交顺序等待即可保证输出顺序不变。
+
+    wait超时的任务由进程池接管其帧缓冲（owns返回True），工作进程可能仍在读写该缓冲，
+    迟到的结果到达后才归还缓冲池并丢弃结果。
+    """
+
+    def __init__(self, frame_pool, workers=2, mask_bytes=8 << 20, geometry=None):
+        if frame_pool.shm_name is None:
+            raise ValueError("进程池需要共享内存帧缓冲池（FrameBufferPool(shared=True)）")
+        self.frame_pool = frame_pool
+        self.num_workers = workers
+        self.mask_bytes = mask_bytes
+        # 深度图未对齐时的StreamGeometry，随启动参数传给工作进程
+        self.geometry = geometry
+        self.context = multiprocessing.get_context("spawn")
+        self.task_queue = None
+        self.result_queue = None
+        self.processes = []
+        self.mask_shm = None
+        self.arenas = []
+        self.next_sequence = 0
+        self.pending = {}
+        # 已提交未完成的任务及其帧缓冲；wait超时放弃的任务的缓冲在结果到达前不能复用
+        self.in_flight = {}
+        self.abandoned = {}
+
+    def start(self):
+        """创建掩码区并启动工作进程"""
+        pool_size = len(self.frame_pool)
+        self.mask_shm = shared_memory.SharedMemory(create=True, size=pool_size * self.mask_bytes)
+        self.arenas = [np.ndarray((self.mask_bytes,), dtype=np.uint8, buffer=self.mask_shm.buf,
+                                  offset=i * self.mask_bytes) for i in range(pool_size)]
+        self.task_queue = self.context.Queue()
+        self.result_queue = self.context.Queue()
+        for i in range(self.num_workers):
+            process = self.context.Process(
+                target=render_worker, name=f"render-worker-{i}",
+                args=(self.task_queue, self.result_queue, self.frame_pool.shm_name, self.mask_shm.name,
+                      pool_size, self.frame_pool.width, self.frame_pool.height, self.mask_bytes,
+                      self.geometry)
+            )
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+    def submit(self, buffer, result, depth_scale, track_ids=None, fps_info=None):
+        """提交一帧的后处理任务，fps_info为None时只计算深度统计不渲染，返回任务序号"""
+        _, masks, boxes, classes, confidences, class_names = result
+        layout = pack_masks(self.arenas[buffer.index], masks)
+        sequence = self.next_sequence
+        self.next_sequence += 1
+        self.in_flight[sequence] = buffer
+        self.task_queue.put((sequence, buffer.index, layout, np.asarray(boxes), np.asarray(classes),
+                             np.asarray(confidences), class_names, track_ids, depth_scale, fps_info))
+        return sequence
+
+    def receive(self, timeout):
+        """取回一个完成的任务结果，被放弃任务的结果直接丢弃并归还其缓冲"""
+        done, depth_stats, error = self.result_queue.get(timeout=timeout)
+        self.in_flight.pop(done, None)
+        if error is not None:
+            print(f"后处理任务 {done} 失败: {error}")
+        buffer = self.abandoned.pop(done, None)
+        if buffer is not None:
+            buffer.release()
+            return
+        self.pending[done] = depth_stats
+
+    def wait(self, sequence, timeout=5.0):
+        """等待指定任务完成，返回深度统计；失败或超时返回None
+
+        超时后该任务的帧缓冲由进程池接管，调用方通过owns判断后不得自行归还
+        """
+        while sequence not in self.pending:
+            try:
+                self.receive(timeout)
+            except Empty:
+                print(f"后处理任务 {sequence} 超时")
+                buffer = self.in_flight.pop(sequence, None)
+                if buffer is not None:
+                    self.abandoned[sequence] = buffer
+                return None
+        return self.pending.pop(sequence)
+
+    def owns(self, sequence):
+        """超时放弃的任务的帧缓冲是否仍由进程池持有"""
+        return sequence in self.abandoned
+
+    def stop(self):
+        """停止工作进程并释放掩码区
+
+        工作进程全部退出后才归还被放弃任务的缓冲并关闭共享内存。
+        """
+        for _ in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+        for buffer in self.abandoned.values():
+            buffer.release()
+        self.abandoned = {}
+        self.in_flight = {}
+        self.pending = {}
+        if self.mask_shm is not None:
+            self.arenas = []
+            close_shared_memory(self.mask_shm, unlink=True)
+            self.mask_shm = None
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+结果输出 - 逐帧检测结果以JSON lines或紧凑二进制记录流写盘
+
+由后台线程批量编码和写入，流水线只做一次非阻塞入队。
+"""
+
+import json
+import time
+import struct
+import threading
+from queue import Queue, Empty, Full
+
+import numpy as np
+
+from segmentation.mask_utils import decode_masks
+from segmentation.mask_codec import encode_rle, decode_rle, encode_polygons
+
+FORMAT_JSONL = 'jsonl'
+FORMAT_BINARY = 'binary'
+
+MASK_NONE = 'none'
+MASK_RLE = 'rle'
+MASK_POLYGON = 'polygon'
+
+# 二进制格式: 文件头 + 若干条记录，每条记录以uint32长度开头，便于跳读
+# 第2版在检测头末尾增加跟踪ID（0表示没有跟踪ID，跟踪ID从1开始），第1版文件仍可读取；
+# 未对齐模式下的三维位置和尺寸不保存
+BINARY_MAGIC = b"YSEGRES2"
+BINARY_MAGIC_V1 = b"YSEGRES1"
+FRAME_HEADER = struct.Struct('<IdHHH')          # 帧号, 时间戳, 宽, 高, 实例数
+DETECTION_HEADER = struct.Struct('<Hf4f4fBI')   # 类别, 置信度, 边界框, 深度(中位数/最小/分位数/有效比例), 掩码类型, 跟踪ID
+DETECTION_HEADER_V1 = struct.Struct('<Hf4f4fB')
+RLE_HEADER = struct.Struct('<HHHHI')            # 原点x, 原点y, 高, 宽, 游程数
+MASK_TYPES = {MASK_NONE: 0, MASK_RLE: 1, MASK_POLYGON: 2}
+
+def build_record(frame_id, timestamp, frame_shape, result, depth_stats=None,
+                 mask_format=MASK_RLE, polygon_epsilon=1.0, track_ids=None):
+    """将一帧分割结果转换为记录字典（掩码已编码）"""
+    _, masks, boxes, classes, confidences, class_names = result
+    height, width = frame_shape[:2]
+    box_masks = decode_masks(masks, boxes, frame_shape) if mask_format != MASK_NONE else []
+
+    detections = []
+    for i, (box, cls, conf) in enumerate(zip(boxes, classes, confidences)):
+        detection = {
+            "class": int(cls),
+            "name": class_names.get(int(cls), f"Class_{int(cls)}"),
+            "conf": round(float(conf), 4),
+            "box": [round(float(v), 1) for v in box],
+        }
+        if track_ids is not None:
+            detection["track_id"] = int(track_ids[i])
+        if depth_stats is not None:
+            detection["depth"] = {
+                "median": round(float(depth_stats["median"][i]), 3),
+                "min": round(float(depth_stats["min"][i]), 3),
+                "percentile": round(float(depth_stats["percentile"][i]), 3),
+                "valid_ratio": round(float(depth_stats["valid_ratio"][i]), 3),
+            }
+            if "centroid" in depth_stats:
+                # 未对齐模式下的三维位置和尺寸（彩色相机坐标系，米），二进制格式不保存
+                detection["position"] = [round(float(v), 3) for v in depth_stats["centroid"][i]]
+                detection["extent"] = [round(float(v), 3) for v in depth_stats["extent"][i]]
+        if i < len(box_masks) and box_masks[i] is not None:
+            if mask_format == MASK_RLE:
+                detection["rle"] = encode_rle(box_masks[i])
+            elif mask_format == MASK_POLYGON:
+                detection["polygons"] = encode_polygons(box_masks[i], polygon_epsilon)
+        detections.append(detection)
+
+    return {"frame": int(frame_id), "timestamp": round(float(timestamp), 6),
+            "width": int(width), "height": int(height), "detections": detections}
+
+def record_to_json(record):
+    """记录序列化为一行JSON"""
+    for detection in record["detections"]:
+        if "rle" in detection:
+            rle = detection["rle"]
+            detection["rle"] = {"origin": rle["origin"], "size": rle["size"],
+                                "counts": np.asarray(rle["counts"]).tolist()}
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+def record_to_binary(record):
+    """记录序列化为带长度前缀的二进制数据"""
+    parts = [FRAME_HEADER.pack(record["frame"], record["timestamp"], record["width"],
+                               record["height"], len(record["detections"]))]
+    for detection in record["detections"]:
+        depth = detection.get("depth", {})
+        if "rle" in detection:
+            mask_type = MASK_TYPES[MASK_RLE]
+        elif "polygons" in detection:
+            mask_type = MASK_TYPES[MASK_POLYGON]
+        else:
+            mask_type = MASK_TYPES[MASK_NONE]
+        parts.append(DETECTION_HEADER.pack(
+            detection["class"], detection["conf"], *detection["box"],
+            depth.get("median", 0.0), depth.get("min", 0.0),
+            depth.get("percentile", 0.0), depth.get("valid_ratio", 0.0), mask_type,
+            detection.get("track_id", 0)
+        ))
+        if mask_type == MASK_TYPES[MASK_RLE]:
+            rle = detection["rle"]
+            counts = np.asarray(rle["counts"], dtype='<u4')
+            parts.append(RLE_HEADER.pack(rle["origin"][0], rle["origin"][1],
+                                         rle["size"][0], rle["size"][1], len(counts)))
+            parts.append(counts.tobytes())
+        elif mask_type == MASK_TYPES[MASK_POLYGON]:
+            parts.append(struct.pack('<H', len(detection["polygons"])))
+            for polygon in detection["polygons"]:
+                points = np.asarray(polygon, dtype='<i4')
+                parts.append(struct.pack('<H', len(points) // 2))
+                parts.append(points.tobytes())
+    payload = b"".join(parts)
+    return struct.pack('<I', len(payload)) + payload
+
+def read_binary_records(path):
+    """逐条读取二进制结果文件，返回与JSON lines相同结构的记录字典"""
+    with open(path, "rb") as f:
+        magic = f.read(len(BINARY_MAGIC))
+        if magic == BINARY_MAGIC:
+            detection_header = DETECTION_HEADER
+        elif magic == BINARY_MAGIC_V1:
+            detection_header = DETECTION_HEADER_V1
+        else:
+            raise ValueError(f"不是有效的结果文件: {path}")
+        while True:
+            length_bytes = f.read(4)
+            if len(length_bytes) < 4:
+                return
+            payload = f.read(struct.unpack('<I', length_bytes)[0])
+            offset = 0
+            frame_id, timestamp, width, height, count = FRAME_HEADER.unpack_from(payload, offset)
+            offset += FRAME_HEADER.size
+            detections = []
+            for _ in range(count):
+                values = detection_header.unpack_from(payload, offset)
+                offset += detection_header.size
+                detection = {
+                    "class": values[0], "conf": values[1], "box": list(values[2:6]),
+                    "depth": {"median": values[6], "min": values[7],
+                              "percentile": values[8], "valid_ratio": values[9]},
+                }
+                if len(values) > 11 and values[11]:
+                    detection["track_id"] = values[11]
+                mask_type = values[10]
+                if mask_type == MASK_TYPES[MASK_RLE]:
+                    x1, y1, mask_h, mask_w, num_counts = RLE_HEADER.unpack_from(payload, offset)
+                    offset += RLE_HEADER.size
+                    counts = np.frombuffer(payload, dtype='<u4', count=num_counts, offset=offset)
+                    offset += 4 * num_counts
+                    detection["rle"] = {"origin": [x1, y1], "size": [mask_h, mask_w], "counts": counts}
+                elif mask_type == MASK_TYPES[MASK_POLYGON]:
+                    num_polygons, = struct.unpack_from('<H', payload, offset)
+                    offset += 2
+                    polygons = []
+                    for _ in range(num_polygons):
+                        num_points, = struct.unpack_from('<H', payload, offset)
+                        offset += 2
+                        points = np.frombuffer(payload, dtype='<i4', count=num_points * 2, offset=offset)
+                        offset += 8 * num_points
+                        polygons.append(points.tolist())
+                    detection["polygons"] = polygons
+                detections.append(detection)
+            yield {"frame": frame_id, "timestamp": timestamp, "width": width, "height": height,
+                   "detections": detections}
+
+def record_masks(record):
+    """将记录中的RLE掩码解码为BoxMask列表（无掩码的实例为None）"""
+    return [decode_rle(d["rle"]) if "rle" in d else None for d in record["detections"]]
+
+class ResultWriter:
+    """后台批量写出逐帧检测结果
+
+    submit只做一次非阻塞入队，队列满时丢弃并计数；编码和写盘在后台线程中进行，
+    按batch_size条或flush_interval秒批量写出并刷新。
+    """
+
+    def __init__(self, path, fmt=None, mask_format=MASK_RLE, queue_size=256,
+                 batch_size=64, flush_interval=1.0, polygon_epsilon=1.0):
+        if fmt is None:
+            fmt = FORMAT_BINARY if path.endswith(".bin") else FORMAT_JSONL
+        if fmt not in (FORMAT_JSONL, FORMAT_BINARY):
+            raise ValueError(f"未知的结果格式: {fmt}")
+        if mask_format not in MASK_TYPES:
+            raise ValueError(f"未知的掩码格式: {mask_format}")
+        self.path = path
+        self.fmt = fmt
+        self.mask_format = mask_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.polygon_epsilon = polygon_epsilon
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.running = False
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+    def start(self):
+        """打开输出文件并启动写线程"""
+        if self.fmt == FORMAT_BINARY:
+            self.file = open(self.path, "wb")
+            self.file.write(BINARY_MAGIC)
+        else:
+            self.file = open(self.path, "w", encoding="utf-8")
+        self.running = True
+        self.thread = threading.Thread(target=self.writer_loop, name="result-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, frame_id, timestamp, frame_shape, result, depth_stats=None, track_ids=None,
+               block=False):
+        """提交一帧结果；非阻塞模式下队列满时丢弃并返回False，阻塞模式下等待队列空位"""
+        try:
+            self.queue.put((frame_id, timestamp, frame_shape, result, depth_stats, track_ids), block=block)
+            return True
+        except Full:
+            self.dropped += 1
+            return False
+
+    def encode(self, item):
+        """编码一条结果"""
+        frame_id, timestamp, frame_shape, result, depth_stats, track_ids = item
+        record = build_record(frame_id, timestamp, frame_shape, result, depth_stats,
+                              self.mask_format, self.polygon_epsilon, track_ids)
+        if self.fmt == FORMAT_BINARY:
+            return record_to_binary(record)
+        return record_to_json(record)
+
+    def write_batch(self, batch):
+        """批量编码并一次写出"""
+        if not batch:
+            return
+        encoded = [self.encode(item) for item in batch]
+        data = b"".join(encoded) if self.fmt == FORMAT_BINARY else "".join(encoded)
+        self.file.write(data)
+        self.file.flush()
+        self.written += len(batch)
+        self.bytes_written += len(data)
+
+    def writer_loop(self):
+        """写线程主循环"""
+        batch = []
+        last_flush = time.perf_counter()
+        while self.running or not self.queue.empty():
+            try:
+                batch.append(self.queue.get(timeout=0.1))
+            except Empty:
+                pass
+            now = time.perf_counter()
+            if len(batch) >= self.batch_size or (batch and now - last_flush >= self.flush_interval):
+                try:
+                    self.write_batch(batch)
+                except Exception as e:
+                    print(f"结果写出失败: {e}")
+                batch = []
+                last_flush = now
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            print(f"结果写出失败: {e}")
+
+    def stop(self):
+        """写完队列中剩余的结果后关闭文件"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        print(f"结果输出: {self.path}, 写出 {self.written} 帧, 丢弃 {self.dropped} 帧, "
+              f"{self.bytes_written / 1024:.1f} KB")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+# -*- coding:utf-8 -*-
+# Author：Bill Liu
+# Create：2026-10-18
+# Update：2026-10-18
+"""
+局域网推流服务 - HTTP MJPEG视频流和WebSocket逐帧检测结果
+
+服务运行在独立线程的asyncio事件循环中。每帧只在线程池中编码一次JPEG/JSON，
+所有客户端共享；每个客户端只发送自己上次发送之后的最新一帧，慢客户端独立丢帧，
+不会反压流水线。
+"""
+
+import json
+import time
+import base64
+import struct
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .result_writer import build_record, MASK_NONE
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MJPEG_BOUNDARY = "frame"
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>YOLOv11 Person Detection</title></head>
+<body style="background:#111;color:#ddd;font-family:monospace">
+<img src="/stream.mjpg" style="max-width:100%"><pre id="results"></pre>
+<script>
+const ws = new WebSocket(`ws://${location.host}/results`);
+ws.onmessage = (e) => { document.getElementById("results").textContent = e.data; };
+</script></body></html>
+"""
+
+def websocket_accept(key):
+    """WebSocket握手的Sec-WebSocket-Accept值"""
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+def websocket_frame(payload, opcode=0x1):
+    """构造服务端发送的（不加掩码的）WebSocket帧"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+class StreamServer:
+    """MJPEG/WebSocket推流服务
+
+    publish由流水线输出端调用，只做一次拷贝和任务提交就返回；编码线程忙时
+    新帧替换尚未编码的旧帧。路由：/ 预览页，/stream.mjpg 视频流，
+    /snapshot.jpg 最新一帧，/results 检测结果WebSocket。
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, jpeg_quality=80, encode_workers=1):
+        self.host = host
+        self.port = port
+        self.jpeg_quality = jpeg_quality
+        self.executor = ThreadPoolExecutor(max_workers=encode_workers, thread_name_prefix="stream-encode")
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+        self.encoding = False
+        self.pending = None
+        # 最新一帧的编码结果，由事件循环线程读写
+        self.sequence = 0
+        self.jpeg = None
+        self.result_json = None
+        self.frame_ready = None
+        self.clients = 0
+        self.encoded = 0
+        self.skipped = 0
+
+    def start(self):
+        """在后台线程中启动事件循环和服务"""
+        self.thread = threading.Thread(target=self.serve_forever, name="stream-server")
+        self.thread.daemon = True
+        self.thread.start()
+        self.started.wait(timeout=5.0)
+        return self.server is not None
+
+    def serve_forever(self):
+        """事件循环线程主函数"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.frame_ready = asyncio.Event()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_client, self.host, self.port))
+            print(f"推流服务已启动: http://{self.host}:{self.port}/")
+        except OSError as e:
+            print(f"推流服务启动失败: {e}")
+            self.started.set()
+            return
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # 取消仍在服务客户端的协程，再关闭事件循环
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def publish(self, frame_id, image, result=None, depth_stats=None, track_ids=None):
+        """发布一帧渲染结果和检测结果，没有客户端时直接返回"""
+        if self.loop is None or self.clients == 0:
+            return
+        # 图像来自帧缓冲池，返回后即被归还，必须先拷贝
+        item = (frame_id, None if image is None else image.copy(), result, depth_stats, track_ids)
+        with self.lock:
+            if self.encoding:
+                if self.pending is not None:
+                    self.skipped += 1
+                self.pending = item
+                return
+            self.encoding = True
+        self.executor.submit(self.encode_loop, item)
+
+    def encode_loop(self, item):
+        """编码线程：编码当前帧，完成后继续处理期间到达的最新帧"""
+        while item is not None:
+            try:
+                jpeg, result_json = self.encode(item)
+                self.loop.call_soon_threadsafe(self.set_latest, jpeg, result_json)
+            except Exception as e:
+                print(f"推流编码失败: {e}")
+            with self.lock:
+                item, self.pending = self.pending, None
+                if item is None:
+                    self.encoding = False
+
+    def encode(self, item):
+        """编码JPEG和检测结果JSON"""
+        frame_id, image, result, depth_stats, track_ids = item
+        jpeg = None
+        if image is not None:
+            ok, data = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            jpeg = data.tobytes() if ok else None
+        result_json = None
+        if result is not None:
+            record = build_record(frame_id, time.time(), result[0].shape, result, depth_stats,
+                                  MASK_NONE, track_ids=track_ids)
+            result_json = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+        self.encoded += 1
+        return jpeg, result_json
+
+    def set_latest(self, jpeg, result_json):
+        """事件循环线程：更新最新帧并唤醒所有等待的客户端"""
+        if jpeg is not None:
+            self.jpeg = jpeg
+        self.result_json = result_json
+        self.sequence += 1
+        ready, self.frame_ready = self.frame_ready, asyncio.Event()
+        ready.set()
+
+    async def wait_newer(self, sequence):
+        """等待比sequence更新的帧，返回最新序号"""
+        while self.sequence <= sequence:
+            await self.frame_ready.wait()
+        return self.sequence
+
+    async def handle_client(self, reader, writer):
+        """解析HTTP请求并分发到各路由"""
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) >= 2 else "/"
+
+            if path == "/stream.mjpg":
+                await self.serve_mjpeg(writer)
+            elif path == "/results" and headers.get("upgrade", "").lower() == "websocket":
+                await self.serve_websocket(reader, writer, headers)
+            elif path == "/snapshot.jpg" and self.jpeg is not None:
+                await self.send_response(writer, "200 OK", "image/jpeg", self.jpeg)
+            elif path == "/":
+                await self.send_response(writer, "200 OK", "text/html; charset=utf-8", INDEX_PAGE.encode())
+            else:
+                await self.send_response(writer, "404 Not Found", "text/plain", b"not found")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # 客户端断开或服务停止
+            pass
+        finally:
+            writer.close()
+
+    async def send_response(self, writer, status, content_type, body):
+        """发送一个完整的HTTP响应"""
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def serve_mjpeg(self, writer):
+        """持续发送multipart JPEG流，发送跟不上时跳过中间帧"""
+        writer.write(("HTTP/1.1 200 OK\r\nCache-Control: no-cache\r\nConnection: close\r\n"
+                      f"Content-Type: multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}\r\n\r\n").encode())
+        self.clients += 1
+        try:
+            sequence = 0
+            while True:
+                sequence = await self.wait_newer(sequence)
+                jpeg = self.jpeg
+                if jpeg is None:
+                    continue
+                writer.write(f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                             f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                await writer.drain()
+        finally:
+            self.clients -= 1
+
+    async def serve_websocket(self, reader, writer, headers):
+        """WebSocket握手后持续推送最新一帧的检测结果JSON"""
+        key = headers.get("sec-websocket-key", "")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept(key)}\r\n\r\n").encode())
+        await writer.drain()
+        self.clients += 1
+        closed = asyncio.ensure_future(self.read_until_close(reader))
+        try:
+            sequence = 0
+            while not closed.done():
+                newer = asyncio.ensure_future(self.wait_newer(sequence))
+                await asyncio.wait([newer, closed], return_when=asyncio.FIRST_COMPLETED)
+                if not newer.done():
+                    newer.cancel()
+                    break
+                sequence = newer.result()
+                if self.result_json is not None:
+                    writer.write(websocket_frame(self.result_json))
+                    await writer.drain()
+            writer.write(websocket_frame(b"", opcode=0x8))
+        finally:
+            closed.cancel()
+            self.clients -= 1
+
+    async def read_until_close(self, reader):
+        """读取并丢弃客户端发来的帧，直到收到关闭帧或连接断开"""
+        try:
+            while True:
+                header = await reader.readexactly(2)
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if header[1] & 0x80:
+                    await reader.readexactly(4)
+                await reader.readexactly(length)
+                if opcode == 0x8:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+    def stop(self):
+        """停止服务和编码线程"""
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.executor.shutdown(wait=False)
+        print(f"推流服务已停止: 编码 {self.encoded} 帧, 跳过 {self.skipped} 帧")